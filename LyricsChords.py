@@ -1,40 +1,17 @@
 #!/usr/bin/env python
 import argparse
-import pathlib
 import os
+import pathlib
 import sys
 import logging
 LIB_PATH = pathlib.Path(pathlib.Path(__file__).absolute().parent, "lib")
 sys.path.append(LIB_PATH.as_posix())
-from lyrichords.song import Song
-from lyrichords.drawing import SongDrawer, PAGE_FORMATS
-from lyrichords.instruments import STRING_INSTRUMENTS
-from matplotlib.backends.backend_pdf import PdfPages
-import matplotlib.pyplot as plt
-# Typing
-from matplotlib.figure import Figure
-from collections.abc import Iterable
-from typing import Tuple
+# The pages are only saved to files: non-interactive matplotlib backend, no GUI backend is looked for
+os.environ.setdefault("MPLBACKEND", "agg")
 
 # Get Logger
 logger = logging.getLogger(__name__)
 
-def savefig2PDF(
-        figs: Iterable[Figure],
-        filepath: str,
-        close_figs: bool = False,
-        create_out_path: bool = False) -> None:
-    if create_out_path:
-        out_path = pathlib.Path(filepath).parent.as_posix()
-        os.makedirs(out_path, exist_ok=True)
-        logger.info(f"Saving file: {filepath}")
-    with PdfPages(filepath) as pdf:
-        for fig in figs:
-            pdf.savefig(fig, dpi=400)
-    if close_figs:
-        for fig in figs:
-            plt.close(fig)
-
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -45,14 +22,14 @@ if __name__ == "__main__":
         help="Path of the lyrics(+chords) text file OR path of the folder containing multiple lyrics text file to process"
     )
     parser.add_argument("--output", type=str, required=False,
-        help="Path of the output pdf file, [default name: same name as input file, default path: path of the input file]"
+        help="Path of the output file, [default name: same name as input file, default path: path of the input file]"
     )
     parser.add_argument("--background", type=str, required=False,
         help="Path of the image file to draw as a background"
     )
     parser.add_argument("--instrument", type=str, required=False,
         default="UKULELE_GCEA",
-        help="Instrument, value can be 'UKULELE_GCEA' (soprano, concert and tenor ukuleles) or 'UKULELE_DGBE' (baritone ukulele)"
+        help="Instrument, value can be 'UKULELE_GCEA' (soprano, concert and tenor ukuleles), 'UKULELE_DGBE' (baritone ukulele), 'GUITAR_EADGBE' or the path of an instrument json file (see ./examples/tenor_guitar_cgda.json)"
     )
     parser.add_argument("--page_format", type=str, required=False,
         default="A4",
@@ -166,6 +143,34 @@ if __name__ == "__main__":
         default=0,
         help="Option to choose manually the number of the column for the lyrics [0: automatic, 1+: fixed number of column]"
     )
+    parser.add_argument("--lyrics_wrap_mode", type=str, required=False,
+        default="greedy",
+        help="Lyrics design: how the verses too long are wrapped ['greedy': as much as possible on each line, 'balanced': lines of even widths]"
+    )
+    parser.add_argument("--backend", type=str, required=False,
+        default=None,
+        help="How the PDF files are written: 'matplotlib' (the figures saved by matplotlib) or 'pdf' (the PDF written directly, faster and smaller files) [default: matplotlib, the SVG and HTML files have their own backend]"
+    )
+    parser.add_argument("--format", type=str, required=False,
+        default="pdf",
+        help="Format of the output files: 'pdf', 'svg' (the pages one below the other) or 'html' (the pages as SVG images of a web page, the fonts are referenced, not embedded)"
+    )
+    parser.add_argument("--jobs", type=int, required=False,
+        default=1,
+        help="Number of songs rendered in parallel, each by its own process [0: one per CPU]"
+    )
+    parser.add_argument("--timeout", type=float, required=False,
+        default=300.,
+        help="Time in seconds after which the rendering of a song is stopped and reported as failed [0: no limit]"
+    )
+    parser.add_argument("--force", action="store_true", required=False,
+        default=False,
+        help="Option to render all the songs [default: only the songs whose text, design, instrument or background changed since the last build]"
+    )
+    parser.add_argument("--watch", action="store_true", required=False,
+        default=False,
+        help="Option to keep running and render again the songs when their file changes (Ctrl+C to stop)"
+    )
     parser.add_argument('--logging_level', type=str, nargs="?", const="INFO", default="INFO",
         help="Logging level: CRITICAL, ERROR, WARNING, INFO [Default] or DEBUG"
     )
@@ -176,6 +181,23 @@ if __name__ == "__main__":
     out_path = pdesign.pop("output")
     background_path = pdesign.pop("background")
     logging_level = pdesign.pop("logging_level")
+    nb_jobs = pdesign.pop("jobs")
+    timeout = pdesign.pop("timeout")
+    force = pdesign.pop("force")
+    watch = pdesign.pop("watch")
+    output_format = pdesign.pop("format").lower()
+    if output_format not in ("pdf", "svg", "html"):
+        parser.error(f"Unknown output format: {output_format}")
+    if output_format != "pdf":
+        # The SVG and HTML files are written by their own backend
+        if pdesign["backend"] not in (None, output_format):
+            parser.error(f"--backend {pdesign['backend']} cannot write the {output_format} files, only --format pdf")
+        pdesign["backend"] = output_format
+    elif pdesign["backend"] in ("svg", "html"):
+        parser.error(f"--backend {pdesign['backend']} writes the {pdesign['backend']} files, use --format {pdesign['backend']}")
+    elif pdesign["backend"] is None:
+        pdesign["backend"] = "matplotlib"
+    extension = "." + output_format
 
     # Set Logging Level
     handler = logging.StreamHandler()
@@ -186,48 +208,11 @@ if __name__ == "__main__":
         log.setLevel(logging_level)
         log.addHandler(handler)
 
-    # Detect the files to process depending on the input path is a specific file or a folder
-    filepaths: Tuple[str, str] = []
-    in_path = pathlib.Path(in_path)
-    out_path = None if out_path is None else pathlib.Path(out_path)
-    if in_path.is_file():
-        if out_path is None:
-            # Get the folder and name of the input file and generate a pdf file there
-            out_temp = pathlib.Path(in_path.parent, in_path.stem + ".pdf")
-            filepaths.append((str(in_path), str(out_temp)))
-        elif out_path.suffix.lower() == ".pdf":
-            filepaths.append((str(in_path), str(out_path)))
-        else:
-            # Assuming the path is a folder
-            out_temp = pathlib.Path(out_path, in_path.stem + ".pdf")
-            filepaths.append((str(in_path), str(out_temp)))
-    elif in_path.is_dir():
-        # Only consider the files in the current folder (not sub directories)
-        for filename in os.listdir(str(in_path)):
-            p = pathlib.Path(in_path, filename)
-            if p.is_file():
-                ext = p.suffix.lower()
-                if ext == ".txt":
-                    if out_path is None:
-                        # Get the folder and name of the input file and generate a pdf file there
-                        out_temp = pathlib.Path(p.parent, p.stem + ".pdf")
-                        filepaths.append((str(p), str(out_temp)))
-                    elif out_path.suffix.lower() == ".pdf":
-                        raise ValueError("If you provide a folder as an input, you must set the path of folder for the output")
-                    else:
-                        # Assuming the path is a folder
-                        out_temp = pathlib.Path(out_path, p.stem + ".pdf")
-                        filepaths.append((str(p), str(out_temp)))
-
-    # Create an instance of the drawer
-    pdesign["instrument"] = STRING_INSTRUMENTS[pdesign["instrument"]].value
-    pdesign["page_format"] = PAGE_FORMATS[pdesign["page_format"]]
-    drawer = SongDrawer(**pdesign)
-
-    
-    # Generate the PDF files
-    for in_file, out_file in filepaths:
-        song = Song.fromFile(in_file)
-        logger.debug(song)
-        figs = drawer.draw(song, background_path)
-        savefig2PDF(figs, out_file, close_figs=True, create_out_path=True)
+    # Generate the files, the rendering modules are imported once the arguments are parsed
+    from lyrichords.batch import listJobs, renderSongs, watchSongs
+    if watch:
+        watchSongs(in_path, out_path, pdesign, background_path, nb_jobs, timeout, force, extension=extension)
+    else:
+        results = renderSongs(listJobs(in_path, out_path, extension), pdesign, background_path, nb_jobs, timeout, force)
+        if not all(result.isSuccess() for result in results):
+            sys.exit(1)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import argparse
+import os
+import pathlib
+import sys
+import logging
+LIB_PATH = pathlib.Path(pathlib.Path(__file__).absolute().parent, "lib")
+sys.path.append(LIB_PATH.as_posix())
+# The pages are only saved to files: non-interactive matplotlib backend, no GUI backend is looked for
+os.environ.setdefault("MPLBACKEND", "agg")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="LyricsChords render server: POST /render {\"song\": text, \"options\": {design options of LyricsChords.py}} returns the PDF",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+        )
+    parser.add_argument("--host", type=str, required=False,
+        default="127.0.0.1",
+        help="Address to listen on"
+    )
+    parser.add_argument("--port", type=int, required=False,
+        default=8000,
+        help="Port to listen on"
+    )
+    parser.add_argument("--jobs", type=int, required=False,
+        default=2,
+        help="Number of worker processes rendering the songs"
+    )
+    parser.add_argument("--cache_size", type=int, required=False,
+        default=64,
+        help="Number of PDF files kept in memory to answer the repeated requests"
+    )
+    parser.add_argument("--timeout", type=float, required=False,
+        default=60.,
+        help="Time in seconds after which the rendering of a song is stopped [0: no limit]"
+    )
+    parser.add_argument('--logging_level', type=str, nargs="?", const="INFO", default="INFO",
+        help="Logging level: CRITICAL, ERROR, WARNING, INFO [Default] or DEBUG"
+    )
+
+    args = parser.parse_args()
+
+    # Set Logging Level
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s %(name)-12s %(levelname)-8s %(message)s')
+    handler.setFormatter(formatter)
+    for logname in ["__main__", "lyrichords"]:
+        log = logging.getLogger(logname)
+        log.setLevel(args.logging_level)
+        log.addHandler(handler)
+
+    # Imported once the arguments are parsed: --help does not load the rendering modules
+    from lyrichords.server import serve
+    serve(args.host, args.port, args.jobs, args.cache_size, args.timeout)
@@ -0,0 +1,64 @@
+"""
+Pages per second, size of the files and time to the first page of the render backends for the bundled examples
+(the options of the examples of the README), with a warm drawer and the layout included.
+The first page is the first flush of the file, the backends streaming the pages flush each one once written.
+"""
+import io
+import time
+from common import parseArguments, EXAMPLES_PATH, bestOf
+
+args = parseArguments(__doc__, lambda parser: parser.add_argument("--backends", type=str, default="matplotlib,pdf,svg,html",
+                                                                  help="Backends measured, separated by commas"))
+from lyrichords.drawing import SongDrawer, PAGE_FORMATS
+from lyrichords.instruments import STRING_INSTRUMENTS
+from lyrichords.song import Song
+
+# Name -> (song file, options of the drawer, background)
+EXAMPLES = {
+    "tu_de_que_vas A4 landscape": ("tu_de_que_vas.txt", dict(page_format=PAGE_FORMATS.A4, landscape=True, design_vertical=True,
+                                                             instrument=STRING_INSTRUMENTS.GUITAR_EADGBE.value), None),
+    "city_of_stars A4 background": ("city_of_stars.txt", dict(page_format=PAGE_FORMATS.A4, lyrics_line_spacing=8, title_height=35,
+                                                              instrument=STRING_INSTRUMENTS.UKULELE_GCEA.value), "lalaland_background.jpg"),
+    "compartir A5": ("compartir.txt", dict(page_format=PAGE_FORMATS.A5, instrument=STRING_INSTRUMENTS.UKULELE_DGBE.value,
+                                           lyrics_line_spacing=7.5, title_height=11, lyrics_fontsize=9, chords_fret_spacing=3), None),
+    "compartir A6 all pages": ("compartir.txt", dict(page_format=PAGE_FORMATS.A6, chords_all_pages=True,
+                                                     instrument=STRING_INSTRUMENTS.GUITAR_EADGBE.value), None),
+}
+
+class TimedFile(io.BytesIO):
+    """
+    In-memory file recording the time of its first flush
+    """
+    def __init__(self):
+        super().__init__()
+        self.first_flush = None
+
+    def flush(self):
+        if self.first_flush is None:
+            self.first_flush = time.perf_counter()
+        super().flush()
+
+
+def writeSong(drawer: SongDrawer, song: Song, background: str) -> float:
+    """
+    Time (s) to the first page written
+    """
+    output = TimedFile()
+    start = time.perf_counter()
+    drawer.write(song, output, background)
+    end = time.perf_counter()
+    return (output.first_flush or end) - start
+
+
+for name, (filename, options, background) in EXAMPLES.items():
+    song = Song.fromFile(EXAMPLES_PATH.joinpath(filename).as_posix())
+    if background is not None:
+        background = EXAMPLES_PATH.joinpath(background).as_posix()
+    for backend in args.backends.split(","):
+        drawer = SongDrawer(backend=backend, **options)
+        output = io.BytesIO()
+        nb_pages = drawer.write(song, output, background)
+        duration = bestOf(lambda: drawer.write(song, io.BytesIO(), background))
+        first_page = min(writeSong(drawer, song, background) for _ in range(3))
+        print(f"{name:28s} {backend:10s} {nb_pages:2d} pages {nb_pages / duration:7.1f} pages/s {len(output.getvalue()) / 1024:8.0f} KiB "
+              f"first page {first_page * 1000:7.1f} ms")
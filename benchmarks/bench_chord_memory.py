@@ -0,0 +1,21 @@
+"""
+Memory of a parsed library: the bundled examples replicated and parsed, with the number of Chord objects
+alive and the peak memory traced while parsing (tracemalloc)
+"""
+import gc
+import tracemalloc
+from common import parseArguments, getLibraryLines
+
+args = parseArguments(__doc__, lambda parser: parser.add_argument("--songs", type=int, default=10000,
+                                                                  help="Number of songs of the library"))
+from lyrichords.common import Chord
+from lyrichords.song import Song
+
+library = getLibraryLines(args.songs)
+tracemalloc.start()
+songs = [Song.parse(lines) for lines in library]
+current, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+gc.collect()
+nb_chords = sum(1 for obj in gc.get_objects() if isinstance(obj, Chord))
+print(f"{len(songs)} songs: {nb_chords} Chord objects, {current / 2**20:.0f} MiB traced, peak {peak / 2**20:.0f} MiB")
@@ -0,0 +1,27 @@
+"""
+Per-token cost of Chord.parse on the chord lines of a library of songs (the bundled examples replicated)
+"""
+from common import parseArguments, getLibraryLines, bestOf
+
+args = parseArguments(__doc__, lambda parser: parser.add_argument("--songs", type=int, default=2000,
+                                                                  help="Number of songs of the library"))
+from lyrichords.common import Chord
+from lyrichords.song import Song
+
+tokens = []
+for lines in getLibraryLines(args.songs):
+    for line in lines:
+        if line.strip() and Song.isChordsLine(line):
+            tokens += line.split()
+
+
+def parseTokens():
+    for token in tokens:
+        try:
+            Chord.parse(token)
+        except Exception:
+            pass
+
+
+duration = bestOf(parseTokens)
+print(f"{args.songs} songs, {len(tokens)} tokens: {duration:.3f} s, {duration / max(1, len(tokens)) * 1e6:.2f} us/token")
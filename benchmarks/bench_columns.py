@@ -0,0 +1,29 @@
+"""
+Layout and render time of a 200-verse song (city_of_stars repeated) with the automatic number of columns
+and with a fixed number of columns (--lyrics_nb_cols)
+"""
+from common import parseArguments, getExampleTexts, bestOf
+
+args = parseArguments(__doc__, lambda parser: parser.add_argument("--verses", type=int, default=200,
+                                                                  help="Number of verses of the song"))
+import matplotlib.pyplot as plt
+from lyrichords.drawing import SongDrawer, PAGE_FORMATS
+from lyrichords.instruments import STRING_INSTRUMENTS
+from lyrichords.song import Song
+
+head, _, body = getExampleTexts()["city_of_stars"].partition("\n\n")
+text = head
+song = Song.parse(text.split("\n"))
+while len(song.getVerses()) < args.verses:
+    text += "\n\n" + body
+    song = Song.parse(text.split("\n"))
+song.setVerses(song.getVerses()[:args.verses])
+
+for page_format in (PAGE_FORMATS.A4, PAGE_FORMATS.A5):
+    for nb_cols in (0, 2):
+        drawer = SongDrawer(instrument=STRING_INSTRUMENTS.UKULELE_GCEA.value, page_format=page_format, lyrics_nb_cols=nb_cols)
+        nb_pages = len(drawer.layout(song).pages)
+        layout = bestOf(lambda: drawer.layout(song), 5)
+        draw = bestOf(lambda: (drawer.draw(song), plt.close("all")), 3)
+        columns = "automatic" if nb_cols == 0 else f"{nb_cols} columns"
+        print(f"{page_format.name} {columns:10s} {nb_pages:2d} pages: layout {layout * 1000:6.1f} ms, draw {draw * 1000:6.1f} ms")
@@ -0,0 +1,32 @@
+"""
+Render of a folder of songs with the chords on all the pages (the bundled examples replicated, A5, guitar):
+duration per backend and hits/misses of the chord diagrams cache of the process
+"""
+import io
+import time
+from common import parseArguments, getExampleTexts
+
+args = parseArguments(__doc__, lambda parser: (
+    parser.add_argument("--nb_copies", type=int, default=3, help="Copies of each example song in the folder"),
+    parser.add_argument("--backends", type=str, default="matplotlib,pdf", help="Backends measured, separated by commas"),
+))
+from lyrichords import layout
+from lyrichords.drawing import SongDrawer, PAGE_FORMATS
+from lyrichords.instruments import STRING_INSTRUMENTS
+from lyrichords.song import Song
+
+songs = [Song.parse(text.split("\n")) for text in getExampleTexts().values()] * args.nb_copies
+for backend in args.backends.split(","):
+    drawer = SongDrawer(backend=backend, page_format=PAGE_FORMATS.A5, chords_all_pages=True,
+                        instrument=STRING_INSTRUMENTS.GUITAR_EADGBE.value)
+    # Cold cache for each backend (revisions without the cache only report the duration)
+    cache = layout.DiagramsCache() if hasattr(layout, "DiagramsCache") else None
+    if cache is not None:
+        layout._diagrams_cache = cache
+    start = time.perf_counter()
+    nb_pages = sum(drawer.write(song, io.BytesIO()) for song in songs)
+    duration = time.perf_counter() - start
+    line = f"{backend:10s} {len(songs):3d} songs {nb_pages:3d} pages {duration:6.2f} s {nb_pages / duration:6.1f} pages/s"
+    if cache is not None:
+        line += f" diagrams: {cache.hits} hits {cache.misses} misses ({cache.getHitRate():.0%})"
+    print(line)
@@ -0,0 +1,28 @@
+"""
+Parse-only benchmark: time of Song.parse on a library (the bundled examples replicated)
+and the share of it spent classifying the lines (Song.isChordsLine)
+"""
+from common import parseArguments, getLibraryLines, bestOf
+
+args = parseArguments(__doc__, lambda parser: parser.add_argument("--songs", type=int, default=2000,
+                                                                  help="Number of songs of the library"))
+from lyrichords.song import Song
+
+library = getLibraryLines(args.songs)
+lines = [line for song_lines in library for line in song_lines if line.strip()]
+
+
+def parseSongs():
+    for song_lines in library:
+        Song.parse(song_lines)
+
+
+def classifyLines():
+    for line in lines:
+        Song.isChordsLine(line)
+
+
+parse = bestOf(parseSongs)
+classify = bestOf(classifyLines)
+print(f"{args.songs} songs, {len(lines)} lines: Song.parse {parse / args.songs * 1000:.3f} ms/song, "
+      f"isChordsLine {classify / args.songs * 1000:.3f} ms/song ({classify / parse:.0%} of the parse)")
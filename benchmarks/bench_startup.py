@@ -0,0 +1,44 @@
+"""
+Wall time of cold runs of LyricsChords.py (one process per run): --help, an argument error
+and the render of the first page of a song (compartir.txt) per backend, median of the runs
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from common import parseArguments, ROOT_PATH, EXAMPLES_PATH
+
+args = parseArguments(__doc__, lambda parser: (
+    parser.add_argument("--script", type=str, default=ROOT_PATH.joinpath("LyricsChords.py").as_posix(),
+                        help="LyricsChords.py script to run"),
+    parser.add_argument("--nb_runs", type=int, default=5, help="Runs of each command"),
+    parser.add_argument("--backends", type=str, default="matplotlib,pdf", help="Backends measured, separated by commas"),
+))
+# The script imports the package of --lib
+env = dict(os.environ, PYTHONPATH=os.pathsep.join([args.lib] + os.environ.get("PYTHONPATH", "").split(os.pathsep)))
+
+
+def runScript(arguments) -> float:
+    """
+    Median wall time (s) of the runs of the script
+    """
+    durations = []
+    for _ in range(args.nb_runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, args.script] + arguments, env=env, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+with tempfile.TemporaryDirectory() as folder:
+    song_path = shutil.copy(EXAMPLES_PATH.joinpath("compartir.txt"), folder)
+    output_path = os.path.join(folder, "compartir.pdf")
+    print(f"--help                {runScript(['--help']) * 1000:6.0f} ms")
+    print(f"argument error        {runScript(['--page_format']) * 1000:6.0f} ms")
+    for backend in args.backends.split(","):
+        duration = runScript([song_path, "--output", output_path, "--backend", backend, "--force"])
+        print(f"first page {backend:10s} {duration * 1000:6.0f} ms")
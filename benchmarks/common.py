@@ -0,0 +1,58 @@
+"""
+Helpers of the benchmarks. They are run from any folder, --lib selects the lyrichords package to measure,
+eg: the one of another revision to compare with (git archive <revision> lib | tar -x -C /tmp/old)
+"""
+import argparse
+import os
+import pathlib
+import sys
+import time
+# Typing
+from typing import Callable, Dict, List
+
+ROOT_PATH = pathlib.Path(__file__).absolute().parent.parent
+EXAMPLES_PATH = ROOT_PATH.joinpath("examples")
+
+
+def parseArguments(description: str, add_arguments: Callable[[argparse.ArgumentParser], None] = None) -> argparse.Namespace:
+    """
+    Arguments of a benchmark, the lyrichords package of --lib is imported by the next imports
+    """
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--lib", type=str, default=ROOT_PATH.joinpath("lib").as_posix(),
+        help="Folder of the lyrichords package to measure"
+    )
+    if add_arguments is not None:
+        add_arguments(parser)
+    args = parser.parse_args()
+    sys.path.insert(0, args.lib)
+    os.environ.setdefault("MPLBACKEND", "agg")
+    return args
+
+
+def getExampleTexts() -> Dict[str, str]:
+    """
+    Bundled example songs: file name (without extension) -> text
+    """
+    return {path.stem: path.read_text() for path in sorted(EXAMPLES_PATH.glob("*.txt"))}
+
+
+def getLibraryLines(nb_songs: int) -> List[List[str]]:
+    """
+    Lines of a library of nb_songs songs: the bundled examples replicated
+    """
+    texts = list(getExampleTexts().values())
+    return [texts[k % len(texts)].split("\n") for k in range(nb_songs)]
+
+
+def bestOf(function: Callable[[], object], repeat: int = 3) -> float:
+    """
+    Shortest duration (s) of repeat calls of function
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
@@ -0,0 +1,468 @@
+from .song import Song
+from .common import Notation
+from .instruments import getInstrument
+from .cache import getContentHash, writeAtomically
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+import json
+import logging
+import os
+import pathlib
+import signal
+import threading
+import time
+# Typing
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# The drawing module (and matplotlib) is only imported once a song has to be rendered,
+# so that checking a build already up to date stays fast
+
+# Build manifest written in each output folder
+MANIFEST_NAME = ".lyrichords_manifest.json"
+MANIFEST_FORMAT_VERSION = 1
+# Watch mode: seconds between two checks of the input files, and seconds a file must stay
+# unchanged before it is rendered (editors may write a file in several steps)
+WATCH_INTERVAL = 0.25
+WATCH_DEBOUNCE = 0.25
+
+
+def createDrawer(design: Dict[str, Any]) -> "SongDrawer":
+    """
+    Drawer from the options of the command line, the instrument and the page format given by name
+    """
+    from .drawing import SongDrawer, PAGE_FORMATS
+    design = dict(design)
+    design["instrument"] = getInstrument(design["instrument"])
+    design["page_format"] = PAGE_FORMATS[design["page_format"]]
+    if design.get("notation") is not None:
+        design["notation"] = Notation(design["notation"])
+    return SongDrawer(**design)
+
+
+@dataclass(frozen=True)
+class SongJob:
+    in_file: str
+    out_file: str
+
+
+@dataclass(frozen=True)
+class SongResult:
+    job: SongJob
+    duration: float # s
+    nb_pages: int = 0
+    error: Optional[str] = None
+    # Output up to date with the build manifest, not rendered again
+    skipped: bool = False
+
+    def isSuccess(self) -> bool:
+        return self.error is None
+
+
+def listJobs(in_path: str, out_path: Optional[str] = None, extension: str = ".pdf") -> List[SongJob]:
+    """
+    Songs to render depending on the input path is a specific file or a folder, and the output path
+    a file (with the extension of the output format) or a folder [default: next to the input files]
+    """
+    jobs: List[SongJob] = []
+    in_path = pathlib.Path(in_path)
+    out_path = None if out_path is None else pathlib.Path(out_path)
+    if in_path.is_file():
+        if out_path is None:
+            # Get the folder and name of the input file and generate a pdf file there
+            out_temp = pathlib.Path(in_path.parent, in_path.stem + extension)
+            jobs.append(SongJob(str(in_path), str(out_temp)))
+        elif out_path.suffix.lower() == extension:
+            jobs.append(SongJob(str(in_path), str(out_path)))
+        else:
+            # Assuming the path is a folder
+            out_temp = pathlib.Path(out_path, in_path.stem + extension)
+            jobs.append(SongJob(str(in_path), str(out_temp)))
+    elif in_path.is_dir():
+        # Only consider the files in the current folder (not sub directories)
+        for filename in sorted(os.listdir(str(in_path))):
+            p = pathlib.Path(in_path, filename)
+            if p.is_file():
+                ext = p.suffix.lower()
+                if ext == ".txt":
+                    if out_path is None:
+                        # Get the folder and name of the input file and generate a pdf file there
+                        out_temp = pathlib.Path(p.parent, p.stem + extension)
+                        jobs.append(SongJob(str(p), str(out_temp)))
+                    elif out_path.suffix.lower() == extension:
+                        raise ValueError("If you provide a folder as an input, you must set the path of folder for the output")
+                    else:
+                        # Assuming the path is a folder
+                        out_temp = pathlib.Path(out_path, p.stem + extension)
+                        jobs.append(SongJob(str(p), str(out_temp)))
+    return jobs
+
+
+def _raiseTimeout(signum, frame):
+    raise TimeoutError("The song took too long to render")
+
+
+# True once the timeouts ignored by this process are reported
+_TIMEOUT_IGNORED_LOGGED = False
+
+
+class Deadline():
+    """
+    Raises a TimeoutError in the code run under the "with" statement after timeout seconds (0: no limit).
+    It needs SIGALRM in the main thread: elsewhere (other threads, Windows) the timeout is ignored with a warning.
+    """
+    def __init__(self, timeout: float):
+        global _TIMEOUT_IGNORED_LOGGED
+        self.timeout: float = timeout
+        self._previous_handler = None
+        if (timeout > 0) and not (hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()):
+            if not _TIMEOUT_IGNORED_LOGGED:
+                logger.warning("The render timeouts are ignored: they need SIGALRM and the main thread")
+                _TIMEOUT_IGNORED_LOGGED = True
+            self.timeout = 0
+
+    def __enter__(self) -> "Deadline":
+        if self.timeout > 0:
+            self._previous_handler = signal.signal(signal.SIGALRM, _raiseTimeout)
+            signal.setitimer(signal.ITIMER_REAL, self.timeout)
+        return self
+
+    def __exit__(self, *args):
+        if self.timeout > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler)
+
+
+class SongRenderer():
+    """
+    Renders songs to PDF files with the same drawer, a song failing (or taking more than timeout seconds,
+    see Deadline) does not stop the others
+    """
+    def __init__(self, drawer: "SongDrawer", background: Optional[str] = None, timeout: float = 0):
+        self.drawer: "SongDrawer" = drawer
+        self.background: Optional[str] = background
+        self.timeout: float = timeout
+
+    def render(self, job: SongJob) -> SongResult:
+        start = time.perf_counter()
+        try:
+            with Deadline(self.timeout):
+                song = Song.fromFile(job.in_file)
+                logger.debug(song)
+                os.makedirs(pathlib.Path(job.out_file).parent.as_posix(), exist_ok=True)
+                logger.info(f"Saving file: {job.out_file}")
+                nb_pages = self.drawer.write(song, job.out_file, self.background)
+        except Exception as e:
+            import matplotlib.pyplot as plt
+            plt.close("all")
+            return SongResult(job, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+        return SongResult(job, time.perf_counter() - start, nb_pages)
+
+
+# Renderer of a worker process of the pool
+_WORKER_RENDERER: Optional[SongRenderer] = None
+
+
+def _initWorker(design: Dict[str, Any], background: Optional[str], timeout: float, images: List["ArrayDescriptor"]):
+    from .drawing import addImagesPixels
+    from .shared import attachArrays
+    global _WORKER_RENDERER
+    # Ctrl+C is handled by the main process, which stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The images decoded by the main process
+    addImagesPixels(attachArrays(images))
+    drawer = createDrawer(design)
+    drawer.preload()
+    _WORKER_RENDERER = SongRenderer(drawer, background, timeout)
+
+
+def _renderInWorker(job: SongJob) -> SongResult:
+    return _WORKER_RENDERER.render(job)
+
+
+def getBuildRecord(design: Dict[str, Any], background: Optional[str]) -> Dict[str, Any]:
+    """
+    What the songs are rendered from, except their text: the design options, the hash of
+    the frets of the instrument (before any song is drawn) and the hash of the background image
+    """
+    record = {
+        "design": design,
+        "instrument": getInstrument(design["instrument"]).getHash(),
+        "background": None if background is None else getContentHash(pathlib.Path(background).read_bytes()),
+    }
+    # Round trip through json so that the records compare equal to the ones read from the manifest
+    return json.loads(json.dumps(record))
+
+
+def getSongRecord(job: SongJob, build: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        with open(job.in_file, "rb") as f:
+            input_hash = getContentHash(f.read())
+    except OSError:
+        # Rendered anyway, the error is reported by the rendering
+        input_hash = None
+    return dict(build, input=os.path.abspath(job.in_file), input_hash=input_hash)
+
+
+class BuildManifest():
+    """
+    Record of the inputs each PDF file of an output folder was rendered from (see getSongRecord),
+    stored in the folder so that the next builds only render the songs whose inputs changed
+    """
+    def __init__(self, directory: str):
+        self.path: pathlib.Path = pathlib.Path(directory, MANIFEST_NAME)
+        # Name of the output file -> record
+        self.songs: Dict[str, Dict[str, Any]] = {}
+        self.changed: bool = False
+
+    def load(directory: str) -> "BuildManifest":
+        manifest = BuildManifest(directory)
+        try:
+            content = json.loads(manifest.path.read_bytes())
+            if content.get("version") == MANIFEST_FORMAT_VERSION:
+                manifest.songs = content["songs"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Fail to read the build manifest {manifest.path}, all the songs are rendered: {e}")
+        return manifest
+
+    def isUpToDate(self, job: SongJob, record: Dict[str, Any]) -> bool:
+        return ((record["input_hash"] is not None) and (self.songs.get(os.path.basename(job.out_file)) == record)
+                and os.path.isfile(job.out_file))
+
+    def setSong(self, job: SongJob, record: Dict[str, Any]):
+        self.songs[os.path.basename(job.out_file)] = record
+        self.changed = True
+
+    def removeSong(self, job: SongJob):
+        if self.songs.pop(os.path.basename(job.out_file), None) is not None:
+            self.changed = True
+
+    def removeStaleSongs(self):
+        """
+        Removes the output files whose input file does not exist anymore
+        """
+        for name, record in list(self.songs.items()):
+            if os.path.isfile(record["input"]):
+                continue
+            out_path = pathlib.Path(self.path.parent, name)
+            logger.info(f"Removing file of a deleted song: {out_path}")
+            try:
+                out_path.unlink()
+            except FileNotFoundError:
+                pass
+            del self.songs[name]
+            self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        content = json.dumps({"version": MANIFEST_FORMAT_VERSION, "songs": self.songs}, indent=1).encode()
+        try:
+            writeAtomically(self.path, lambda f: f.write(content))
+            self.changed = False
+        except OSError as e:
+            logger.warning(f"Fail to write the build manifest {self.path}: {e}")
+
+
+def _getManifest(manifests: Dict[str, BuildManifest], job: SongJob) -> BuildManifest:
+    """
+    Manifest of the output folder of the job, loaded (and cleaned of the deleted songs) the first time
+    """
+    directory = os.path.dirname(os.path.abspath(job.out_file))
+    if directory not in manifests:
+        manifests[directory] = BuildManifest.load(directory)
+        manifests[directory].removeStaleSongs()
+    return manifests[directory]
+
+
+def _renderJobs(
+        jobs: List[SongJob],
+        design: Dict[str, Any],
+        background: Optional[str],
+        nb_processes: int,
+        timeout: float) -> Iterator[SongResult]:
+    """
+    Results of the jobs in their order, rendered in this process or by nb_processes worker processes
+    """
+    if len(jobs) == 0:
+        return
+    # Built before starting the workers, so that a wrong design fails once
+    drawer = createDrawer(design)
+    if nb_processes == 1:
+        renderer = SongRenderer(drawer, background, timeout)
+        for job in jobs:
+            yield renderer.render(job)
+        return
+    from .drawing import getImagesPixels
+    from .shared import SharedArrays
+    logger.info(f"Rendering {len(jobs)} songs with {nb_processes} processes")
+    # The images drawn on every page are decoded once, the workers map them from the shared memory
+    try:
+        drawer.writer.loadImages(background)
+    except Exception as e:
+        # Reported by each song
+        logger.warning(f"The images cannot be loaded: {type(e).__name__}: {e}")
+    with SharedArrays(getImagesPixels()) as images, ProcessPoolExecutor(
+            nb_processes, initializer=_initWorker, initargs=(design, background, timeout, images.descriptors)) as executor:
+        futures = [executor.submit(_renderInWorker, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool as e:
+                # A worker died (crash, out of memory...): the songs it did not finish are lost
+                yield SongResult(job, 0, error=f"{type(e).__name__}: {e}")
+
+
+def _logResult(result: SongResult, index: int, nb_jobs: int):
+    name = pathlib.Path(result.job.in_file).name
+    if result.isSuccess():
+        logger.info(f"[{index + 1}/{nb_jobs}] {name}: {result.nb_pages} page(s) in {result.duration:.2f} s")
+    else:
+        logger.error(f"[{index + 1}/{nb_jobs}] {name} failed: {result.error}")
+
+
+def renderSongs(
+        jobs: List[SongJob],
+        design: Dict[str, Any],
+        background: Optional[str] = None,
+        nb_processes: int = 1,
+        timeout: float = 0,
+        force: bool = False) -> List[SongResult]:
+    """
+    Renders the songs with nb_processes worker processes (0: one per CPU), each building its drawer
+    and loading the fonts and the instrument once. The results are reported in the order of the jobs.
+    The songs whose output is up to date with the build manifest of its folder are skipped (unless force),
+    the outputs of the deleted songs are removed.
+    """
+    start = time.perf_counter()
+    build = getBuildRecord(design, background)
+    # Output folder -> its manifest
+    manifests: Dict[str, BuildManifest] = {}
+    results: List[Optional[SongResult]] = [None] * len(jobs)
+    records = []
+    indexes_todo = []
+    for index, job in enumerate(jobs):
+        records.append(getSongRecord(job, build))
+        if (not force) and _getManifest(manifests, job).isUpToDate(job, records[-1]):
+            results[index] = SongResult(job, 0, skipped=True)
+        else:
+            indexes_todo.append(index)
+    logger.info(f"{len(jobs) - len(indexes_todo)}/{len(jobs)} songs up to date")
+    if nb_processes <= 0:
+        nb_processes = os.cpu_count() or 1
+    nb_processes = max(1, min(nb_processes, len(indexes_todo)))
+    jobs_todo = [jobs[index] for index in indexes_todo]
+    try:
+        rendered = _renderJobs(jobs_todo, design, background, nb_processes, timeout)
+        for ind_todo, (index, result) in enumerate(zip(indexes_todo, rendered)):
+            results[index] = result
+            _logResult(result, ind_todo, len(indexes_todo))
+            manifest = _getManifest(manifests, result.job)
+            if result.isSuccess():
+                manifest.setSong(result.job, records[index])
+            else:
+                manifest.removeSong(result.job)
+    finally:
+        # The songs rendered are recorded even if the build is interrupted
+        for manifest in manifests.values():
+            manifest.save()
+    logSummary(results, time.perf_counter() - start)
+    return results
+
+
+def logSummary(results: List[SongResult], duration: float):
+    nb_skipped = sum(result.skipped for result in results)
+    nb_rendered = sum(result.isSuccess() and not result.skipped for result in results)
+    nb_pages = sum(result.nb_pages for result in results)
+    throughput = nb_rendered / duration if duration > 0 else 0
+    logger.info(f"Rendered {nb_rendered}/{len(results) - nb_skipped} songs ({nb_pages} pages) in {duration:.2f} s: "
+                f"{throughput:.2f} songs/s, {nb_skipped} up to date")
+    for result in results:
+        if not result.isSuccess():
+            logger.error(f"Failed: {result.job.in_file} ({result.error})")
+
+
+def _getFileSignature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def watchSongs(
+        in_path: str,
+        out_path: Optional[str],
+        design: Dict[str, Any],
+        background: Optional[str] = None,
+        nb_processes: int = 1,
+        timeout: float = 0,
+        force: bool = False,
+        interval: float = WATCH_INTERVAL,
+        debounce: float = WATCH_DEBOUNCE,
+        extension: str = ".pdf"):
+    """
+    Renders the songs (see renderSongs), then keeps a drawer loaded and renders again each song
+    whose file changed (once unchanged for debounce seconds) until interrupted.
+    The files are polled every interval seconds.
+    """
+    jobs = listJobs(in_path, out_path, extension)
+    # Input file -> signature when last rendered, signature last seen and time it was first seen
+    rendered = {job.in_file: _getFileSignature(job.in_file) for job in jobs}
+    seen = dict(rendered)
+    seen_times: Dict[str, float] = {}
+    # Before any song is rendered by this process: the record must be the one of a cold build
+    build = getBuildRecord(design, background)
+    renderSongs(jobs, design, background, nb_processes, timeout, force)
+    drawer = createDrawer(design)
+    drawer.preload()
+    renderer = SongRenderer(drawer, background, timeout)
+    manifests: Dict[str, BuildManifest] = {}
+    logger.info(f"Watching {in_path} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            jobs = listJobs(in_path, out_path, extension)
+            for job in jobs:
+                signature = _getFileSignature(job.in_file)
+                if signature != seen.get(job.in_file):
+                    seen[job.in_file] = signature
+                    seen_times[job.in_file] = time.perf_counter()
+                    continue
+                if (signature == rendered.get(job.in_file)) or (time.perf_counter() - seen_times[job.in_file] < debounce):
+                    continue
+                rendered[job.in_file] = signature
+                manifest = _getManifest(manifests, job)
+                record = getSongRecord(job, build)
+                if (not force) and manifest.isUpToDate(job, record):
+                    logger.debug(f"{job.in_file} changed but its content did not")
+                    continue
+                result = renderer.render(job)
+                if result.isSuccess():
+                    latency = time.time() - signature[0] / 1e9
+                    logger.info(f"{pathlib.Path(job.in_file).name}: {result.nb_pages} page(s) rendered in "
+                                f"{result.duration:.2f} s, {latency:.2f} s after the file was saved")
+                    manifest.setSong(job, record)
+                else:
+                    logger.error(f"{pathlib.Path(job.in_file).name} failed: {result.error}")
+                    manifest.removeSong(job)
+                manifest.save()
+            # Deleted songs
+            in_files = set(job.in_file for job in jobs)
+            deleted = [in_file for in_file in rendered if in_file not in in_files]
+            for in_file in deleted:
+                logger.info(f"{in_file} was deleted")
+                del rendered[in_file]
+                seen.pop(in_file, None)
+                seen_times.pop(in_file, None)
+            if len(deleted) > 0:
+                for manifest in manifests.values():
+                    manifest.removeStaleSongs()
+                    manifest.save()
+    except KeyboardInterrupt:
+        logger.info("Stop watching")
@@ -0,0 +1,87 @@
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+# Typing
+from typing import Callable, IO
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the folder of the caches
+CACHE_DIR_ENV = "LYRICHORDS_CACHE_DIR"
+
+
+def getCacheDirectory(name: str) -> pathlib.Path:
+    """
+    Folder of the cache 'name', created if needed:
+    $LYRICHORDS_CACHE_DIR/name, $XDG_CACHE_HOME/lyrichords/name or ~/.cache/lyrichords/name
+    """
+    root = os.environ.get(CACHE_DIR_ENV)
+    if not root:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or pathlib.Path(pathlib.Path.home(), ".cache")
+        root = pathlib.Path(xdg_cache, "lyrichords")
+    path = pathlib.Path(root, name)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def getContentHash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def getDefaultFileMode() -> int:
+    """
+    Mode of the files created by open (0666 without the bits of the umask)
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def writeAtomically(path: pathlib.Path, write: Callable[[IO[bytes]], None]) -> None:
+    """
+    Writes a file through a temporary file of the same folder, so that the other processes
+    reading the cache never see a partially written file. The file gets the mode of the files
+    created by open, not the private mode of the temporary files.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=pathlib.Path(path).parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.chmod(tmp_path, getDefaultFileMode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def touch(path: pathlib.Path) -> None:
+    """
+    Marks a cached file as recently used (the cache may be read only)
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evictOldFiles(directory: pathlib.Path, max_files: int, pattern: str = "*") -> None:
+    """
+    Removes the least recently used files (matching pattern) of a cache folder to keep at most max_files
+    """
+    files = []
+    for path in pathlib.Path(directory).glob(pattern):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except OSError:
+            # Removed by another process
+            continue
+    files.sort()
+    for _, path in files[:max(0, len(files) - max_files)]:
+        logger.debug(f"Removing from the cache: {path}")
+        try:
+            path.unlink()
+        except OSError:
+            pass
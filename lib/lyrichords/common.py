@@ -1,5 +1,7 @@
 from enum import Enum
 import logging
+# Typing
+from typing import Dict, Tuple
 
 # Get Logger
 logger = logging.getLogger(__name__)
@@ -73,23 +75,117 @@ class Suffix(Enum):
     SEVEN_SUS_FORTH = "7sus4"
 
 
+# Intervals (in semitones from the root) of the notes of each suffix
+SUFFIX_INTERVALS: Dict[Suffix, Tuple[int, ...]] = {
+    Suffix.MAJOR: (0, 4, 7),
+    Suffix.MINOR: (0, 3, 7),
+    Suffix.AUG: (0, 4, 8),
+    Suffix.DIM: (0, 3, 6),
+    Suffix.SEVEN: (0, 4, 7, 10),
+    Suffix.MINOR_SEVEN: (0, 3, 7, 10),
+    Suffix.MAJOR_SEVEN: (0, 4, 7, 11),
+    Suffix.SIX: (0, 4, 7, 9),
+    Suffix.MINOR_SIX: (0, 3, 7, 9),
+    Suffix.ADD_NINE: (0, 4, 7, 14),
+    Suffix.MINOR_NINE: (0, 3, 7, 10, 14),
+    Suffix.NINE: (0, 4, 7, 10, 14),
+    Suffix.SUS_SECOND: (0, 2, 7),
+    Suffix.SUS_FORTH: (0, 5, 7),
+    Suffix.SEVEN_SUS_FORTH: (0, 5, 7, 10),
+}
+
+# Alternative spellings of the suffixes (compared case insensitively)
+SUFFIX_SYNONYMS: Dict[Suffix, Tuple[str, ...]] = {
+    Suffix.MINOR: ("min", ),
+    Suffix.AUG: ("+", ),
+    Suffix.DIM: ("°", ),
+    Suffix.MINOR_SEVEN: ("min7", ),
+    Suffix.MAJOR_SEVEN: ("7M", "ma7", "Δ", "Δ7"),
+    Suffix.MINOR_SIX: ("min6", ),
+    Suffix.ADD_NINE: ("add2", ),
+    Suffix.MINOR_NINE: ("min9", ),
+    Suffix.SUS_FORTH: ("sus", ),
+    Suffix.SEVEN_SUS_FORTH: ("7sus", ),
+}
+
+# Alternative spellings where the case matters: "CM7" is a major seventh
+# whereas "Cm7" is a minor seventh
+SUFFIX_SYNONYMS_CASE_SENSITIVE: Dict[str, Suffix] = {
+    "M7": Suffix.MAJOR_SEVEN,
+}
+
+
+def _buildChordNamesIndex() -> Dict[str, Tuple[Key, Alter, Suffix]]:
+    """
+    Upper-cased chord name -> (Key, Alter, Suffix), the first combination found wins
+    """
+    index = {}
+    for key in Key:
+        for notation in key.value[1:]:
+            for alter in Alter:
+                for suffix in Suffix:
+                    name = notation + alter.getName() + suffix.value
+                    index.setdefault(name.upper(), (key, alter, suffix))
+    # Synonyms are added afterwards so they never shadow an existing name
+    for key in Key:
+        for notation in key.value[1:]:
+            for alter in Alter:
+                for suffix, synonyms in SUFFIX_SYNONYMS.items():
+                    for synonym in synonyms:
+                        name = notation + alter.getName() + synonym
+                        index.setdefault(name.upper(), (key, alter, suffix))
+    return index
+
+
+CHORD_NAMES_INDEX: Dict[str, Tuple[Key, Alter, Suffix]] = _buildChordNamesIndex()
+
+
 class Chord():
-    def __init__(self, key: Key, alter: Alter, suffix: Suffix, bass_key: Key = None, bass_alter: Alter = None):
-        self.key: Key = key
-        self.alter: Alter = alter
-        self.suffix: Suffix = suffix
-        self.bass_key: Key = bass_key
-        self.bass_alter: Alter = bass_alter
-        height = self.key.getHeight()
-        height += self.alter.getHeightAlter()
+    """
+    Immutable chord, instances are interned: parsing or creating the same chord
+    twice returns the same object, shared by the songs and the instruments.
+    """
+    __slots__ = ("key", "alter", "suffix", "bass_key", "bass_alter", "_height", "_bass_height", "_identity", "_hash")
+    _instances: Dict[Tuple[Key, Alter, Suffix, Key, Alter], "Chord"] = {}
+
+    def __new__(cls, key: Key, alter: Alter, suffix: Suffix, bass_key: Key = None, bass_alter: Alter = None):
+        spelling = (key, alter, suffix, bass_key, bass_alter)
+        chord = cls._instances.get(spelling)
+        if chord is not None:
+            return chord
+        chord = super().__new__(cls)
+        height = key.getHeight()
+        height += alter.getHeightAlter()
         # In order to get an height only between 0 and 11 (12 = 0 = C)
-        self._height: int = height % 12
+        height = height % 12
         # If it's a slashed chord
-        self._bass_height: int = None
-        if (self.bass_key is not None) and (self.bass_alter is not None):
-            bass_height = self.bass_key.getHeight()
-            bass_height += self.bass_alter.getHeightAlter()
-            self._bass_height = bass_height % 12
+        bass_height = None
+        if (bass_key is not None) and (bass_alter is not None):
+            bass_height = bass_key.getHeight()
+            bass_height += bass_alter.getHeightAlter()
+            bass_height = bass_height % 12
+        # Enharmonic chords (C# and Db) are different instances but are equal
+        identity = (suffix, height, bass_height)
+        object.__setattr__(chord, "key", key)
+        object.__setattr__(chord, "alter", alter)
+        object.__setattr__(chord, "suffix", suffix)
+        object.__setattr__(chord, "bass_key", bass_key)
+        object.__setattr__(chord, "bass_alter", bass_alter)
+        object.__setattr__(chord, "_height", height)
+        object.__setattr__(chord, "_bass_height", bass_height)
+        object.__setattr__(chord, "_identity", identity)
+        object.__setattr__(chord, "_hash", hash(identity))
+        return cls._instances.setdefault(spelling, chord)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Chord is immutable, cannot set '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Chord is immutable, cannot delete '{name}'")
+
+    def __reduce__(self):
+        # Unpickling goes through __new__ so the chord is interned in the target process too
+        return (Chord, (self.key, self.alter, self.suffix, self.bass_key, self.bass_alter))
 
     def __str__(self):
         name = self.key.getAlphabeticalName() + self.alter.getName() + self.suffix.value
@@ -114,32 +210,63 @@ class Chord():
             name += '/' + self.bass_key.getName(notation) + self.bass_alter.getName()
         return name
 
-    def parse(name: str) -> "Chord":
+    def _lookupName(name: str) -> Tuple[Key, Alter, Suffix]:
+        for synonym, suffix in SUFFIX_SYNONYMS_CASE_SENSITIVE.items():
+            if name.endswith(synonym):
+                root = CHORD_NAMES_INDEX.get(name[:-len(synonym)].upper())
+                if (root is not None) and (root[2] == Suffix.MAJOR):
+                    return (root[0], root[1], suffix)
+        return CHORD_NAMES_INDEX.get(name.upper())
+
+    def tryParse(name: str) -> "Chord":
+        """
+        Same as parse but returns None instead of raising if the name is not a chord
+        """
         bass_key = None
         bass_alter = None
-        chordname = name
-        if '/' in name:
-            chordname, bass_name = name.split('/')
-            bass_note = Chord.parse(bass_name)
-            bass_key = bass_note.key
-            bass_alter = bass_note.alter
-        for key in Key:
-            for notation in key.value[1:]:
-                for alter in Alter:
-                    for suffix in Suffix:
-                        tmp_name = notation.upper() + alter.getName().upper() + suffix.value.upper()
-                        if tmp_name == chordname.upper():
-                            return Chord(key, alter, suffix, bass_key, bass_alter)
-        raise ValueError(f"Fail to parse chord: {name}")
+        # Slashed chord grammar: <chord>[/<bass>]
+        chordname, slash, bass_name = name.partition('/')
+        if slash:
+            bass_note = Chord._lookupName(bass_name)
+            if bass_note is None:
+                return None
+            bass_key, bass_alter, _ = bass_note
+        chord = Chord._lookupName(chordname)
+        if chord is None:
+            return None
+        key, alter, suffix = chord
+        return Chord(key, alter, suffix, bass_key, bass_alter)
+
+    def parse(name: str) -> "Chord":
+        chord = Chord.tryParse(name)
+        if chord is None:
+            raise ValueError(f"Fail to parse chord: {name}")
+        return chord
 
     def getHeight(self) -> int:
         return self._height
 
+    def getBassHeight(self) -> int:
+        """
+        Height of the bass note, the root if it's not a slashed chord
+        """
+        return self._height if self._bass_height is None else self._bass_height
+
+    def getNotesHeights(self) -> Tuple[int, ...]:
+        """
+        Heights (between 0 and 11) of the notes of the chord, the root first
+        """
+        heights = tuple((self._height + interval) % 12 for interval in SUFFIX_INTERVALS[self.suffix])
+        if (self._bass_height is not None) and (self._bass_height not in heights):
+            heights += (self._bass_height, )
+        return heights
+
     def __eq__(self, other: "Chord"):
-        suffix_eq = self.suffix == other.suffix
-        height_eq = self.getHeight() == other.getHeight()
-        bass_eq = self._bass_height == other._bass_height
-        return suffix_eq and height_eq and bass_eq
+        if self is other:
+            return True
+        if not isinstance(other, Chord):
+            return NotImplemented
+        return self._identity == other._identity
 
     def __hash__(self):
-        return hash((self.suffix, self._height, self._bass_height))
+        return self._hash
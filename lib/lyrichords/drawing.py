@@ -1,47 +1,41 @@
 from .instruments import StringInstrument
-from .common import Notation, Chord
-from .song import Song, Verse
+from .common import Notation
+from .song import Song
+from .metrics import TextMeasurer, getFontRegistry
+from .layout import SongLayout, SongPlan, PagePlan, ChordsPanelPlan, ChordDiagram, ChordAnchor, LinePlan, TextItem, Box, mm2font
 import numpy as np
 from PIL import Image as PImage
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
 import matplotlib.patches as mpatches
 import matplotlib.colors as mcolors
-from matplotlib.transforms import Bbox
+from matplotlib.transforms import Bbox, TransformedBbox
+from matplotlib.image import AxesImage
+from matplotlib.path import Path
 from dataclasses import dataclass
 from enum import Enum
+import abc
 import logging
 import matplotlib.font_manager as fm
 import pathlib
 import os
-FONT_PATH = pathlib.Path(__file__).parent.absolute().joinpath("fonts")
+import weakref
 ASSET_PATH = pathlib.Path(__file__).parent.absolute().joinpath("assets")
 # Typing
-from matplotlib.figure import Figure
-from matplotlib.axes import Axes
-from matplotlib.text import Text
-from matplotlib.gridspec import SubplotSpec
-from matplotlib.artist import Artist
-from typing import List, Dict, Tuple
+from typing import TYPE_CHECKING, List, Dict, IO, Iterable, Iterator, Optional, Tuple, Type, Union
+if TYPE_CHECKING:
+    # Imported with pyplot, only by the matplotlib backend
+    from matplotlib.figure import Figure
+    from matplotlib.axes import Axes
+    from matplotlib.text import Text
 
 # Get Logger
 logger = logging.getLogger(__name__)
 
 
 def reload_fonts() -> None:
-    # Add the fonts from local path
-    existing_fonts = []
-    for font in fm.fontManager.ttflist:
-        existing_fonts.append(font.fname)
-    for root, _, files in os.walk(FONT_PATH):
-        for filename in files:
-            # Filepath
-            p = pathlib.Path(root, filename)
-            ext = p.suffix.lower()
-            if (ext in [".ttf", ".otf"]) and (str(p) not in existing_fonts):
-                fm.fontManager.addfont(str(p))
-                font_name = fm.FontProperties(fname=str(p)).get_name()
-                logger.info(f"Adding Font: {font_name}")
+    """
+    Adds the fonts from local path, scanned again only when the folder changes (see FontRegistry)
+    """
+    getFontRegistry().update()
 
 
 # Page formats in mm
@@ -59,46 +53,219 @@ def mm2inch(value):
     return value / 25.4
 
 
-def font2mm(fontsize):
-    return fontsize * 0.3527777778
+def savefig2PDF(
+        figs: Iterable["Figure"],
+        filepath: Union[str, IO[bytes]],
+        close_figs: bool = False,
+        create_out_path: bool = False) -> int:
+    """
+    Saves the figures (a list, or an iterator of figures drawn one at a time) as the pages of a PDF file
+    (path or binary file object), returns the number of pages
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+    import matplotlib.pyplot as plt
+    if create_out_path:
+        out_path = pathlib.Path(filepath).parent.as_posix()
+        os.makedirs(out_path, exist_ok=True)
+        logger.info(f"Saving file: {filepath}")
+    nb_pages = 0
+    with PdfPages(filepath) as pdf:
+        for fig in figs:
+            pdf.savefig(fig, dpi=400)
+            if close_figs:
+                plt.close(fig)
+            nb_pages += 1
+    return nb_pages
+
+
+class RenderBackend(abc.ABC):
+    """
+    Writes the pages planned by a drawer to a document, the backends are chosen by name (see getRenderBackend)
+    """
+    # Extension of the files written and media type of their content
+    extension: str = ".pdf"
+    content_type: str = "application/pdf"
+
+    def __init__(self, drawer: "SongDrawer"):
+        self.drawer: "SongDrawer" = drawer
+
+    def write(self, plan: SongPlan, filepath: Union[str, IO[bytes]], background: str = None) -> int:
+        """
+        Writes the pages of a plan to a file (path or binary file object), returns the number of pages
+        """
+        return self.writePages(plan.chordnames, plan.pages, filepath, background)
+
+    @abc.abstractmethod
+    def writePages(self, chordnames: Tuple[str, ...], pages: Iterable[PagePlan], filepath: Union[str, IO[bytes]],
+                   background: str = None) -> int:
+        """
+        Writes the pages of a song (see SongLayout.iterPages) to a file (path or binary file object)
+        as they come, returns the number of pages
+        """
+
+    def loadImages(self, background: str = None) -> None:
+        """
+        Decodes the images drawn on every page, so that the processes rendering the songs can share them
+        (see getImagesPixels), otherwise decoded while drawing the first page
+        """
+        pass
+
+
+class MatplotlibBackend(RenderBackend):
+    """
+    Draws each page as a matplotlib figure saved with PdfPages, the reference rendering.
+    The pages are saved and their figure closed one at a time, as they are laid out.
+    """
+    def writePages(self, chordnames: Tuple[str, ...], pages: Iterable[PagePlan], filepath: Union[str, IO[bytes]],
+                   background: str = None) -> int:
+        # The figures are closed by iterFigures
+        return savefig2PDF(self.drawer.iterFigures(chordnames, pages, background), filepath)
+
+    def loadImages(self, background: str = None) -> None:
+        getImagePixels(os.path.join(ASSET_PATH, "guitar.png"))
+        getImagePixels(os.path.join(ASSET_PATH, "capo.png"))
+        if background is not None:
+            area = SongLayout(self.drawer).getPageArea()
+            getBackgroundPixels(background, area.width, area.height, self.drawer.grayscale, self.drawer.background_opacity)
+
+
+def getRenderBackend(name: str) -> Type[RenderBackend]:
+    """
+    'matplotlib': the PDF of the figures saved by matplotlib (reference)
+    'pdf': the PDF content streams written directly from the plans (see pdf.PdfBackend)
+    'svg', 'html': the pages as SVG, in a single SVG document or in a HTML page (see svg.SvgBackend)
+    """
+    if name == "matplotlib":
+        return MatplotlibBackend
+    if name == "pdf":
+        from .pdf import PdfBackend
+        return PdfBackend
+    if name == "svg":
+        from .svg import SvgBackend
+        return SvgBackend
+    if name == "html":
+        from .svg import HtmlBackend
+        return HtmlBackend
+    raise ValueError(f"Unknown backend '{name}', it must be 'matplotlib', 'pdf', 'svg' or 'html'")
+
+
+# The background is drawn over the page with some transparency
+BACKGROUND_ZORDER = 10
+# Resolution of the background images (dpi), lower than the one of the pages as they are faded
+BACKGROUND_DPI = 150
 
-def mm2font(size):
-    return size / 0.3527777778
+# Pixels of the images drawn by this process, decoded by it or mapped from the shared memory of the main process
+# (see shared.SharedArrays): key of the image -> ((modification time, size), pixels)
+_images_pixels: Dict[Tuple, Tuple[Tuple[int, int], np.ndarray]] = {}
 
 
-def get_bboxs_union(ax: Axes, artists: List[Artist]) -> Bbox:
-    renderer = ax.figure.canvas.get_renderer()
-    bboxs = []
-    for artist in artists:
-        disp_bb = artist.get_tightbbox(renderer)
-        bb = disp_bb.transformed(ax.transData.inverted())
-        bboxs.append(bb)
-    bb = Bbox.union(bboxs)
-    return bb
+def _getFileVersion(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
 
-def get_artists_dimension(ax: Axes, artists: List[Artist]) -> Tuple[float, float]:
+
+def getImagePixels(path: str) -> np.ndarray:
     """
-    Returns (Width, Height)
+    Pixels of an image file (the icons), decoded once per process (and again when the file changes)
     """
-    bb = get_bboxs_union(ax, artists)
-    return((bb.x1 - bb.x0), (bb.y1 - bb.y0))
-
-def center_ax(ax: Axes):
-    if len(ax._children) == 0:
-        return
-    bb = get_bboxs_union(ax, ax._children)
-    x1, x2 = ax.get_xlim()
-    y1, y2 = ax.get_ylim()
-    xmiddle = x1 + ((x2 - x1) / 2)
-    ymiddle = y1 + ((y2 - y1) / 2)
-    xmiddle_new = bb.x0 + ((bb.x1 - bb.x0) / 2)
-    ymiddle_new = bb.y0 + ((bb.y1 - bb.y0) / 2)
-    x_offset = xmiddle_new - xmiddle
-    y_offset = ymiddle_new - ymiddle
-    ax.set_xlim([x1 + x_offset, x2 + x_offset])
-    ax.set_ylim([y1 + y_offset, y2 + y_offset])
+    version = _getFileVersion(path)
+    key = ("image", str(path))
+    if (key not in _images_pixels) or (_images_pixels[key][0] != version):
+        with PImage.open(path) as img:
+            pixels = np.array(img)
+        pixels.flags.writeable = False
+        _images_pixels[key] = (version, pixels)
+    return _images_pixels[key][1]
 
 
+def getBackgroundPixels(path: str, width: float, height: float, grayscale: bool = False, opacity: float = 1) -> np.ndarray:
+    """
+    RGBA pixels of a background image stretched to width x height mm at BACKGROUND_DPI (never upsampled), with
+    the grayscale and the opacity applied. The image is decoded once per process (and again when the file changes),
+    the JPEG files directly at the smallest scale larger than needed.
+    """
+    version = _getFileVersion(path)
+    key = ("background", str(path), width, height, grayscale, opacity)
+    if (key not in _images_pixels) or (_images_pixels[key][0] != version):
+        with PImage.open(path) as img:
+            size = (min(img.width, round(mm2inch(width) * BACKGROUND_DPI)),
+                    min(img.height, round(mm2inch(height) * BACKGROUND_DPI)))
+            img.draft("L" if grayscale else "RGB", size)
+            if grayscale:
+                img = img.convert("LA" if "A" in img.getbands() else "L")
+            if img.size != size:
+                img = img.resize(size, PImage.Resampling.LANCZOS)
+            pixels = np.array(img.convert("RGBA"))
+        pixels[..., 3] = np.round(pixels[..., 3] * opacity)
+        pixels.flags.writeable = False
+        _images_pixels[key] = (version, pixels)
+    return _images_pixels[key][1]
+
+
+def getImagesPixels() -> Dict[Tuple, Tuple[Tuple[int, int], np.ndarray]]:
+    """
+    Images decoded by this process, by key
+    """
+    return dict(_images_pixels)
+
+
+def addImagesPixels(images: Dict[Tuple, Tuple[Tuple[int, int], np.ndarray]]) -> None:
+    """
+    Images decoded by another process (see getImagesPixels), used as long as their file does not change
+    """
+    _images_pixels.update(images)
+
+
+class SharedImage(AxesImage):
+    """
+    RGBA image drawn unsampled by the vector backends from the same array on every page:
+    matplotlib stores the images of a PDF file by the identity of their array, so it is stored once
+    """
+    def __init__(self, ax: "Axes", pixels: np.ndarray, **kwargs):
+        super().__init__(ax, interpolation="none", **kwargs)
+        self.pixels: np.ndarray = pixels
+        self.set_data(pixels)
+
+    def make_image(self, renderer, magnification=1.0, unsampled=False):
+        im, l, b, trans = super().make_image(renderer, magnification, unsampled)
+        if unsampled and (im is not None) and (im.shape == self.pixels.shape):
+            # The whole image is drawn: the shared array instead of a copy
+            im = self.pixels
+        return (im, l, b, trans)
+
+
+class DiagramSprite():
+    """
+    Shapes of a chord diagram at the origin as arrays of vertices, computed once and moved to each copy of the diagram:
+    the unit rectangle scaled to each bar (frets and strings) and the unit circle scaled to each finger
+    """
+    def __init__(self, diagram: ChordDiagram):
+        boxes = np.array([(bar.x, bar.y, bar.width, bar.height) for bar in diagram.bars], dtype=float).reshape(-1, 1, 4)
+        self.bars: np.ndarray = Path.unit_rectangle().vertices * boxes[:, :, 2:] + boxes[:, :, :2]
+        fingers = np.array(diagram.fingers, dtype=float).reshape(-1, 1, 2)
+        self.fingers: np.ndarray = Path.unit_circle().vertices * diagram.finger_radius + fingers
+
+
+def getShapesPath(shapes: List[np.ndarray], unit: Path) -> Path:
+    """
+    Compound path of the copies of a unit path, from the arrays of their vertices (number of copies, vertices, 2)
+    """
+    vertices = np.concatenate(shapes)
+    return Path(vertices.reshape(-1, 2), np.tile(unit.codes, len(vertices)))
+
+
+# Chord diagram at the origin -> its sprite, kept as long as the diagram is used (see layout.DiagramsCache)
+_diagrams_sprites: "weakref.WeakKeyDictionary[ChordDiagram, DiagramSprite]" = weakref.WeakKeyDictionary()
+
+
+def getDiagramSprite(diagram: ChordDiagram) -> DiagramSprite:
+    origin = diagram.getOrigin()
+    sprite = _diagrams_sprites.get(origin)
+    if sprite is None:
+        sprite = DiagramSprite(origin)
+        _diagrams_sprites[origin] = sprite
+    return sprite
+
 
 # Generating using: https://mokole.com/palette.html
 DISTINCT_COLORS = {
@@ -200,105 +367,80 @@ class SongDrawer:
     lyrics_fontsize: float = 10
     lyrics_ha: str = "center"
     lyrics_nb_cols: int = 0
+    lyrics_wrap_mode: str = "greedy"
+    backend: str = "matplotlib"
 
     def __post_init__(self):
-        # Intermediary attributes
-        self.plyrics = {"fontfamily": self.lyrics_fontfamily, "fontsize": self.lyrics_fontsize, "horizontalalignment": self.lyrics_ha, "verticalalignment": "top"}
-        self.ptitle = {"fontfamily": self.title_fontfamily, "fontsize": self.title_fontsize, "horizontalalignment": "center", "verticalalignment": "center"}
-        self.pcomposer = {"fontfamily": self.composer_fontfamily, "fontsize": self.composer_fontsize, "horizontalalignment": "center", "verticalalignment": "center"}
         self.figsize = self.page_format.value
         if(not self.landscape):
             self.figsize = self.figsize[::-1]
         # Temporary attributes
-        self.figs: List[Figure] = []
-        self.ax_title: Axes = None
-        self.ax_chords: Axes = None
-        self.ax_lyrics: Axes = None
-        self.chords_colors: Dict[Chord, str] = {}
-        self.gs_lyrics: SubplotSpec = None
+        self.figs: List["Figure"] = []
+        self.chords_colors: Dict[str, str] = {}
         reload_fonts()
+        self.measurer = TextMeasurer()
+        self.writer: RenderBackend = getRenderBackend(self.backend)(self)
 
-    def _scaleAxis(self, ax: Axes, invert_yaxis: bool = True):
-        ax.set_facecolor("none")
-        ax.set_axis_off()
-        bb = ax.get_position()
-        width = (bb.get_points()[1][0] - bb.get_points()[0][0]) * self.figsize[0]
-        height = (bb.get_points()[1][1] - bb.get_points()[0][1]) * self.figsize[1]
-        ax.set_xlim([0, width])
-        ax.set_ylim([0, height])
-        if invert_yaxis:
-            ax.invert_yaxis()
-
-    def _getChordTitleHeight(self) -> float:
-        return font2mm(self.chords_fontsize)
-
-    def _getChordDimension(self, with_margin: bool = False) -> Tuple[float, float]:
+    def getFonts(self) -> List[Tuple[Optional[str], float, str]]:
         """
-        !!! The dimensions must match the one used during drawing.
+        Fonts of the texts of the design: (font family, fontsize, weight), None the default font of matplotlib
         """
-        nb_frets = self.instrument.getMaxFretsRange()
-        width = (self.instrument.getNbStrings() - 1) * self.chords_string_spacing + self.chords_string_width
-        title_height = self._getChordTitleHeight()
-        mute_strings_height = self.chords_fret_spacing
-        height = nb_frets * self.chords_fret_spacing + self.chords_first_fret_height + mute_strings_height + title_height
-        if with_margin:
-            width += 2 * self.chords_margin
-            height += 2 * self.chords_margin
-        return(width, height)
-
-    def _getInstrumentNameHeight(self):
-        return font2mm(self.lyrics_fontsize) * 2
-
-    def _getNbColumnRowChords(self, with_title: bool = True):
-        chord_width, chord_height = self._getChordDimension(with_margin=True)
-        nb_chords = len(self.chords_colors)
-        if self.design_vertical:
-            height = self.figsize[1]
-            height -= 2 * self.page_margin
-            height -= self._getInstrumentNameHeight()
-            if with_title:
-                height -= self.title_height
-            nb_rows = int(height / chord_height)
-            nb_columns = int(np.ceil(nb_chords / nb_rows))
-        else:
-            width = self.figsize[0]
-            width -= 2 * self.page_margin
-            nb_columns = int(width / chord_width)
-            nb_rows = int(np.ceil(nb_chords / nb_columns))
-        return(nb_rows, nb_columns)
-
-    def _addBackground(self, fig: Figure, background: str):
-        ax_background = fig.add_subplot(111)
-        self._scaleAxis(ax_background, invert_yaxis=True)
-        # Add the background
-        bg_img = plt.imread(background)[::-1, :, :]
-        gsopts = {}
-        if(self.grayscale):
-            bg_img = np.dot(bg_img[..., :3], [0.2989, 0.5870, 0.1140])
-            gsopts = {"cmap": 'gray', "vmin": 0, "vmax": 255.}
-        ax_background.imshow(bg_img, extent=[0, self.figsize[0] - 2 * self.page_margin, 0, self.figsize[1] - 2 * self.page_margin], alpha=self.background_opacity, **gsopts)
-
-    def _drawTitle(self, song: Song):
-        xmin, xmax = self.ax_title.get_xlim()
-        x_middle = (xmax - xmin ) / 2
-        self.ax_title.text(
-            x=x_middle,
-            y=self.title_height / 2.0,
-            s=f"{song.getTitle()} - {song.getArtist()}",
-            **self.ptitle
-        )
-        if(song.isComposerSet()):
-            self.ax_title.text(
-                x=x_middle,
-                y=self.title_height * 4.0 / 5.0,
-                s=f"Composed by: {song.getComposer()}",
-                **self.pcomposer)
-
-    def _drawChordBox(self, ax: Axes, x, y, chordname, fontsize) -> Text:
-        if self.notation is not None:
-            chordname = Chord.parse(chordname).getName(self.notation)
-        color = self.chords_colors[chordname]
-        return ax.text(x, y, chordname, size=fontsize, ha="center", va="center",
+        return [(self.title_fontfamily, self.title_fontsize, "normal"),
+                (self.composer_fontfamily, self.composer_fontsize, "normal"),
+                (self.lyrics_fontfamily, self.lyrics_fontsize, "normal"),
+                (None, self.lyrics_chords_fontsize, "normal"),
+                (None, self.chords_fontsize, "normal"),
+                (None, self.chords_fontsize, "bold"),
+                (None, mm2font(self.chords_string_spacing), "normal")]
+
+    def preload(self) -> None:
+        """
+        Loads the glyph metrics of the fonts of the design and the frets of the instrument,
+        otherwise loaded while drawing the first song
+        """
+        for fontfamily, fontsize, weight in self.getFonts():
+            metrics = self.measurer.getGlyphMetrics(fontfamily, fontsize, weight)
+            # Font file opened by FreeType, shared with the renderer
+            fm.get_font(metrics.fontpath)
+        self.instrument.load()
+
+    def layout(self, song: Song) -> SongPlan:
+        """
+        Places the song on pages without drawing it
+        """
+        return SongLayout(self).layout(song)
+
+    def getChordsColors(self, chordnames: Tuple[str, ...]) -> Dict[str, str]:
+        return {chordname: DISTINCT_COLORS[len(chordnames)][ind_chord] for ind_chord, chordname in enumerate(chordnames)}
+
+    def _addPageAxes(self, fig: "Figure") -> "Axes":
+        """
+        Axes covering the page, in mm from the top left corner
+        """
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.set_facecolor("none")
+        ax.set_axis_off()
+        ax.set_xlim([0, self.figsize[0]])
+        ax.set_ylim([self.figsize[1], 0])
+        return ax
+
+    def _addImage(self, ax: "Axes", data: np.ndarray, box: Box, **kwargs):
+        ax.imshow(data, extent=[box.x, box.x + box.width, box.y + box.height, box.y], aspect='auto', **kwargs)
+
+    def _addBackground(self, ax: "Axes", area: Box, background: str):
+        pixels = getBackgroundPixels(background, area.width, area.height, self.grayscale, self.background_opacity)
+        image = SharedImage(ax, pixels, extent=[area.x, area.x + area.width, area.y + area.height, area.y],
+                            zorder=BACKGROUND_ZORDER)
+        image.set_clip_path(ax.patch)
+        ax.add_image(image)
+
+    def _drawText(self, ax: "Axes", item: TextItem, **kwargs) -> "Text":
+        return ax.text(item.x, item.y, item.text, fontfamily=item.fontfamily, fontsize=item.fontsize,
+                       horizontalalignment=item.ha, verticalalignment=item.va, weight=item.weight, **kwargs)
+
+    def _drawChordBox(self, ax: "Axes", anchor: ChordAnchor) -> "Text":
+        color = self.chords_colors[anchor.chordname]
+        return self._drawText(ax, anchor.label,
             bbox=dict(
                     boxstyle="round",
                     ec=mcolors.to_rgb(color),
@@ -306,295 +448,96 @@ class SongDrawer:
                     )
         )
 
-    def _drawChords(self, song: Song, with_title: bool = True):
-        chord_width, chord_height = self._getChordDimension(with_margin=False)
-        nb_rows, nb_columns = self._getNbColumnRowChords(with_title)
-        chords = song.getChordsUsed()
-        if (nb_rows * nb_columns) < len(chords):
-            raise ValueError("Not enough space to draw all the chords")
-        chords_indexes = list(np.ndindex((nb_rows, nb_columns)))
-        xmin, ymin = np.inf, np.inf
-        xmax, ymax = -np.inf, -np.inf
-        for ind_chord, chordname in enumerate(chords.keys()):
-            ind_row, ind_col = chords_indexes[ind_chord]
-            # X and Y where to draw the chord
-            x_offset = ind_col * (chord_width + 2 * self.chords_margin)
-            y_offset = ind_row * (chord_height + 2 * self.chords_margin) + self._getInstrumentNameHeight()
-            if x_offset < xmin: xmin = x_offset
-            if y_offset < ymin: ymin = y_offset
-            if x_offset + chord_width > xmax: xmax = x_offset + chord_width
-            if y_offset + chord_height > ymax: ymax = y_offset + chord_height
-            # Draw Frets and Strings
-            title_height = self._getChordTitleHeight()
-            y_offset_chord = y_offset + title_height + self.chords_fret_spacing
-            nb_strings = self.instrument.getNbStrings()
-            nb_frets = self.instrument.getMaxFretsRange()
-            full_width = (self.instrument.getNbStrings() - 1) * self.chords_string_spacing + self.chords_string_width
-            self.ax_chords.add_patch(mpatches.Rectangle((x_offset, y_offset_chord), full_width, self.chords_first_fret_height, color="gray", linewidth=0))
-            y_offset_chord += self.chords_first_fret_height - (self.chords_fret_height / 2)
-            for k in range(1, nb_frets + 1):
-                y_temp = y_offset_chord + self.chords_fret_spacing * k - (self.chords_fret_height / 2)
-                self.ax_chords.add_patch(mpatches.Rectangle((x_offset, y_temp), full_width, self.chords_fret_height, color="gray", linewidth=0))
-            for k in range(0, nb_strings):
-                x_temp = x_offset + self.chords_string_spacing * k
-                self.ax_chords.add_patch(mpatches.Rectangle((x_temp, y_offset_chord), self.chords_string_width, nb_frets * self.chords_fret_spacing, color="gray", linewidth=0))
-            # Draw Chordname
-            self._drawChordBox(self.ax_chords, x_offset + chord_width / 2, y_offset, chordname, self.chords_fontsize)
-            # Draw Fingers
-            frets =  self.instrument.getFrets(chordname)[0]
-            if(self.lefthand):
-                frets = frets[::-1]
-            y_fret_zero = y_offset + title_height + self.chords_fret_spacing + self.chords_first_fret_height - (self.chords_fret_height / 2) + self.chords_fret_spacing / 2
-            x_string_zero = x_offset + self.chords_string_width / 2
-            offset = max(0, max([int(f) for f in frets if f.upper() != 'X']) - nb_frets)
-            if offset > 0:
-                self.ax_chords.text(x_string_zero - self.chords_string_spacing / 2, y_fret_zero, str(offset + 1), size=self.chords_fontsize, weight='bold', color="gray", ha="center", va="center")
-            for num_string, position in enumerate(frets):
-                xtemp = x_string_zero + num_string * self.chords_string_spacing
-                if(position.upper() in ["X", "0", "O"]):
-                    # Draw the muted strings
-                    y_offset_muted = y_offset + title_height + self.chords_fret_spacing / 2
-                    text = "o" if (position.lower() in ["0", "o"]) else position.lower()
-                    self.ax_chords.text(xtemp, y_offset_muted, text, size=mm2font(self.chords_string_spacing), ha="center", va="center", color="gray")
-                    continue
-                ytemp = y_fret_zero + (int(position) - 1 - offset) * self.chords_fret_spacing
-                self.ax_chords.add_artist(mpatches.Circle((xtemp, ytemp), self.chords_finger_radius, color="dimgray", zorder=1))
-        # Center the chords to the middle of the ax
-        center_ax(self.ax_chords)
-        self._drawChordsInstruAndMaster(song)
-
-    def _drawChordsInstruAndMaster(self, song: Song):
-        xmin, _ = self.ax_chords.get_xlim()
-        ymax, ymin = self.ax_chords.get_ylim()
-        ih = self._getInstrumentNameHeight()
-        self.ax_chords.set_ylim([ymax - ih / 2, ymin - ih / 2])
-        instru_str = f"{self.instrument.name}"
-        p = self.plyrics.copy()
-        p["horizontalalignment"] = "left"
-        p["verticalalignment"] = "center"
-        img = PImage.open(os.path.join(ASSET_PATH, "guitar.png"))
-        data_color = np.array(img)
-        self.ax_chords.imshow(data_color, extent=[xmin + 5, xmin + 10, ymin + 2, ymin - 3], aspect='auto', resample=False)
-        instru_text = self.ax_chords.text(xmin + 12, ymin, s=instru_str, **p)
-        no_capo = song.getCapo()
-        if no_capo > 0:
-            width, _ = get_artists_dimension(self.ax_chords, [instru_text])
-            img = PImage.open(os.path.join(ASSET_PATH, "capo.png"))
-            data_color = np.array(img)
-            self.ax_chords.imshow(data_color, extent=[xmin + width + 14, xmin + width + 19, ymin + 2, ymin - 3], aspect='auto', resample=False)
-            if no_capo == 0:
-                capo_str = "No Capo"
-            elif no_capo == 1:
-                capo_str = "Capo: 1st fret"
-            elif no_capo == 2:
-                capo_str = "Capo: 2nd fret"
-            elif no_capo == 3:
-                capo_str = "Capo: 3rd fret"
-            else:
-                capo_str = f"Capo: {no_capo}th fret"
-            self.ax_chords.text(xmin + width + 21, ymin, s=capo_str, **p)
-        
-
-    def _drawVerse(self, x: float, y: float, verse: Verse, with_chords: bool = True) -> Tuple[Text, List[Text], float]:
-        verse_text = verse.getTextLine()
-        ltext = self.ax_lyrics.text(x, y, s=verse_text, **self.plyrics)
-        lwidth, _ = get_artists_dimension(self.ax_lyrics, [ltext])
-        ctexts = []
-        mini, maxi = verse.getMinMaxIndex()
-        if with_chords:
-            y_chord = y - self.lyrics_line_spacing / 4
-            for chord in verse.getChords():
-                # I have to temporary plot the lyrics until the position of the chord to get
-                # its width rendered in the axes in order to print the chord name to the right
-                # place whatever the font chosen
-                ind = chord.index
-                if verse.emptyText():
-                    ind -= int((maxi - mini) / 2)
-                if ind < 0:
-                    temp_text = "x" * abs(ind)
-                elif(ind < len(verse_text)):
-                    temp_text = verse_text[:ind]
-                else:
-                    temp_text = verse_text + "x" * (ind - len(verse_text))
-                textplt = self.ax_lyrics.text(x, y, temp_text, **self.plyrics)
-                cwidth, _ = get_artists_dimension(self.ax_lyrics, [textplt])
-                if ind < 0:
-                    cwidth = -cwidth
-                x_chord = x + cwidth
-                if("horizontalalignment" in self.plyrics):
-                    if(self.plyrics["horizontalalignment"] == "center"):
-                        x_chord = x + cwidth - (lwidth / 2.0)
-                    elif(self.plyrics["horizontalalignment"] == "right"):
-                        x_chord = x - lwidth + cwidth
-                ctext = self._drawChordBox(self.ax_lyrics, x_chord, y_chord, chord.name, self.lyrics_chords_fontsize)
-                ctexts.append(ctext)
-                textplt.remove()
-        lwidth, _ = get_artists_dimension(self.ax_lyrics, [ltext] + ctexts)
-        return(ltext, ctexts, lwidth)
-    
-    def _drawVerseAutoWrapping(self,
-            x: float,
-            y: float,
-            verse: Verse,
-            width_available: float,
-            height_available: float,
-            texts: List[Text] = None,
-            nb_wraps: int = 0,
-            max_width: float = 0) -> Tuple[List[Text], int, float]:
-        if texts is None: texts = []
-        possible_cuts = verse.getPossibleCutIndexes()[::-1]
-        ind_cut = 0
-        ltext, ctexts, width = self._drawVerse(x, y, verse)
-        verse_2 = None
-        while(width > width_available):
-            ltext.remove()
-            for ctext in ctexts:
-                ctext.remove()
-            verse_1, verse_2 = verse.splitByIndex(possible_cuts[ind_cut])
-            ind_cut += 1
-            ltext, ctexts, width = self._drawVerse(x, y, verse_1)
-        if width > max_width:
-            max_width = width
-        texts.append(ltext)
-        texts += ctexts
-        height = (nb_wraps + 1) * self.lyrics_line_spacing
-        if height > height_available:
-            for text in texts:
-                text.remove()
-            return ([], 0, 0)
-        if verse_2 is not None:
-            nb_wraps += 1
-            return self._drawVerseAutoWrapping(x, y + self.lyrics_line_spacing, verse_2, width_available, height_available, texts, nb_wraps, max_width)
-        return(texts, nb_wraps, max_width)
-
-    def _drawLyricsAx(self, song: Song, ax: Axes, nb_verses_done: int) -> Tuple[int, int]:
-        margin = 3 # mm
-        full_width = ax.get_xlim()[1]
-        full_height = ax.get_ylim()[0]
-        x = 0 # if self.plyrics["horizontalalignment"] == "left" else full_width / 2
-        y = 0
-        max_width = 0
-        nb_verses_written = 0
-        nb_wraps_total = 0
-        for verse in song[nb_verses_done:]:
-            if verse.isEmpty():
-                nb_verses_written += 1
-                y += self.lyrics_line_spacing / 2
-                continue
-            logger.debug(f"Drawing verse {verse}")
-            texts, nb_wraps, lwidth = self._drawVerseAutoWrapping(x, y, verse, full_width - margin * 2, full_height - margin * 2 - y)
-            if lwidth > max_width:
-                max_width = lwidth
-            if texts == []:
-                break
-            nb_verses_written += 1
-            nb_wraps_total += nb_wraps
-            y += (nb_wraps + 1) * self.lyrics_line_spacing
-        # Center the lyrics to the middle of the ax
-        center_ax(ax)
-        return(nb_verses_written, nb_wraps_total)
-
-    def _drawLyrics(self, song: Song) -> bool:
-        nb_verses_total = len(song.getVerses())
-        nb_cols = 1 if (self.lyrics_nb_cols <= 0) else self.lyrics_nb_cols
-        nb_verses_written_past = 0
-        axs_past = []
-        while True:
-            logger.debug(f"Trying to draw verses with {nb_cols} columns")
-            nb_verses_written = 0
-            nb_wraps_total = 0
-            axs = []
-            subgs = gridspec.GridSpecFromSubplotSpec(1, nb_cols, subplot_spec=self.gs_lyrics)
-            for ind_col in range(0, nb_cols):
-                ax = self.figs[-1].add_subplot(subgs[ind_col])
-                self._scaleAxis(ax, invert_yaxis=True)
-                self.ax_lyrics = ax
-                _nb_verses_ax, _nb_wraps = self._drawLyricsAx(song, ax, self.nb_verses_already_draw + nb_verses_written)
-                nb_verses_written += _nb_verses_ax
-                nb_wraps_total += _nb_wraps
-                axs.append(ax)
-                if self.nb_verses_already_draw + nb_verses_written >= nb_verses_total:
-                    break
-            if(self.lyrics_nb_cols > 0):
-                # Clear the previous config and keep this current config
-                if len(axs_past) > 0:
-                    for ax in axs_past: ax.remove()
-                break
-            if(nb_wraps_total / nb_verses_written) > 0.2:
-                # Clear this config and Keep the previous one except if nb_cols == 1
-                if(nb_cols > 1):
-                    for ax in axs: ax.remove()
-                    nb_verses_written = nb_verses_written_past
-                break
-            if (self.nb_verses_already_draw + nb_verses_written >= nb_verses_total):
-                # Clear the previous config and keep this current config
-                if len(axs_past) > 0:
-                    for ax in axs_past: ax.remove()
-                break
-            if nb_verses_written <= nb_verses_written_past:
-                # Keep the previous config and clear this current one
-                for ax in axs: ax.remove()
-                nb_verses_written = nb_verses_written_past
-                break
-            nb_cols += 1
-            if len(axs_past) > 0:
-                for ax in axs_past: ax.remove()
-            axs_past = axs.copy()
-            nb_verses_written_past = nb_verses_written
-            
-        self.nb_verses_already_draw += nb_verses_written
-        if self.nb_verses_already_draw >= nb_verses_total:
-            self.nb_verses_already_draw = 0
-            return True
-        return False
-
-    def draw(self, song: Song, background: str = None):
-        self.nb_verses_already_draw = 0
+    def _drawChords(self, ax: "Axes", panel: ChordsPanelPlan):
+        # The shapes are clipped to the panel
+        clip_box = TransformedBbox(Bbox.from_extents(*panel.box.getExtent()), ax.transData)
+        # The shapes of all the diagrams drawn as two paths: the bars and the fingers
+        sprites = [(getDiagramSprite(diagram), np.array(diagram.offset)) for diagram in panel.diagrams]
+        if len(sprites) > 0:
+            bars = getShapesPath([sprite.bars + offset for sprite, offset in sprites], Path.unit_rectangle())
+            ax.add_artist(mpatches.PathPatch(bars, color="gray", linewidth=0, clip_box=clip_box))
+            fingers = getShapesPath([sprite.fingers + offset for sprite, offset in sprites], Path.unit_circle())
+            if len(fingers.vertices) > 0:
+                ax.add_artist(mpatches.PathPatch(fingers, color="dimgray", clip_box=clip_box))
+        for diagram in panel.diagrams:
+            self._drawChordBox(ax, diagram.name)
+            if diagram.first_fret is not None:
+                self._drawText(ax, diagram.first_fret, color="gray")
+            for mark in diagram.marks:
+                self._drawText(ax, mark, color="gray")
+        img = getImagePixels(os.path.join(ASSET_PATH, "guitar.png"))
+        self._addImage(ax, img, panel.instrument_icon, resample=False, clip_box=clip_box)
+        self._drawText(ax, panel.instrument)
+        if panel.capo is not None:
+            img = getImagePixels(os.path.join(ASSET_PATH, "capo.png"))
+            self._addImage(ax, img, panel.capo_icon, resample=False, clip_box=clip_box)
+            self._drawText(ax, panel.capo)
+
+    def _drawLine(self, ax: "Axes", line: LinePlan):
+        self._drawText(ax, line.text)
+        for anchor in line.chords:
+            self._drawChordBox(ax, anchor)
+
+    def _drawPage(self, page: PagePlan, background: str = None) -> "Figure":
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=mm2inch(np.array(self.figsize)))
+        ax = self._addPageAxes(fig)
+        if page.chords is not None:
+            self._drawChords(ax, page.chords)
+        if page.title is not None:
+            self._drawText(ax, page.title)
+        if page.composer is not None:
+            self._drawText(ax, page.composer)
+        for column in page.columns:
+            for line in column.lines:
+                self._drawLine(ax, line)
+        if background is not None:
+            self._addBackground(ax, page.area, background)
+        return fig
+
+    def render(self, plan: SongPlan, background: str = None) -> List["Figure"]:
+        """
+        Draws the pages of a plan, every artist is created once
+        """
+        # Only the matplotlib backend needs pyplot, the other ones start without importing it
+        import matplotlib.pyplot as plt
         # Closing and clearing any previous figure
         for fig in self.figs:
             plt.close(fig)
         self.figs.clear()
-        chords = song.getChordsUsed()
-        self.chords_colors = {chordname: DISTINCT_COLORS[len(chords)][ind_chord] for ind_chord, chordname in enumerate(chords.keys())}
-        chord_width, chord_height = self._getChordDimension(with_margin=True)
-        finished = False
-        while(not finished):
-            is_first_page = len(self.figs) == 0
-            fig = plt.figure(figsize=mm2inch(np.array(self.figsize)))
-            self.figs.append(fig)
-            margin_w = self.page_margin / self.figsize[0]
-            margin_h = self.page_margin / self.figsize[1]
-            fig.subplots_adjust(left=margin_w, bottom=margin_h, right=1 - margin_w, top=1 - margin_h, wspace=0, hspace=0)
-            if is_first_page or self.chords_all_pages:
-                nb_rows, nb_columns = self._getNbColumnRowChords(with_title=is_first_page)
-                if self.design_vertical:
-                    chords_width = nb_columns * chord_width
-                    lyrics_height = self.figsize[1] - 2 * self.page_margin - self.title_height
-                    height_ratios = [self.title_height, lyrics_height] if is_first_page else [0, 1]
-                    lyrics_width = self.figsize[0] - 2 * self.page_margin - chords_width
-                    gs = gridspec.GridSpec(2, 2, width_ratios=[lyrics_width, chords_width], height_ratios=height_ratios)
-                    self.gs_lyrics = gs[1:, 0]
-                    self.ax_chords = fig.add_subplot(gs[1:, 1])
-                else:
-                    chords_height = nb_rows * chord_height + self._getInstrumentNameHeight()
-                    lyrics_height = self.figsize[1] - 2 * self.page_margin - chords_height
-                    height_ratios = [0, chords_height, lyrics_height]
-                    if is_first_page:
-                        lyrics_height -= self.title_height
-                        height_ratios = [self.title_height, chords_height, lyrics_height]
-                    gs = gridspec.GridSpec(3, 1, height_ratios=height_ratios)
-                    self.gs_lyrics = gs[2, :]
-                    self.ax_chords = fig.add_subplot(gs[1, :])
-                self._scaleAxis(self.ax_chords, invert_yaxis=True)
-                self._drawChords(song, with_title=is_first_page)
-                if is_first_page:
-                    self.ax_title = fig.add_subplot(gs[0, :])
-                    self._scaleAxis(self.ax_title, invert_yaxis=True)
-                    self._drawTitle(song)
-            else:
-                gs = gridspec.GridSpec(1, 1)
-                self.gs_lyrics = gs[:, :]
-            finished = self._drawLyrics(song)
-            if background is not None:
-                self._addBackground(fig, background)
+        self.chords_colors = self.getChordsColors(plan.chordnames)
+        for page in plan.pages:
+            self.figs.append(self._drawPage(page, background))
         return self.figs
+
+    def iterFigures(self, chordnames: Tuple[str, ...], pages: Iterable[PagePlan], background: str = None) -> Iterator["Figure"]:
+        """
+        Draws the pages of a song (see SongLayout.iterPages) one at a time, each figure is closed
+        as soon as the next one is asked for: only one page is kept in memory
+        """
+        import matplotlib.pyplot as plt
+        self.chords_colors = self.getChordsColors(chordnames)
+        for page in pages:
+            fig = self._drawPage(page, background)
+            try:
+                yield fig
+            finally:
+                # The artists and their axes reference each other: the images (a copy of their pixels each)
+                # are removed so that they are freed at once, the rest of the page is small
+                for ax in fig.axes:
+                    for image in ax.get_images():
+                        image.remove()
+                fig.clear()
+                plt.close(fig)
+                del fig
+
+    def draw(self, song: Song, background: str = None) -> List["Figure"]:
+        return self.render(self.layout(song), background)
+
+    def write(self, song: Song, filepath: Union[str, IO[bytes]], background: str = None) -> int:
+        """
+        Draws the song to a file (path or binary file object) with the backend of the design, each page
+        written as soon as it is laid out by the streaming backends, returns the number of pages
+        """
+        layout = SongLayout(self)
+        return self.writer.writePages(layout.getChordnames(song), layout.iterPages(song), filepath, background)
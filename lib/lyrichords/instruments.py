@@ -1,69 +1,247 @@
-from .common import Chord, Key, Alter
+from .common import Chord, Key, Alter, Suffix
+from .voicings import MUTED_STRING, generateVoicings, getTuningHeights, formatFret, formatFrets
+from .cache import getCacheDirectory, getContentHash, writeAtomically
 from enum import Enum
+import json
 import logging
+import os
+import pathlib
+import numpy as np
 # Typing
-from typing import Tuple, Union, Dict, List
+from typing import Tuple, Union, Dict, List, Set
 
 # Get Logger
 logger = logging.getLogger(__name__)
 
 Fret = str
 
+# Compiled tables of the instrument files: one row per voicing,
+# the indexes of (key, alter, suffix, bass key, bass alter) of the chord then the frets
+INSTRUMENTS_CACHE_NAME = "instruments"
+TABLE_FORMAT_VERSION = b"1"
+TABLE_CHORD_COLUMNS = 5
+_KEYS: List[Key] = list(Key)
+_ALTERS: List[Alter] = list(Alter)
+_SUFFIXES: List[Suffix] = list(Suffix)
+
+
+def _parseTuningNote(note: str) -> Union[Tuple[Key, Alter], Key]:
+    chord = Chord.tryParse(note)
+    if (chord is None) or (chord.suffix != Suffix.MAJOR) or chord.isSlashedChord():
+        raise ValueError(f"Invalid note in the tuning: {note}")
+    return chord.key if chord.alter == Alter.NONE else (chord.key, chord.alter)
+
+
 class StringInstrument():
+    """
+    The chords names of the frets are only parsed the first time the frets are needed,
+    so that importing the module (or using only one of the instruments) stays cheap.
+    The frets are then compiled in a matrix (one row per voicing, one column per string,
+    MUTED_STRING for the muted strings) along with the fret range of each voicing.
+    The chords missing from the tables are generated from the tuning when they are requested.
+    """
     def __init__(self,  name: str, 
                         tuning: Tuple[Union[Tuple[Key, Alter], Key], ...],
                         frets: Dict[str, List[Fret]] = {}):
         self.name: str = name
         self.tuning: Tuple[Key, ...] = tuning
         self.nb_strings: int = len(self.tuning)
-        self.frets: Dict[Chord, List[Fret]] = {}
+        self._frets: Dict[Chord, List[Fret]] = {}
+        self._pending_frets: List[Dict[str, List[Fret]]] = []
+        # Compiled frets
+        self._fret_matrix: np.ndarray = np.zeros((0, self.nb_strings), dtype=np.int8)
+        self._voicings: Dict[Chord, np.ndarray] = {}
+        self._fret_min: np.ndarray = np.zeros(0, dtype=np.int8)
+        self._fret_max: np.ndarray = np.zeros(0, dtype=np.int8)
+        self._fret_span: np.ndarray = np.zeros(0, dtype=np.int8)
+        self._max_frets_range: int = 1
+        # Chords generated from the tuning, not part of the definition of the instrument
+        self._generated: Set[Chord] = set()
         self.addChords(frets)
 
+    @property
+    def frets(self) -> Dict[Chord, List[Fret]]:
+        self._compile()
+        return self._frets
+
     def getNbStrings(self) -> int:
         return self.nb_strings
 
     def addChords(self, newfrets: Dict[str, List[Fret]]):
+        if len(newfrets) > 0:
+            self._pending_frets.append(newfrets)
+
+    def _parseChords(self, newfrets: Dict[str, List[Fret]]):
+        logger.debug(f"Parsing {len(newfrets)} chords of the instrument '{self.name}'")
         for chordname, frets in newfrets.items():
             chord = Chord.parse(chordname)
-            if chord in self.frets.keys():
+            if chord in self._frets.keys():
                 for fret in frets:
-                    if fret in self.frets[chord]:
+                    if fret in self._frets[chord]:
                         logger.warning(f"Trying to add a fret already existing (Instrument = {self.name}, chord = {chordname})")
                     else:
-                        self.frets[chord].append(fret)
+                        self._frets[chord].append(fret)
             else:
-                self.frets[chord] = frets
+                self._frets[chord] = frets
+
+    def _parseFret(self, chord: Chord, fret: Fret) -> List[int]:
+        if len(fret) != self.nb_strings:
+            raise ValueError(f"Invalid fret '{fret}' for the chord {chord} (Instrument = {self.name}, {self.nb_strings} strings)")
+        return [MUTED_STRING if f in "xX" else 0 if f in "oO" else int(f) for f in fret]
+
+    def load(self):
+        """
+        Parses and compiles the frets now instead of the first time they are needed
+        """
+        self._compile()
+
+    def _compile(self):
+        if len(self._pending_frets) == 0:
+            return
+        while len(self._pending_frets) > 0:
+            self._parseChords(self._pending_frets.pop(0))
+        chords = []
+        rows = []
+        for chord, frets in self._frets.items():
+            chords += [chord] * len(frets)
+            rows += [self._parseFret(chord, fret) for fret in frets]
+        self._setFretMatrix(chords, np.array(rows, dtype=np.int8).reshape(-1, self.nb_strings))
+
+    def _setFretMatrix(self, chords: List[Chord], matrix: np.ndarray):
+        """
+        chords[k] is the chord of the row k of the matrix, the rows of a chord are contiguous
+        """
+        self._fret_matrix = matrix
+        self._voicings = {}
+        for row, chord in enumerate(chords):
+            self._voicings.setdefault(chord, []).append(row)
+        self._voicings = {chord: np.array(rows) for chord, rows in self._voicings.items()}
+        # Range of the fingers (open and muted strings excluded)
+        fingers = self._fret_matrix > 0
+        has_fingers = fingers.any(axis=1)
+        fret_min = np.where(fingers, self._fret_matrix, np.iinfo(np.int8).max).min(axis=1)
+        self._fret_min = np.where(has_fingers, fret_min, 0).astype(np.int8)
+        self._fret_max = np.maximum(self._fret_matrix.max(axis=1), 0).astype(np.int8)
+        self._fret_span = self._fret_max - self._fret_min
+        # The chords generated so far are left out (as by getHash): the range does not depend on the songs already drawn
+        first_voicings = [rows[0] for chord, rows in self._voicings.items() if chord not in self._generated]
+        self._max_frets_range = int(self._fret_span[first_voicings].max(initial=0)) + 1
+
+    def _toTable(self) -> np.ndarray:
+        self._compile()
+        chords = np.full((len(self._fret_matrix), TABLE_CHORD_COLUMNS), -1, dtype=np.int8)
+        for chord, rows in self._voicings.items():
+            chords[rows, 0] = _KEYS.index(chord.key)
+            chords[rows, 1] = _ALTERS.index(chord.alter)
+            chords[rows, 2] = _SUFFIXES.index(chord.suffix)
+            if chord.isSlashedChord():
+                chords[rows, 3] = _KEYS.index(chord.bass_key)
+                chords[rows, 4] = _ALTERS.index(chord.bass_alter)
+        return np.concatenate([chords, self._fret_matrix], axis=1)
+
+    def getHash(self) -> str:
+        """
+        Hash of the name, the tuning and the frets of the instrument as defined: the chords generated
+        so far are left out, so the hash does not depend on the songs already drawn
+        """
+        table = self._toTable()
+        generated = [rows for chord, rows in self._voicings.items() if chord in self._generated]
+        if len(generated) > 0:
+            table = np.delete(table, np.concatenate(generated), axis=0)
+        table = np.ascontiguousarray(table)
+        return getContentHash(repr((self.name, self.tuning)).encode() + table.tobytes())
 
-    def getFrets(self, chord: Union[Chord, str]):
+    def _loadTable(self, table: np.ndarray):
+        """
+        Opposite of _toTable, the chords are rebuilt from their indexes (no chord name is parsed)
+        """
+        chords = []
+        for key, alter, suffix, bass_key, bass_alter in table[:, :TABLE_CHORD_COLUMNS].tolist():
+            chords.append(Chord(_KEYS[key], _ALTERS[alter], _SUFFIXES[suffix],
+                                None if bass_key < 0 else _KEYS[bass_key],
+                                None if bass_alter < 0 else _ALTERS[bass_alter]))
+        self._setFretMatrix(chords, table[:, TABLE_CHORD_COLUMNS:])
+        frets = formatFrets(self._fret_matrix)
+        self._frets = {chord: [frets[row] for row in rows] for chord, rows in self._voicings.items()}
+
+    def fromFile(filepath: str) -> "StringInstrument":
+        """
+        Loads an instrument from a json file, eg:
+        {"name": "Tenor Guitar", "tuning": ["C", "G", "D", "A"], "frets": {"C": ["0230"], "Am": ["2200"]}}
+        The frets are compiled into a binary table stored in the cache, keyed by the hash
+        of the file, so that the next loads map the table instead of parsing the chords names
+        """
+        logger.info(f"Loading instrument file: {filepath}")
+        with open(filepath, "rb") as f:
+            content = f.read()
+        description = json.loads(content)
+        name = description.get("name", pathlib.Path(filepath).stem)
+        tuning = tuple(_parseTuningNote(note) for note in description["tuning"])
+        instrument = StringInstrument(name, tuning)
+        table_path = None
+        table = None
+        try:
+            table_path = pathlib.Path(getCacheDirectory(INSTRUMENTS_CACHE_NAME),
+                                      getContentHash(TABLE_FORMAT_VERSION + content) + ".npy")
+            if table_path.is_file():
+                table = np.load(table_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Fail to read the compiled table of the instrument '{name}': {e}")
+        if (table is not None) and (table.shape[1] == TABLE_CHORD_COLUMNS + instrument.nb_strings):
+            instrument._loadTable(table)
+            return instrument
+        instrument.addChords(description.get("frets", {}))
+        table = instrument._toTable()
+        if table_path is not None:
+            try:
+                writeAtomically(table_path, lambda f: np.save(f, table))
+            except OSError as e:
+                logger.warning(f"Fail to write the compiled table of the instrument '{name}': {e}")
+        return instrument
+
+    def _generateChord(self, chord: Chord) -> bool:
+        voicings = generateVoicings(getTuningHeights(self.tuning), chord)
+        if len(voicings) == 0:
+            return False
+        logger.info(f"Generating the frets of the chord {chord} for the instrument '{self.name}'")
+        self._generated.add(chord)
+        self.addChords({str(chord): [formatFret(voicing) for voicing in voicings]})
+        self._compile()
+        return True
+
+    def _getVoicings(self, chord: Union[Chord, str]) -> np.ndarray:
+        self._compile()
+        if not isinstance(chord, Chord):
+            chord = Chord.parse(chord)
+        if (chord not in self._voicings) and (not self._generateChord(chord)):
+            raise KeyError(f"The chord {chord} does not exists for the instrument '{self.name}'")
+        return self._voicings[chord]
+
+    def getFrets(self, chord: Union[Chord, str]) -> List[Fret]:
         if not isinstance(chord, Chord):
             chord = Chord.parse(chord)
-        if chord not in self.frets.keys():
+        if (chord not in self.frets.keys()) and (not self._generateChord(chord)):
             raise KeyError(f"The chord {chord} does not exists for the instrument '{self.name}'")
         return self.frets[chord]
-    
+
+    def getFretsArray(self, chord: Union[Chord, str], variant: int = 0) -> np.ndarray:
+        """
+        Frets of a voicing of the chord, one value per string (MUTED_STRING if muted)
+        """
+        return self._fret_matrix[self._getVoicings(chord)[variant]]
+
+    def getFretMax(self, chord: Union[Chord, str], variant: int = 0) -> int:
+        return int(self._fret_max[self._getVoicings(chord)[variant]])
+
     def getMaxFretsRange(self, chordnames: List[Union[Chord, str]] = []) -> int:
+        """
+        Number of frets needed to draw the first voicing of the chords (all the chords by default)
+        """
         if len(chordnames) == 0:
-            chordnames = list(self.frets.keys())
-        fret_range_max = 0
-        for chord in chordnames:
-            fret = self.getFrets(chord)[0]
-            fret_min = -1
-            fret_max = -1
-            for f in fret:
-                if(f.upper() not in ["X", "0"]):
-                    no_fret = int(f)
-                    if fret_min == -1:
-                        fret_min = no_fret
-                    elif fret_min > no_fret:
-                        fret_min = no_fret
-                    if fret_max == -1:
-                        fret_max = no_fret
-                    elif fret_max < no_fret:
-                        fret_min = no_fret
-            fret_range = fret_max - fret_min
-            if fret_range > fret_range_max:
-                fret_range_max = fret_range
-        return fret_range_max + 1
+            self._compile()
+            return self._max_frets_range
+        voicings = [self._getVoicings(chord)[0] for chord in chordnames]
+        return int(self._fret_span[voicings].max()) + 1
 
 
 UKULELE_DGBE = StringInstrument("Baritone Ukulele", (Key.D, Key.G, Key.B, Key.E), frets = {
@@ -307,3 +485,14 @@ class STRING_INSTRUMENTS(Enum):
     GUITAR_EADGBE = GUITAR_EADGBE
 
 
+def getInstrument(name: str) -> StringInstrument:
+    """
+    Name of one of the STRING_INSTRUMENTS or path of an instrument file
+    """
+    if name in STRING_INSTRUMENTS.__members__:
+        return STRING_INSTRUMENTS[name].value
+    if os.path.isfile(name):
+        return StringInstrument.fromFile(name)
+    raise ValueError(f"Unknown instrument '{name}', it must be one of {list(STRING_INSTRUMENTS.__members__)} or the path of an instrument file")
+
+
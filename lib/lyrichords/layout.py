@@ -0,0 +1,866 @@
+from .instruments import MUTED_STRING
+from .common import Chord
+from .song import Song, Verse, WordLocation, ChordLocation
+from .metrics import TextMeasurer, TextSlices
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+import bisect
+import logging
+import numpy as np
+# Typing
+from typing import Iterator, List, Tuple, Optional, Dict, Union
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# Margin around the lyrics of a column (mm)
+LYRICS_MARGIN = 3
+# The number of columns stops growing when more verses than this ratio are wrapped
+MAX_WRAPS_RATIO = 0.2
+# Number of chord diagrams kept by each process (see DiagramsCache)
+DIAGRAMS_CACHE_SIZE = 512
+
+
+def font2mm(fontsize):
+    return fontsize * 0.3527777778
+
+def mm2font(size):
+    return size / 0.3527777778
+
+
+# Extents of the items (xmin, ymin, xmax, ymax)
+Extent = Tuple[float, float, float, float]
+
+
+def _unionExtents(extents: List[Extent]) -> Extent:
+    return (min(e[0] for e in extents), min(e[1] for e in extents),
+            max(e[2] for e in extents), max(e[3] for e in extents))
+
+
+def _intersectExtents(extent: Extent, other: Extent) -> Extent:
+    return (max(extent[0], other[0]), max(extent[1], other[1]),
+            min(extent[2], other[2]), min(extent[3], other[3]))
+
+
+@dataclass(frozen=True)
+class Box:
+    """
+    Rectangle of a page in mm, (x, y) is its top left corner (y from the top of the page)
+    """
+    x: float
+    y: float
+    width: float
+    height: float
+
+    def getExtent(self) -> Extent:
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+    def shifted(self, dx: float, dy: float) -> "Box":
+        return replace(self, x=self.x + dx, y=self.y + dy)
+
+
+@dataclass(frozen=True)
+class TextItem:
+    """
+    Single line text anchored at (x, y) with the alignments of matplotlib
+    """
+    x: float
+    y: float
+    text: str
+    fontfamily: Optional[str]
+    fontsize: float
+    ha: str = "center"
+    va: str = "center"
+    weight: str = "normal"
+
+    def shifted(self, dx: float, dy: float) -> "TextItem":
+        return replace(self, x=self.x + dx, y=self.y + dy)
+
+
+@dataclass(frozen=True)
+class ChordAnchor:
+    """
+    Name of a chord written in a colored box (label), chordname is the name used in the song
+    """
+    chordname: str
+    label: TextItem
+
+    def shifted(self, dx: float, dy: float) -> "ChordAnchor":
+        return replace(self, label=self.label.shifted(dx, dy))
+
+
+@dataclass(frozen=True)
+class LinePlan:
+    """
+    Line of lyrics with the chords above it, width includes the chords
+    """
+    text: TextItem
+    chords: Tuple[ChordAnchor, ...]
+    width: float
+
+    def shifted(self, dx: float, dy: float) -> "LinePlan":
+        return replace(self, text=self.text.shifted(dx, dy), chords=tuple(c.shifted(dx, dy) for c in self.chords))
+
+
+@dataclass(frozen=True)
+class ColumnPlan:
+    box: Box
+    lines: Tuple[LinePlan, ...]
+    nb_verses: int
+    nb_wraps: int
+
+
+@dataclass(frozen=True)
+class ChordDiagram:
+    """
+    Shapes of the diagram of a chord: the bars are the nut, the frets then the strings,
+    the marks are the "x" and "o" written above the muted and open strings
+    """
+    name: ChordAnchor
+    bars: Tuple[Box, ...]
+    fingers: Tuple[Tuple[float, float], ...]
+    finger_radius: float
+    marks: Tuple[TextItem, ...]
+    first_fret: Optional[TextItem]
+    # Diagram at the origin (its top left corner on (0, 0)) this one is shifted from, and the shift:
+    # the diagrams of a chord share the same origin diagram, the backends draw it once and copy it
+    origin: Optional["ChordDiagram"] = field(default=None, compare=False, repr=False)
+    offset: Tuple[float, float] = (0, 0)
+
+    def getOrigin(self) -> "ChordDiagram":
+        return self if self.origin is None else self.origin
+
+    def getExtents(self, measurer: TextMeasurer, clip: Extent) -> List[Extent]:
+        """
+        Extents used to center the diagrams, the shapes (not the texts) are clipped as matplotlib does
+        """
+        r = self.finger_radius
+        shapes = [bar.getExtent() for bar in self.bars] + [(x - r, y - r, x + r, y + r) for x, y in self.fingers]
+        texts = [self.name.label] + list(self.marks) + ([] if self.first_fret is None else [self.first_fret])
+        return [_intersectExtents(e, clip) for e in shapes] + [getTextExtent(measurer, t) for t in texts]
+
+    def shifted(self, dx: float, dy: float) -> "ChordDiagram":
+        return replace(self,
+                       name=self.name.shifted(dx, dy),
+                       bars=tuple(b.shifted(dx, dy) for b in self.bars),
+                       fingers=tuple((x + dx, y + dy) for x, y in self.fingers),
+                       marks=tuple(m.shifted(dx, dy) for m in self.marks),
+                       first_fret=None if self.first_fret is None else self.first_fret.shifted(dx, dy),
+                       origin=self.getOrigin(),
+                       offset=(self.offset[0] + dx, self.offset[1] + dy))
+
+
+@dataclass(frozen=True)
+class ChordsPanelPlan:
+    """
+    Diagrams of the chords used in the song, under the name of the instrument and the capo
+    """
+    box: Box
+    diagrams: Tuple[ChordDiagram, ...]
+    instrument_icon: Box
+    instrument: TextItem
+    capo_icon: Optional[Box] = None
+    capo: Optional[TextItem] = None
+
+
+@dataclass(frozen=True)
+class PagePlan:
+    width: float
+    height: float
+    # Area inside the margins of the page
+    area: Box
+    columns: Tuple[ColumnPlan, ...]
+    title: Optional[TextItem] = None
+    composer: Optional[TextItem] = None
+    chords: Optional[ChordsPanelPlan] = None
+
+
+@dataclass(frozen=True)
+class SongPlan:
+    """
+    Pages of a song, the chordnames are in their order of appearance in the song
+    """
+    chordnames: Tuple[str, ...]
+    pages: Tuple[PagePlan, ...]
+
+
+def getHorizontalExtent(x: float, width: float, ha: str) -> Tuple[float, float]:
+    """
+    (xmin, xmax) of a text of the given width anchored at x
+    """
+    if ha == "center":
+        return (x - width / 2.0, x + width / 2.0)
+    elif ha == "right":
+        return (x - width, x)
+    return (x, x + width)
+
+
+def getTextExtent(measurer: TextMeasurer, item: TextItem) -> Extent:
+    """
+    Extent of the box of a text as computed by matplotlib (a point for an empty text)
+    """
+    if item.text == "":
+        return (item.x, item.y, item.x, item.y)
+    width = measurer.getWidth(item.text, item.fontfamily, item.fontsize, item.weight)
+    height = measurer.getHeight(item.text, item.fontfamily, item.fontsize, item.weight)
+    xmin, xmax = getHorizontalExtent(item.x, width, item.ha)
+    if item.va == "center":
+        ymin = item.y - height / 2.0
+    elif item.va in ["bottom", "baseline"]:
+        ymin = item.y - height
+    else:
+        ymin = item.y
+    return (xmin, ymin, xmax, ymin + height)
+
+
+def getTextSpan(words: List[WordLocation], chords: List[ChordLocation]) -> Tuple[int, int]:
+    """
+    (index of the verse where a line made of some words and chords of the verse starts, length of its text),
+    the line starts at the same index as the verse split at the line (see Verse.resetIndex)
+    """
+    start = min(([words[0].index] if words else []) + ([chords[0].index] if chords else []), default=0)
+    length = (words[-1].getIndexLastLetter() + 1 - start) if words else 0
+    return (start, length)
+
+
+class VerseCuts():
+    """
+    Lines that can be cut from a verse: a line is made of the words and the chords placed
+    between two cut indexes of Verse.getPossibleCutIndexes (Verse.splitByIndex rules)
+    """
+    def __init__(self, layout: "SongLayout", verse: Verse, slices: TextSlices):
+        self.layout: SongLayout = layout
+        self.slices: TextSlices = slices
+        self.words: List[WordLocation] = verse.getWords()
+        self.chords: List[ChordLocation] = verse.getChords()
+        self.cuts: List[int] = verse.getPossibleCutIndexes()
+        self._words_ends: List[int] = [word.getIndexLastLetter() for word in self.words]
+        # A chord placed on a word goes with the last letter of the word
+        self._chords_ends: List[int] = []
+        for chord in self.chords:
+            chord_index = chord.index
+            for word in self.words:
+                if (chord.index >= word.index) and (chord.index <= word.getIndexLastLetter()):
+                    chord_index = word.getIndexLastLetter()
+            self._chords_ends.append(chord_index)
+
+    def _getRange(self, ends: List[int], cut_prev: int, cut: int) -> slice:
+        first = 0 if cut_prev is None else bisect.bisect_right(ends, cut_prev)
+        last = len(ends) if cut is None else bisect.bisect_right(ends, cut)
+        return slice(first, last)
+
+    def getLine(self, cut_prev: int, cut: int) -> Tuple[List[WordLocation], List[ChordLocation]]:
+        """
+        Words and chords after cut_prev until cut (None: start and end of the verse)
+        """
+        return (self.words[self._getRange(self._words_ends, cut_prev, cut)],
+                self.chords[self._getRange(self._chords_ends, cut_prev, cut)])
+
+    def getWidth(self, x: float, cut_prev: int, cut: int) -> float:
+        words, chords = self.getLine(cut_prev, cut)
+        return self.layout._measureLine(x, words, chords, self.slices)[3]
+
+    def getTextWidth(self, x: float, cut_prev: int, cut: int) -> float:
+        """
+        Width of the lyrics of the line without the chords (smaller or equal to getWidth)
+        """
+        start, length = getTextSpan(*self.getLine(cut_prev, cut))
+        xmin, xmax = getHorizontalExtent(x, self.slices.getWidth(start, length), self.layout.drawer.lyrics_ha)
+        return xmax - xmin
+
+
+@dataclass(frozen=True)
+class ColumnFill:
+    """
+    Verses placed in a column before laying out their lines: the y of each verse written with
+    its possible lines and the cuts chosen (verses without any word or chord are only counted)
+    """
+    box: Box
+    nb_verses: int
+    verses: Tuple[Tuple[float, VerseCuts, List[int]], ...]
+
+    def getNbWraps(self) -> int:
+        return sum(len(line_cuts) for _, _, line_cuts in self.verses)
+
+
+class ColumnsTrials():
+    """
+    Verses placed in a page of lyrics for each number of columns tried, the lines are only
+    laid out for the number of columns kept
+    """
+    def __init__(self, layout: "SongLayout", song: Song, nb_verses_done: int, box: Box):
+        self.layout: SongLayout = layout
+        self.song: Song = song
+        self.nb_verses_done: int = nb_verses_done
+        self.box: Box = box
+        self.nb_verses_left: int = len(song.getVerses()) - nb_verses_done
+        # Number of columns -> verses placed in each column, or the error raised if a verse
+        # cannot be cut to fit the width of the columns
+        self._fills: Dict[int, Union[Tuple[ColumnFill, ...], IndexError]] = {}
+
+    def _getOrError(self, nb_cols: int) -> Union[Tuple[ColumnFill, ...], IndexError]:
+        if nb_cols not in self._fills:
+            logger.debug(f"Trying to place verses with {nb_cols} columns")
+            try:
+                self._fills[nb_cols] = self.layout.fillColumns(self.song, self.nb_verses_done, self.box, nb_cols)
+            except IndexError as e:
+                self._fills[nb_cols] = e
+        return self._fills[nb_cols]
+
+    def get(self, nb_cols: int) -> Tuple[ColumnFill, ...]:
+        fills = self._getOrError(nb_cols)
+        if isinstance(fills, IndexError):
+            raise fills
+        return fills
+
+    def getNbVerses(self, nb_cols: int) -> int:
+        fills = self._getOrError(nb_cols)
+        return 0 if isinstance(fills, IndexError) else sum(fill.nb_verses for fill in fills)
+
+    def isTooManyWraps(self, nb_cols: int) -> bool:
+        nb_verses = self.getNbVerses(nb_cols)
+        if nb_verses == 0:
+            return True
+        return sum(fill.getNbWraps() for fill in self.get(nb_cols)) / nb_verses > MAX_WRAPS_RATIO
+
+    def isLast(self, nb_cols: int) -> bool:
+        """
+        True if no column should be added: all the verses are written or too many of them are wrapped
+        """
+        return self.isTooManyWraps(nb_cols) or (self.getNbVerses(nb_cols) >= self.nb_verses_left)
+
+
+class DiagramsCache():
+    """
+    Chord diagrams at the origin by the inputs they depend on (chord, frets, label and chord design),
+    shared by the songs and the pages of a process: at most size diagrams, the least recently used dropped first
+    """
+    def __init__(self, size: int = DIAGRAMS_CACHE_SIZE):
+        self.size: int = size
+        self.diagrams: "OrderedDict[Tuple, ChordDiagram]" = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: Tuple) -> Optional[ChordDiagram]:
+        diagram = self.diagrams.get(key)
+        if diagram is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.diagrams.move_to_end(key)
+        return diagram
+
+    def add(self, key: Tuple, diagram: ChordDiagram):
+        self.diagrams[key] = diagram
+        if len(self.diagrams) > self.size:
+            self.diagrams.popitem(last=False)
+
+    def getHitRate(self) -> float:
+        return self.hits / max(1, self.hits + self.misses)
+
+
+# Chord diagrams of the process
+_diagrams_cache = DiagramsCache()
+
+
+def getDiagramsCache() -> DiagramsCache:
+    return _diagrams_cache
+
+
+def getCapoLabel(capo: int) -> str:
+    if capo == 0:
+        return "No Capo"
+    elif capo == 1:
+        return "Capo: 1st fret"
+    elif capo == 2:
+        return "Capo: 2nd fret"
+    elif capo == 3:
+        return "Capo: 3rd fret"
+    return f"Capo: {capo}th fret"
+
+
+class SongLayout():
+    """
+    Places a song on pages using the parameters of a SongDrawer, without creating any matplotlib artist.
+    All the coordinates are in mm from the top left corner of the page.
+    """
+    def __init__(self, drawer: "SongDrawer"):
+        self.drawer = drawer
+        self.instrument = drawer.instrument
+        self.measurer: TextMeasurer = drawer.measurer
+        self.figsize: Tuple[float, float] = drawer.figsize
+        self.nb_chords: int = 0
+        # Chord label -> width
+        self._labels_widths: Dict[str, float] = {}
+        # Index of a verse of the song being placed -> its possible lines
+        self._verses_cuts: Dict[int, VerseCuts] = {}
+
+    def getLabel(self, chordname: str) -> str:
+        if self.drawer.notation is not None:
+            return Chord.parse(chordname).getName(self.drawer.notation)
+        return chordname
+
+    def getChordTitleHeight(self) -> float:
+        return font2mm(self.drawer.chords_fontsize)
+
+    def getChordDimension(self, with_margin: bool = False) -> Tuple[float, float]:
+        """
+        !!! The dimensions must match the one of getChordDiagram.
+        """
+        d = self.drawer
+        nb_frets = self.instrument.getMaxFretsRange()
+        width = (self.instrument.getNbStrings() - 1) * d.chords_string_spacing + d.chords_string_width
+        title_height = self.getChordTitleHeight()
+        mute_strings_height = d.chords_fret_spacing
+        height = nb_frets * d.chords_fret_spacing + d.chords_first_fret_height + mute_strings_height + title_height
+        if with_margin:
+            width += 2 * d.chords_margin
+            height += 2 * d.chords_margin
+        return(width, height)
+
+    def getInstrumentNameHeight(self) -> float:
+        return font2mm(self.drawer.lyrics_fontsize) * 2
+
+    def getNbColumnRowChords(self, with_title: bool = True) -> Tuple[int, int]:
+        d = self.drawer
+        chord_width, chord_height = self.getChordDimension(with_margin=True)
+        if d.design_vertical:
+            height = self.figsize[1]
+            height -= 2 * d.page_margin
+            height -= self.getInstrumentNameHeight()
+            if with_title:
+                height -= d.title_height
+            nb_rows = int(height / chord_height)
+            nb_columns = int(np.ceil(self.nb_chords / nb_rows))
+        else:
+            width = self.figsize[0]
+            width -= 2 * d.page_margin
+            nb_columns = int(width / chord_width)
+            nb_rows = int(np.ceil(self.nb_chords / nb_columns))
+        return(nb_rows, nb_columns)
+
+    def getChordDiagram(self, chordname: str, x_offset: float, y_offset: float) -> ChordDiagram:
+        """
+        Diagram of a chord whose top left corner is (x_offset, y_offset), the name is centered on the top edge.
+        The diagram at the origin is built once per process (see DiagramsCache).
+        """
+        d = self.drawer
+        frets = self.instrument.getFretsArray(chordname)
+        if(d.lefthand):
+            frets = frets[::-1]
+        nb_frets = self.instrument.getMaxFretsRange()
+        offset = max(0, self.instrument.getFretMax(chordname) - nb_frets)
+        key = (chordname, self.getLabel(chordname), tuple(frets.tolist()), nb_frets, offset, d.chords_fontsize,
+               d.chords_fret_spacing, d.chords_string_spacing, d.chords_first_fret_height, d.chords_fret_height,
+               d.chords_string_width, d.chords_finger_radius)
+        cache = getDiagramsCache()
+        diagram = cache.get(key)
+        if diagram is None:
+            diagram = self._getChordDiagram(chordname, frets.tolist(), nb_frets, offset)
+            cache.add(key, diagram)
+        return diagram.shifted(x_offset, y_offset)
+
+    def _getChordDiagram(self, chordname: str, frets: List[int], nb_frets: int, offset: int) -> ChordDiagram:
+        """
+        Diagram of a chord at the origin, the frets from the left of the diagram
+        """
+        d = self.drawer
+        chord_width, _ = self.getChordDimension(with_margin=False)
+        nb_strings = len(frets)
+        # Frets and Strings
+        title_height = self.getChordTitleHeight()
+        y_offset_chord = title_height + d.chords_fret_spacing
+        full_width = (nb_strings - 1) * d.chords_string_spacing + d.chords_string_width
+        bars = [Box(0, y_offset_chord, full_width, d.chords_first_fret_height)]
+        y_offset_chord += d.chords_first_fret_height - (d.chords_fret_height / 2)
+        for k in range(1, nb_frets + 1):
+            y_temp = y_offset_chord + d.chords_fret_spacing * k - (d.chords_fret_height / 2)
+            bars.append(Box(0, y_temp, full_width, d.chords_fret_height))
+        for k in range(0, nb_strings):
+            x_temp = d.chords_string_spacing * k
+            bars.append(Box(x_temp, y_offset_chord, d.chords_string_width, nb_frets * d.chords_fret_spacing))
+        # Chordname
+        name = ChordAnchor(chordname, TextItem(chord_width / 2, 0, self.getLabel(chordname), None, d.chords_fontsize))
+        # Fingers
+        y_fret_zero = title_height + d.chords_fret_spacing + d.chords_first_fret_height - (d.chords_fret_height / 2) + d.chords_fret_spacing / 2
+        x_string_zero = d.chords_string_width / 2
+        first_fret = None
+        if offset > 0:
+            first_fret = TextItem(x_string_zero - d.chords_string_spacing / 2, y_fret_zero, str(offset + 1), None, d.chords_fontsize, weight="bold")
+        fingers = []
+        marks = []
+        for num_string, position in enumerate(frets):
+            xtemp = x_string_zero + num_string * d.chords_string_spacing
+            if(position <= 0):
+                # Muted and open strings
+                y_offset_muted = title_height + d.chords_fret_spacing / 2
+                text = "x" if (position == MUTED_STRING) else "o"
+                marks.append(TextItem(xtemp, y_offset_muted, text, None, mm2font(d.chords_string_spacing)))
+                continue
+            fingers.append((xtemp, y_fret_zero + (position - 1 - offset) * d.chords_fret_spacing))
+        return ChordDiagram(name, tuple(bars), tuple(fingers), d.chords_finger_radius, tuple(marks), first_fret)
+
+    def _getCenteringOffset(self, extents: List[Extent], box: Box) -> Tuple[float, float]:
+        """
+        Offset to move the items of the extents to the middle of the box
+        """
+        if len(extents) == 0:
+            return (0, 0)
+        xmin, ymin, xmax, ymax = _unionExtents(extents)
+        x_offset = (box.x + box.width / 2) - (xmin + (xmax - xmin) / 2)
+        y_offset = (box.y + box.height / 2) - (ymin + (ymax - ymin) / 2)
+        return (x_offset, y_offset)
+
+    def layoutChords(self, song: Song, box: Box, with_title: bool) -> ChordsPanelPlan:
+        d = self.drawer
+        chord_width, chord_height = self.getChordDimension(with_margin=False)
+        nb_rows, nb_columns = self.getNbColumnRowChords(with_title)
+        chordnames = list(song.getChordsUsed().keys())
+        if (nb_rows * nb_columns) < len(chordnames):
+            raise ValueError("Not enough space to draw all the chords")
+        ih = self.getInstrumentNameHeight()
+        diagrams = []
+        for ind_chord, chordname in enumerate(chordnames):
+            ind_row, ind_col = divmod(ind_chord, nb_columns)
+            x_offset = box.x + ind_col * (chord_width + 2 * d.chords_margin)
+            y_offset = box.y + ind_row * (chord_height + 2 * d.chords_margin) + ih
+            diagrams.append(self.getChordDiagram(chordname, x_offset, y_offset))
+        # The diagrams are centered in the box then moved down by half the height of the instrument name
+        extents = [e for diagram in diagrams for e in diagram.getExtents(self.measurer, box.getExtent())]
+        x_offset, y_offset = self._getCenteringOffset(extents, box)
+        diagrams = [diagram.shifted(x_offset, y_offset + ih / 2) for diagram in diagrams]
+        # Instrument and capo, on the middle line of the instrument name
+        x = box.x
+        y = box.y + ih / 2
+        font = (d.lyrics_fontfamily, d.lyrics_fontsize)
+        instrument = TextItem(x + 12, y, f"{self.instrument.name}", *font, ha="left")
+        plan = ChordsPanelPlan(box, tuple(diagrams), Box(x + 5, y - 3, 5, 5), instrument)
+        if song.getCapo() > 0:
+            width = self.measurer.getWidth(instrument.text, *font)
+            capo = TextItem(x + width + 21, y, getCapoLabel(song.getCapo()), *font, ha="left")
+            plan = replace(plan, capo_icon=Box(x + width + 14, y - 3, 5, 5), capo=capo)
+        return plan
+
+    def layoutTitle(self, song: Song, box: Box) -> Tuple[TextItem, Optional[TextItem]]:
+        d = self.drawer
+        x_middle = box.x + box.width / 2
+        title = TextItem(x_middle, box.y + d.title_height / 2.0, f"{song.getTitle()} - {song.getArtist()}",
+                         d.title_fontfamily, d.title_fontsize)
+        composer = None
+        if(song.isComposerSet()):
+            composer = TextItem(x_middle, box.y + d.title_height * 4.0 / 5.0, f"Composed by: {song.getComposer()}",
+                                d.composer_fontfamily, d.composer_fontsize)
+        return (title, composer)
+
+    def getLineExtents(self, line: LinePlan) -> List[Extent]:
+        return [getTextExtent(self.measurer, line.text)] + [getTextExtent(self.measurer, c.label) for c in line.chords]
+
+    def _getLabelWidth(self, label: str) -> float:
+        if label not in self._labels_widths:
+            self._labels_widths[label] = self.measurer.getWidth(label, None, self.drawer.lyrics_chords_fontsize)
+        return self._labels_widths[label]
+
+    def _measureLine(self, x: float, words: List[WordLocation], chords: List[ChordLocation],
+                     slices: TextSlices) -> Tuple[int, int, List[float], float]:
+        """
+        Line made of words and chords of a verse whose text is anchored at x.
+        Returns (index of the verse where the line starts, length of its text, x of the chords,
+        width of the text with the chords). The chords are placed above their letter.
+        """
+        d = self.drawer
+        start, length = getTextSpan(words, chords)
+        indexes = [chord.index - start for chord in chords]
+        if len(words) == 0 and len(chords) > 0:
+            maxi = max(chord.getIndexLastLetter() for chord in chords) - start
+            indexes = [ind - int(maxi / 2) for ind in indexes]
+        lwidth = slices.getWidth(start, length)
+        xmin, xmax = getHorizontalExtent(x, lwidth, d.lyrics_ha)
+        x_chords = []
+        for chord, ind in zip(chords, indexes):
+            # The chords placed before or after the lyrics are measured on the padding
+            if ind < 0:
+                cwidth = -slices.getWidth(start, 0, -ind)
+            elif ind <= length:
+                cwidth = slices.getWidth(start, ind)
+            else:
+                cwidth = slices.getWidth(start, length, ind - length)
+            x_chord = x + cwidth
+            if(d.lyrics_ha == "center"):
+                x_chord = x + cwidth - (lwidth / 2.0)
+            elif(d.lyrics_ha == "right"):
+                x_chord = x - lwidth + cwidth
+            x_chords.append(x_chord)
+            cxmin, cxmax = getHorizontalExtent(x_chord, self._getLabelWidth(self.getLabel(chord.name)), "center")
+            xmin, xmax = min(xmin, cxmin), max(xmax, cxmax)
+        return (start, length, x_chords, xmax - xmin)
+
+    def layoutLine(self, x: float, y: float, words: List[WordLocation], chords: List[ChordLocation], slices: TextSlices) -> LinePlan:
+        d = self.drawer
+        start, length, x_chords, width = self._measureLine(x, words, chords, slices)
+        text = TextItem(x, y, slices.text[start:start + length], d.lyrics_fontfamily, d.lyrics_fontsize, ha=d.lyrics_ha, va="top")
+        y_chord = y - d.lyrics_line_spacing / 4
+        anchors = tuple(ChordAnchor(chord.name, TextItem(x_chord, y_chord, self.getLabel(chord.name), None, d.lyrics_chords_fontsize))
+                        for chord, x_chord in zip(chords, x_chords))
+        return LinePlan(text, anchors, width)
+
+    def _getGreedyCuts(self, lines: "VerseCuts", x: float, width_available: float, max_lines: int) -> Optional[List[int]]:
+        """
+        Each line is cut at the last possible index where it fits the width (same lines as
+        cutting the verse with Verse.splitByIndex from the last possible cut index)
+        """
+        line_cuts = []
+        ind_first = 0
+        cut_prev = None
+        while len(line_cuts) < max_lines:
+            if lines.getWidth(x, cut_prev, None) <= width_available:
+                return line_cuts
+            # The cuts whose text alone is wider than the width are skipped with a binary search
+            # (the text of the line grows with the cut index)
+            lo, hi = ind_first, len(lines.cuts)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if lines.getTextWidth(x, cut_prev, lines.cuts[mid]) <= width_available:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            for ind_cut in range(lo - 1, ind_first - 1, -1):
+                if lines.getWidth(x, cut_prev, lines.cuts[ind_cut]) <= width_available:
+                    break
+            else:
+                raise IndexError(f"The verse cannot be cut to fit a width of {width_available} mm")
+            cut_prev = lines.cuts[ind_cut]
+            line_cuts.append(cut_prev)
+            ind_first = ind_cut + 1
+        return None
+
+    def _getBalancedCuts(self, lines: "VerseCuts", x: float, width_available: float, max_lines: int) -> Optional[List[int]]:
+        """
+        Cuts giving the fewest lines, then the lines of the most even widths
+        (minimum sum of the squares of the space left at the end of the lines)
+        """
+        if lines.getWidth(x, None, None) <= width_available:
+            return [] if max_lines > 0 else None
+        nb_cuts = len(lines.cuts)
+        # Index of the previous cut (-1: start of the verse) -> (nb lines, raggedness, index of the next cut)
+        best = {}
+        for ind_prev in range(nb_cuts - 1, -2, -1):
+            cut_prev = None if ind_prev < 0 else lines.cuts[ind_prev]
+            options = []
+            width = lines.getWidth(x, cut_prev, None)
+            if width <= width_available:
+                options.append((1, (width_available - width) ** 2, None))
+            for ind_cut in range(ind_prev + 1, nb_cuts):
+                cut = lines.cuts[ind_cut]
+                if lines.getTextWidth(x, cut_prev, cut) > width_available:
+                    break
+                width = lines.getWidth(x, cut_prev, cut)
+                if (width > width_available) or (best.get(ind_cut) is None):
+                    continue
+                nb_lines, raggedness, _ = best[ind_cut]
+                options.append((nb_lines + 1, raggedness + (width_available - width) ** 2, ind_cut))
+            best[ind_prev] = min(options, default=None)
+        if best[-1] is None:
+            raise IndexError(f"The verse cannot be cut to fit a width of {width_available} mm")
+        if best[-1][0] > max_lines:
+            return None
+        line_cuts = []
+        ind_cut = best[-1][2]
+        while ind_cut is not None:
+            line_cuts.append(lines.cuts[ind_cut])
+            ind_cut = best[ind_cut][2]
+        return line_cuts
+
+    def _getLineCuts(self, lines: VerseCuts, x: float, width_available: float, height_available: float) -> Optional[List[int]]:
+        """
+        Cuts of the lines of a verse to fit the width, None if the lines do not fit the height
+        """
+        d = self.drawer
+        max_lines = 0
+        while (max_lines + 1) * d.lyrics_line_spacing <= height_available:
+            max_lines += 1
+        if d.lyrics_wrap_mode == "balanced":
+            return self._getBalancedCuts(lines, x, width_available, max_lines)
+        return self._getGreedyCuts(lines, x, width_available, max_lines)
+
+    def _layoutLines(self, x: float, y: float, lines: VerseCuts, line_cuts: List[int]) -> List[LinePlan]:
+        d = self.drawer
+        plans = []
+        for cut_prev, cut in zip([None] + line_cuts, line_cuts + [None]):
+            words, chords = lines.getLine(cut_prev, cut)
+            plans.append(self.layoutLine(x, y, words, chords, lines.slices))
+            y += d.lyrics_line_spacing
+        return plans
+
+    def _getVerseCuts(self, song: Song, index: int) -> VerseCuts:
+        """
+        Possible lines of a verse of the song, measured once per layout
+        """
+        if index not in self._verses_cuts:
+            d = self.drawer
+            verse = song[index]
+            slices = TextSlices(self.measurer, verse.getTextLine(), d.lyrics_fontfamily, d.lyrics_fontsize)
+            self._verses_cuts[index] = VerseCuts(self, verse, slices)
+        return self._verses_cuts[index]
+
+    def fillColumn(self, song: Song, nb_verses_done: int, box: Box) -> ColumnFill:
+        """
+        Verses placed in a column, from the measures of the verses only
+        """
+        d = self.drawer
+        y = 0
+        nb_verses_written = 0
+        verses = []
+        for index in range(nb_verses_done, len(song.getVerses())):
+            if song[index].isEmpty():
+                nb_verses_written += 1
+                y += d.lyrics_line_spacing / 2
+                continue
+            lines = self._getVerseCuts(song, index)
+            line_cuts = self._getLineCuts(lines, box.x, box.width - LYRICS_MARGIN * 2, box.height - LYRICS_MARGIN * 2 - y)
+            if line_cuts is None:
+                break
+            verses.append((box.y + y, lines, line_cuts))
+            nb_verses_written += 1
+            y += (len(line_cuts) + 1) * d.lyrics_line_spacing
+        return ColumnFill(box, nb_verses_written, tuple(verses))
+
+    def layoutFill(self, fill: ColumnFill) -> ColumnPlan:
+        lines = []
+        for y, verse_lines, line_cuts in fill.verses:
+            lines += self._layoutLines(fill.box.x, y, verse_lines, line_cuts)
+        # Center the lyrics to the middle of the column
+        extents = [e for line in lines for e in self.getLineExtents(line)]
+        x_offset, y_offset = self._getCenteringOffset(extents, fill.box)
+        lines = tuple(line.shifted(x_offset, y_offset) for line in lines)
+        return ColumnPlan(fill.box, lines, fill.nb_verses, fill.getNbWraps())
+
+    def fillColumns(self, song: Song, nb_verses_done: int, box: Box, nb_cols: int) -> Tuple[ColumnFill, ...]:
+        """
+        Verses placed in nb_cols columns of the box (fewer columns if all the verses are placed before)
+        """
+        nb_verses_total = len(song.getVerses())
+        fills = []
+        nb_verses_written = 0
+        width = box.width / nb_cols
+        for ind_col in range(0, nb_cols):
+            column_box = Box(box.x + ind_col * width, box.y, width, box.height)
+            fill = self.fillColumn(song, nb_verses_done + nb_verses_written, column_box)
+            nb_verses_written += fill.nb_verses
+            fills.append(fill)
+            if nb_verses_done + nb_verses_written >= nb_verses_total:
+                break
+        return tuple(fills)
+
+    def estimateNbColumns(self, song: Song, nb_verses_done: int, box: Box) -> int:
+        """
+        Number of columns of lyrics from the widths and heights of the verses left, unwrapped:
+        enough columns to write all of them, as long as the columns fit the verses but the widest ones
+        """
+        d = self.drawer
+        widths = []
+        height = 0
+        for index in range(nb_verses_done, len(song.getVerses())):
+            if song[index].isEmpty():
+                height += d.lyrics_line_spacing / 2
+            else:
+                widths.append(self._getVerseCuts(song, index).getWidth(0, None, None) + LYRICS_MARGIN * 2)
+                height += d.lyrics_line_spacing
+        height_available = box.height - LYRICS_MARGIN * 2
+        if (len(widths) == 0) or (height_available <= 0):
+            return 1
+        nb_cols_height = int(np.ceil(height / height_available))
+        widths.sort(reverse=True)
+        nb_cols_width = int(box.width // widths[int(len(widths) * MAX_WRAPS_RATIO)])
+        return max(1, min(nb_cols_height, nb_cols_width))
+
+    def layoutLyrics(self, song: Song, nb_verses_done: int, box: Box) -> Tuple[ColumnPlan, ...]:
+        """
+        Columns of lyrics of a page: columns are added while they allow to write more verses
+        without wrapping too many of them (unless the number of columns is set)
+        """
+        nb_cols_set = self.drawer.lyrics_nb_cols
+        if nb_cols_set > 0:
+            return tuple(self.layoutFill(fill) for fill in self.fillColumns(song, nb_verses_done, box, nb_cols_set))
+        trials = ColumnsTrials(self, song, nb_verses_done, box)
+        # Smallest number of columns writing all the verses or wrapping too many of them: the estimate
+        # is refined by steps doubling from it until a bound is found, then by bisection
+        nb_cols_max = max(1, trials.nb_verses_left)
+        nb_cols = min(self.estimateNbColumns(song, nb_verses_done, box), nb_cols_max)
+        if trials.isLast(nb_cols):
+            lo, hi = 1, nb_cols
+        else:
+            lo, step = nb_cols + 1, 1
+            while (lo < nb_cols_max) and not trials.isLast(lo):
+                lo, step = min(lo + step, nb_cols_max), step * 2
+            lo, hi = max(nb_cols + 1, lo - step // 2), lo
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if trials.isLast(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        nb_cols = lo
+        if (nb_cols > 1) and trials.isTooManyWraps(nb_cols):
+            nb_cols -= 1
+        # A column is only added if it allows to write more verses
+        while (nb_cols > 1) and (trials.getNbVerses(nb_cols) <= trials.getNbVerses(nb_cols - 1)):
+            nb_cols -= 1
+        return tuple(self.layoutFill(fill) for fill in trials.get(nb_cols))
+
+    def getChordnames(self, song: Song) -> Tuple[str, ...]:
+        return tuple(song.getChordsUsed().keys())
+
+    def getPageArea(self) -> Box:
+        """
+        Part of the pages inside the margins
+        """
+        width, height = self.figsize
+        margin = self.drawer.page_margin
+        return Box(margin, margin, width - 2 * margin, height - 2 * margin)
+
+    def layout(self, song: Song) -> SongPlan:
+        return SongPlan(self.getChordnames(song), tuple(self.iterPages(song)))
+
+    def iterPages(self, song: Song) -> Iterator[PagePlan]:
+        """
+        Pages of the song, each one as soon as it is laid out
+        """
+        d = self.drawer
+        chordnames = self.getChordnames(song)
+        self.nb_chords = len(chordnames)
+        self._verses_cuts = {}
+        # Chords missing from the instrument are generated before measuring the chords diagrams
+        for chordname in chordnames:
+            self.instrument.getFrets(chordname)
+        chord_width, chord_height = self.getChordDimension(with_margin=True)
+        width, height = self.figsize
+        area = self.getPageArea()
+        nb_verses_total = len(song.getVerses())
+        nb_verses_done = 0
+        nb_pages = 0
+        while nb_verses_done < nb_verses_total or nb_pages == 0:
+            is_first_page = nb_pages == 0
+            page = PagePlan(width, height, area, ())
+            lyrics_box = area
+            if is_first_page or d.chords_all_pages:
+                nb_rows, nb_columns = self.getNbColumnRowChords(with_title=is_first_page)
+                title_height = d.title_height if is_first_page else 0
+                if d.design_vertical:
+                    chords_width = nb_columns * chord_width
+                    lyrics_box = Box(area.x, area.y + title_height, area.width - chords_width, area.height - title_height)
+                    chords_box = Box(area.x + lyrics_box.width, lyrics_box.y, chords_width, lyrics_box.height)
+                else:
+                    chords_height = nb_rows * chord_height + self.getInstrumentNameHeight()
+                    chords_box = Box(area.x, area.y + title_height, area.width, chords_height)
+                    lyrics_box = Box(area.x, chords_box.y + chords_height, area.width, area.height - title_height - chords_height)
+                page = replace(page, chords=self.layoutChords(song, chords_box, with_title=is_first_page))
+                if is_first_page:
+                    title, composer = self.layoutTitle(song, Box(area.x, area.y, area.width, title_height))
+                    page = replace(page, title=title, composer=composer)
+            columns = self.layoutLyrics(song, nb_verses_done, lyrics_box)
+            nb_verses = sum(column.nb_verses for column in columns)
+            if nb_verses == 0:
+                raise ValueError(f"The verse {song[nb_verses_done]} does not fit in a page")
+            nb_verses_done += nb_verses
+            nb_pages += 1
+            yield replace(page, columns=columns)
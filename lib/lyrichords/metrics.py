@@ -0,0 +1,347 @@
+from .cache import getCacheDirectory, getContentHash, writeAtomically, touch, evictOldFiles
+import matplotlib as mpl
+import matplotlib.font_manager as fm
+from matplotlib.ft2font import KERNING, KERNING_DEFAULT
+from matplotlib.backends.backend_agg import get_hinting_flag
+import logging
+import os
+import pathlib
+import numpy as np
+# Typing
+from matplotlib.ft2font import FT2Font
+from typing import Dict, Tuple, Set, Iterable, List, Optional
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# Glyph metrics stored on disk, one file per (font file, size, dpi)
+GLYPHS_CACHE_NAME = "glyphs"
+GLYPHS_CACHE_MAX_FILES = 64
+GLYPHS_TABLE_FORMAT_VERSION = 2
+# Characters measured when the metrics of a font are first computed,
+# the others are loaded from FreeType when they are used
+CACHED_CHARACTERS = "".join(map(chr, list(range(0x20, 0x7F)) + list(range(0xA0, 0x180)) + list(range(0x2010, 0x2027))))
+# Characters whose kerning pairs are all computed
+KERNED_CHARACTERS = "".join(map(chr, list(range(0x20, 0x7F)) + list(range(0xA0, 0x100)) + list(range(0x2013, 0x201F))))
+
+# Fonts shipped with the package, added to the fonts of matplotlib (see FontRegistry)
+FONT_PATH = pathlib.Path(__file__).parent.absolute().joinpath("fonts")
+FONT_EXTENSIONS = (".ttf", ".otf")
+
+# Font path -> ((modification time, size), hash of the file)
+_fonts_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def getFontHash(fontpath: str) -> str:
+    stat = os.stat(fontpath)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if (fontpath not in _fonts_hashes) or (_fonts_hashes[fontpath][0] != version):
+        with open(fontpath, "rb") as f:
+            _fonts_hashes[fontpath] = (version, getContentHash(f.read()))
+    return _fonts_hashes[fontpath][1]
+
+
+class FontRegistry():
+    """
+    Font files of a folder added to the fonts of matplotlib once per process, with the file of each of their families.
+    The folder is scanned again only when it changes (the modification time of the folder or of one of its subfolders:
+    a file added, removed or renamed), the files modified since the last scan are then added again.
+    """
+    def __init__(self, path: pathlib.Path):
+        self.path: pathlib.Path = path
+        # Folder path -> modification time, of the last scan
+        self.folders: Dict[str, int] = {}
+        # Font path -> (modification time, size)
+        self.fonts: Dict[str, Tuple[int, int]] = {}
+        # Font family -> font paths
+        self.families: Dict[str, List[str]] = {}
+
+    def isChanged(self) -> bool:
+        if len(self.folders) == 0:
+            return True
+        for folder, mtime in self.folders.items():
+            try:
+                if os.stat(folder).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def update(self):
+        """
+        Adds the new and the modified font files of the folder, removes the deleted ones
+        """
+        if not self.isChanged():
+            return
+        folders = {}
+        fonts = {}
+        for root, _, files in os.walk(self.path):
+            folders[root] = os.stat(root).st_mtime_ns
+            for filename in files:
+                p = pathlib.Path(root, filename)
+                if p.suffix.lower() in FONT_EXTENSIONS:
+                    stat = p.stat()
+                    fonts[str(p)] = (stat.st_mtime_ns, stat.st_size)
+        # The modified and the deleted files are removed from matplotlib, the modified ones added again
+        removed = {fontpath for fontpath, version in self.fonts.items() if fonts.get(fontpath) != version}
+        if len(removed) > 0:
+            fm.fontManager.ttflist = [font for font in fm.fontManager.ttflist if font.fname not in removed]
+            fm.fontManager._findfont_cached.cache_clear()
+        existing = {font.fname: font for font in fm.fontManager.ttflist}
+        families: Dict[str, List[str]] = {}
+        for fontpath in fonts:
+            if fontpath not in existing:
+                fm.fontManager.addfont(fontpath)
+                existing[fontpath] = fm.fontManager.ttflist[-1]
+                logger.info(f"Adding Font: {existing[fontpath].name}")
+            families.setdefault(existing[fontpath].name, []).append(fontpath)
+        self.folders, self.fonts, self.families = (folders, fonts, families)
+
+    def getFontPath(self, fontfamily: str) -> Optional[str]:
+        """
+        File of a font family of the folder, None for the other families and the families with several files
+        (their file depends on the weight, see matplotlib.font_manager.findfont)
+        """
+        fontpaths = self.families.get(fontfamily, [])
+        return fontpaths[0] if len(fontpaths) == 1 else None
+
+
+# Fonts of the package
+_font_registry = FontRegistry(FONT_PATH)
+
+
+def getFontRegistry() -> FontRegistry:
+    return _font_registry
+
+
+class GlyphMetrics():
+    """
+    Advances and vertical extents of the glyphs of a font at a given size, in 26.6 fixed point pixels,
+    hinted and kerned the same way the Agg renderer of matplotlib lays out a text line.
+    The metrics of the common characters are stored in the user cache, keyed by the hash
+    of the font file, so that FreeType is only used for the other characters.
+    """
+    def __init__(self, fontpath: str, fontsize: float, dpi: float):
+        self.fontpath: str = fontpath
+        self.fontsize: float = fontsize
+        self.dpi: float = dpi
+        self.hinting_factor: int = mpl.rcParams["text.hinting_factor"]
+        # Character -> (glyph index, advance, ymin, ymax)
+        self.glyphs: Dict[str, Tuple[int, int, int, int]] = {}
+        # (left glyph index, right glyph index) -> kerning, only the non zero kernings
+        # between the kerned glyphs are stored
+        self.kernings: Dict[Tuple[int, int], int] = {}
+        self.kerned_glyphs: Set[int] = set()
+        self.has_kerning: bool = None
+        self._font: FT2Font = None
+        self._loadCache()
+
+    @property
+    def font(self) -> FT2Font:
+        if self._font is None:
+            self._font = fm.get_font(self.fontpath)
+        # The font object is shared with the renderer which sets its own size
+        self._font.set_size(self.fontsize, self.dpi)
+        return self._font
+
+    def _getCachePath(self) -> pathlib.Path:
+        parameters = (GLYPHS_TABLE_FORMAT_VERSION, float(self.fontsize), float(self.dpi), self.hinting_factor, get_hinting_flag(),
+                      mpl.rcParams["text.kerning_factor"], mpl.__version__, CACHED_CHARACTERS, KERNED_CHARACTERS)
+        name = getFontHash(self.fontpath)[:32] + "-" + getContentHash(repr(parameters).encode())[:16]
+        return pathlib.Path(getCacheDirectory(GLYPHS_CACHE_NAME), name + ".npy")
+
+    def _loadCache(self):
+        path = None
+        try:
+            path = self._getCachePath()
+            if path.is_file():
+                self._fromArray(np.load(path, mmap_mode="r"))
+                touch(path)
+                return
+        except (OSError, ValueError, IndexError) as e:
+            logger.warning(f"Fail to read the cached glyph metrics of {self.fontpath}: {e}")
+        logger.debug(f"Computing the glyph metrics of {self.fontpath} (size {self.fontsize})")
+        self.has_kerning = bool(self.font.face_flags & KERNING)
+        self._loadGlyphs(c for c in CACHED_CHARACTERS if self.font.get_char_index(ord(c)))
+        if self.has_kerning:
+            kerned = {self.glyphs[c][0] for c in KERNED_CHARACTERS if c in self.glyphs}
+            self._loadKernings((left, right) for left in kerned for right in kerned)
+            self.kerned_glyphs = kerned
+        if path is None:
+            return
+        try:
+            writeAtomically(path, lambda f: np.save(f, self._toArray()))
+            evictOldFiles(path.parent, GLYPHS_CACHE_MAX_FILES, "*.npy")
+        except OSError as e:
+            logger.warning(f"Fail to write the cached glyph metrics of {self.fontpath}: {e}")
+
+    def _toArray(self) -> np.ndarray:
+        """
+        The tables in one int32 array:
+        [has kerning, nb glyphs, nb kerned glyphs, nb kernings,
+         (character, glyph index, advance, ymin, ymax) * nb glyphs, kerned glyphs,
+         (left glyph index, right glyph index, kerning) * nb kernings (the non zero ones)]
+        """
+        glyphs = [(ord(c), ) + glyph for c, glyph in self.glyphs.items()]
+        kernings = [(left, right, kerning) for (left, right), kerning in self.kernings.items() if kerning != 0]
+        header = [int(self.has_kerning), len(glyphs), len(self.kerned_glyphs), len(kernings)]
+        return np.concatenate([np.array(header, dtype=np.int32),
+                               np.array(glyphs, dtype=np.int32).reshape(-1),
+                               np.array(sorted(self.kerned_glyphs), dtype=np.int32),
+                               np.array(kernings, dtype=np.int32).reshape(-1)])
+
+    def _fromArray(self, array: np.ndarray):
+        has_kerning, nb_glyphs, nb_kerned, nb_kernings = array[:4].tolist()
+        if len(array) != 4 + 5 * nb_glyphs + nb_kerned + 3 * nb_kernings:
+            raise ValueError("Invalid size")
+        glyphs = array[4:4 + 5 * nb_glyphs].reshape(-1, 5).tolist()
+        kerned = array[4 + 5 * nb_glyphs:4 + 5 * nb_glyphs + nb_kerned].tolist()
+        kernings = array[len(array) - 3 * nb_kernings:].reshape(-1, 3).tolist()
+        self.has_kerning = bool(has_kerning)
+        self.glyphs = {chr(glyph[0]): tuple(glyph[1:]) for glyph in glyphs}
+        self.kerned_glyphs = set(kerned)
+        self.kernings = {(left, right): kerning for left, right, kerning in kernings}
+
+    def _loadGlyphs(self, characters: Iterable[str]):
+        font = self.font
+        for character in characters:
+            glyph = font.load_char(ord(character), flags=get_hinting_flag())
+            advance = round(glyph.horiAdvance / self.hinting_factor)
+            _, ymin, _, ymax = glyph.bbox
+            self.glyphs[character] = (font.get_char_index(ord(character)), advance, ymin, ymax)
+
+    def _loadKernings(self, pairs: Iterable[Tuple[int, int]]):
+        font = self.font
+        for pair in pairs:
+            self.kernings[pair] = font.get_kerning(pair[0], pair[1], KERNING_DEFAULT)
+
+    def _isKerningKnown(self, pair: Tuple[int, int]) -> bool:
+        return (pair in self.kernings) or ((pair[0] in self.kerned_glyphs) and (pair[1] in self.kerned_glyphs))
+
+    def _getGlyphs(self, text: str) -> List[Tuple[int, int, int, int]]:
+        missing = set(text).difference(self.glyphs)
+        if len(missing) > 0:
+            self._loadGlyphs(missing)
+        return [self.glyphs[character] for character in text]
+
+    def getAdvancesAndKernings(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Advance of each character of the text and its kerning with the previous character
+        """
+        glyphs = self._getGlyphs(text)
+        advances = np.array([glyph[1] for glyph in glyphs], dtype=np.int64)
+        kernings = np.zeros(len(glyphs), dtype=np.int64)
+        if self.has_kerning:
+            pairs = [(left[0], right[0]) for left, right in zip(glyphs[:-1], glyphs[1:])]
+            # Glyphs missing from the font are not kerned
+            missing = {pair for pair in pairs if all(pair) and not self._isKerningKnown(pair)}
+            if len(missing) > 0:
+                self._loadKernings(missing)
+            kernings[1:] = [self.kernings.get(pair, 0) for pair in pairs]
+        return (advances, kernings)
+
+    def getAdvances(self, text: str) -> np.ndarray:
+        """
+        Advance of each character of the text (kerning with the previous character included)
+        """
+        advances, kernings = self.getAdvancesAndKernings(text)
+        return advances + kernings
+
+    def getInkHeight(self, text: str) -> int:
+        """
+        Height of the union of the glyphs boxes (0 for an empty text)
+        """
+        glyphs = self._getGlyphs(text)
+        if len(glyphs) == 0:
+            return 0
+        return max(glyph[3] for glyph in glyphs) - min(glyph[2] for glyph in glyphs)
+
+
+class TextMeasurer():
+    """
+    Dimensions (in mm) of single line texts computed from the glyph metrics of the fonts,
+    without creating and laying out matplotlib Text artists.
+    The dimensions are the ones of Text.get_window_extent with the Agg renderer at the same dpi.
+    """
+    def __init__(self, dpi: float = None):
+        self.dpi: float = mpl.rcParams["figure.dpi"] if dpi is None else dpi
+        # (font family, fontsize, weight) -> metrics
+        self._metrics: Dict[Tuple[str, float, str], GlyphMetrics] = {}
+
+    def getGlyphMetrics(self, fontfamily: str, fontsize: float, weight: str = "normal") -> GlyphMetrics:
+        """
+        fontfamily None is the default font of matplotlib
+        """
+        key = (fontfamily, fontsize, weight)
+        if key not in self._metrics:
+            fontpath = getFontRegistry().getFontPath(fontfamily)
+            if fontpath is None:
+                fontpath = fm.findfont(fm.FontProperties(family=fontfamily, size=fontsize, weight=weight))
+            self._metrics[key] = GlyphMetrics(fontpath, fontsize, self.dpi)
+        return self._metrics[key]
+
+    def toMM(self, value: float) -> float:
+        """
+        26.6 fixed point pixels -> mm
+        """
+        return value / 64. * 25.4 / self.dpi
+
+    def getPrefixWidths(self, text: str, fontfamily: str, fontsize: float, weight: str = "normal") -> np.ndarray:
+        """
+        Widths of text[:k] for k between 0 and len(text), in one pass
+        """
+        advances = self.getGlyphMetrics(fontfamily, fontsize, weight).getAdvances(text)
+        widths = np.zeros(len(text) + 1)
+        widths[1:] = np.cumsum(advances)
+        return self.toMM(widths)
+
+    def getWidth(self, text: str, fontfamily: str, fontsize: float, weight: str = "normal") -> float:
+        return float(self.getPrefixWidths(text, fontfamily, fontsize, weight)[-1])
+
+    def getHeight(self, text: str, fontfamily: str, fontsize: float, weight: str = "normal") -> float:
+        """
+        Height of the box of the text, matplotlib gives every line at least the height of "lp"
+        """
+        metrics = self.getGlyphMetrics(fontfamily, fontsize, weight)
+        return self.toMM(max(metrics.getInkHeight(text), metrics.getInkHeight("lp")))
+
+
+class TextSlices():
+    """
+    Widths (in mm) of the slices of a text, optionally padded with a character, computed from
+    the advances of the text measured once. The widths are the same as the ones of TextMeasurer.
+    """
+    def __init__(self, measurer: TextMeasurer, text: str, fontfamily: str, fontsize: float, padding: str = "x"):
+        self.measurer: TextMeasurer = measurer
+        self.metrics: GlyphMetrics = measurer.getGlyphMetrics(fontfamily, fontsize)
+        self.text: str = text
+        self.padding: str = padding
+        advances, kernings = self.metrics.getAdvancesAndKernings(text)
+        # Cumulated advances and kernings (26.6 fixed point pixels)
+        self._advances: List[int] = np.concatenate([[0], np.cumsum(advances)]).tolist()
+        self._kernings: List[int] = np.concatenate([[0], np.cumsum(kernings)]).tolist()
+        advances, kernings = self.metrics.getAdvancesAndKernings(padding * 2)
+        self._padding_advance: int = int(advances[0])
+        self._padding_kerning: int = int(kernings[1])
+        # Last character of a slice -> kerning with the padding
+        self._paddings_kernings: Dict[str, int] = {}
+
+    def _getPaddingKerning(self, character: str) -> int:
+        if character not in self._paddings_kernings:
+            self._paddings_kernings[character] = int(self.metrics.getAdvancesAndKernings(character + self.padding)[1][1])
+        return self._paddings_kernings[character]
+
+    def getWidth(self, start: int, length: int, nb_padding: int = 0) -> float:
+        """
+        Width of text[start:start + length] + padding * nb_padding
+        """
+        width = 0
+        if length > 0:
+            end = start + length
+            # The kerning with the character before the slice is not counted
+            width = (self._advances[end] - self._advances[start]) + (self._kernings[end] - self._kernings[start + 1])
+        if nb_padding > 0:
+            width += nb_padding * self._padding_advance + (nb_padding - 1) * self._padding_kerning
+            if length > 0:
+                width += self._getPaddingKerning(self.text[start + length - 1])
+        return self.measurer.toMM(width)
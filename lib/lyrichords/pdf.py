@@ -0,0 +1,689 @@
+from .drawing import RenderBackend, ASSET_PATH
+from .layout import PagePlan, ChordsPanelPlan, ChordDiagram, ChordAnchor, LinePlan, TextItem, Box, font2mm
+from PIL import Image as PImage
+from fontTools.ttLib import TTFont
+import matplotlib.colors as mcolors
+import hashlib
+import io
+import logging
+import os
+import pathlib
+import struct
+import zlib
+# Typing
+from typing import TYPE_CHECKING, Any, Dict, IO, Iterable, List, Optional, Tuple, Union
+if TYPE_CHECKING:
+    from .drawing import SongDrawer
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# The content streams are written in mm from the top left corner of the page
+MM_TO_PT = 72 / 25.4
+# Width of the edges of the chord boxes and of the fingers: 1 point, as matplotlib (mm)
+EDGE_WIDTH = 25.4 / 72
+# Padding and corner radius of the chord boxes relative to their font size (boxstyle "round" of matplotlib)
+CHORD_BOX_PAD = 0.3
+# Opacity of the inside of the chord boxes
+CHORD_BOX_ALPHA = 0.5
+# Distance of the control points of the cubic Bezier curves drawing a quarter of a circle
+CIRCLE_KAPPA = 0.5522847498
+# Half size of the bounding box of the form XObjects around their origin (mm)
+FORM_SIZE = 1000
+
+# Font path -> ((modification time, size), font program)
+_fonts_programs: Dict[str, Tuple[Tuple[int, int], "FontProgram"]] = {}
+# (image path, grayscale) -> ((modification time, size), image XObject)
+_images_streams: Dict[Tuple[str, bool], Tuple[Tuple[int, int], "ImageStreams"]] = {}
+
+
+def formatNumber(value: float) -> str:
+    """
+    Number with at most 3 decimals, as written in the content streams
+    """
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _formatColor(color: str) -> str:
+    return " ".join(formatNumber(value) for value in mcolors.to_rgb(color))
+
+
+def _getChecksum(data: bytes) -> int:
+    data += bytes(-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def _stripInstructions(outline: bytes) -> bytes:
+    """
+    Outline of a glyph (its record in the glyf table) without its hinting instructions
+    """
+    if len(outline) == 0:
+        return outline
+    nb_contours = struct.unpack(">h", outline[:2])[0]
+    if nb_contours >= 0:
+        position = 10 + 2 * nb_contours
+        length = struct.unpack(">H", outline[position:position + 2])[0]
+        return outline[:position] + bytes(2) + outline[position + 2 + length:]
+    # Composite glyph: the instructions follow the last component, flagged with WE_HAVE_INSTRUCTIONS
+    outline = bytearray(outline)
+    position = 10
+    more_components = True
+    while more_components:
+        flags = struct.unpack(">H", outline[position:position + 2])[0]
+        outline[position:position + 2] = struct.pack(">H", flags & ~0x0100)
+        position += 4 + (4 if flags & 0x0001 else 2)
+        position += 2 if flags & 0x0008 else 4 if flags & 0x0040 else 8 if flags & 0x0080 else 0
+        more_components = bool(flags & 0x0020)
+    return bytes(outline[:position])
+
+
+def _packFont(tables: Dict[str, bytes]) -> bytes:
+    """
+    TrueType font file from its tables
+    """
+    tags = sorted(tables)
+    entry_selector = len(tags).bit_length() - 1
+    search_range = 16 << entry_selector
+    directory = [struct.pack(">IHHHH", 0x00010000, len(tags), search_range, entry_selector, 16 * len(tags) - search_range)]
+    offset = 12 + 16 * len(tags)
+    data = []
+    for tag in tags:
+        table = tables[tag]
+        directory.append(struct.pack(">4sIII", tag.encode("latin-1"), _getChecksum(table), offset, len(table)))
+        data.append(table + bytes(-len(table) % 4))
+        offset += len(data[-1])
+    font = bytearray(b"".join(directory + data))
+    # checkSumAdjustment of the head table
+    head = 12 + 16 * len(tags) + sum(len(table) for table in data[:tags.index("head")])
+    font[head + 8:head + 12] = struct.pack(">I", (0xB1B0AFBA - _getChecksum(bytes(font))) & 0xFFFFFFFF)
+    return bytes(font)
+
+
+def isTrueTypeFont(fontpath: str) -> bool:
+    """
+    True if the font file has TrueType outlines (the only ones embedded), not the CFF ones of the OpenType fonts
+    """
+    with open(fontpath, "rb") as f:
+        return f.read(4) in (b"\x00\x01\x00\x00", b"true")
+
+
+def getFontProgram(fontpath: str) -> "FontProgram":
+    """
+    Font program of a font file, read once per process (and again when the file changes)
+    """
+    stat = os.stat(fontpath)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if (fontpath not in _fonts_programs) or (_fonts_programs[fontpath][0] != version):
+        _fonts_programs[fontpath] = (version, FontProgram(fontpath))
+    return _fonts_programs[fontpath][1]
+
+
+class ImageStreams():
+    """
+    Image XObject of an image file: the JPEG files as they are, the others compressed
+    with their transparency as a soft mask
+    """
+    def __init__(self, path: str, grayscale: bool = False):
+        self.smask: Optional[Tuple[str, bytes]] = None
+        with PImage.open(path) as img:
+            header = f"/Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} /BitsPerComponent 8"
+            if (img.format == "JPEG") and (img.mode in ("RGB", "L")) and not (grayscale and img.mode == "RGB"):
+                colorspace = "/DeviceRGB" if img.mode == "RGB" else "/DeviceGray"
+                self.entries: str = f"{header} /ColorSpace {colorspace} /Filter /DCTDecode"
+                self.data: bytes = pathlib.Path(path).read_bytes()
+                return
+            img = img.convert("RGBA")
+        alpha = img.getchannel("A")
+        if alpha.getextrema() != (255, 255):
+            self.smask = (f"{header} /ColorSpace /DeviceGray /Filter /FlateDecode", zlib.compress(alpha.tobytes()))
+        img = img.convert("L" if grayscale else "RGB")
+        colorspace = "/DeviceGray" if grayscale else "/DeviceRGB"
+        self.entries = f"{header} /ColorSpace {colorspace} /Filter /FlateDecode"
+        self.data = zlib.compress(img.tobytes())
+
+
+def getImageStreams(path: str, grayscale: bool = False) -> ImageStreams:
+    """
+    Image XObject of an image file, encoded once per process (and again when the file changes)
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = (path, grayscale)
+    if (key not in _images_streams) or (_images_streams[key][0] != version):
+        _images_streams[key] = (version, ImageStreams(path, grayscale))
+    return _images_streams[key][1]
+
+
+class FontProgram():
+    """
+    Glyphs of a TrueType font file in thousandths of em: glyph index, advance and vertical extent
+    of the characters, and the kerning of the pairs of glyphs from the "kern" table (the one used
+    by FreeType, so the texts are spaced as with matplotlib)
+    """
+    def __init__(self, fontpath: str):
+        self.fontpath: str = fontpath
+        with open(fontpath, "rb") as f:
+            self.data: bytes = f.read()
+        self.ttfont: TTFont = TTFont(io.BytesIO(self.data), lazy=True)
+        if "glyf" not in self.ttfont:
+            raise ValueError(f"Only the TrueType fonts (with a glyf table) can be embedded: {fontpath}")
+        self.scale: float = 1000 / self.ttfont["head"].unitsPerEm
+        self.glyph_order: List[str] = self.ttfont.getGlyphOrder()
+        self.cmap: Dict[int, str] = self.ttfont.getBestCmap() or {}
+        name = self.ttfont["name"].getDebugName(6) or pathlib.Path(fontpath).stem
+        self.name: str = "".join(c for c in name if c.isalnum() or c in "-_")
+        # Family and full name, to reference the font without embedding it
+        self.family: str = self.ttfont["name"].getDebugName(1) or self.name
+        self.fullname: str = self.ttfont["name"].getDebugName(4) or self.name
+        # Character -> (glyph index, advance, ymin, ymax)
+        self.glyphs: Dict[str, Tuple[int, float, float, float]] = {}
+        self.kernings: Dict[Tuple[int, int], float] = self._readKernings()
+        # Matplotlib gives every line at least the height and the descent of "lp"
+        self.lp: TextLine = self.getLine("lp")
+
+    def _readKernings(self) -> Dict[Tuple[int, int], float]:
+        kernings: Dict[Tuple[int, int], float] = {}
+        if "kern" not in self.ttfont:
+            return kernings
+        for table in self.ttfont["kern"].kernTables:
+            if getattr(table, "format", None) != 0:
+                continue
+            for (left, right), value in table.kernTable.items():
+                pair = (self.ttfont.getGlyphID(left), self.ttfont.getGlyphID(right))
+                kernings[pair] = kernings.get(pair, 0) + value * self.scale
+        return kernings
+
+    def getAdvance(self, glyph: int) -> float:
+        return self.ttfont["hmtx"][self.glyph_order[glyph]][0] * self.scale
+
+    def getGlyph(self, character: str) -> Tuple[int, float, float, float]:
+        if character not in self.glyphs:
+            # The characters missing from the font are drawn with the glyph .notdef
+            name = self.cmap.get(ord(character), self.glyph_order[0])
+            glyph = self.ttfont.getGlyphID(name)
+            outline = self.ttfont["glyf"][name]
+            # As FreeType, the empty glyphs have a box at the baseline
+            ymin, ymax = (0, 0)
+            if outline.numberOfContours != 0:
+                ymin, ymax = (outline.yMin * self.scale, outline.yMax * self.scale)
+            self.glyphs[character] = (glyph, self.getAdvance(glyph), ymin, ymax)
+        return self.glyphs[character]
+
+    def getLine(self, text: str) -> "TextLine":
+        glyphs = [self.getGlyph(character) for character in text]
+        kernings = [0.] + [self.kernings.get((left[0], right[0]), 0.) for left, right in zip(glyphs[:-1], glyphs[1:])]
+        width = sum(glyph[1] for glyph in glyphs) + sum(kernings)
+        ymin = min((glyph[2] for glyph in glyphs), default=0)
+        ymax = max((glyph[3] for glyph in glyphs), default=0)
+        return TextLine(text, [glyph[0] for glyph in glyphs], kernings, width, ymin, ymax)
+
+    def _getComponents(self, glyph: int) -> List[int]:
+        outline = self.ttfont["glyf"][self.glyph_order[glyph]]
+        if not outline.isComposite():
+            return []
+        return [self.ttfont.getGlyphID(component.glyphName) for component in outline.components]
+
+    def subset(self, glyphs: Iterable[int]) -> bytes:
+        """
+        Font file keeping only some glyphs (with .notdef and the components of the composite glyphs).
+        The glyphs keep their index: the other outlines are emptied and the glyphs after the last
+        one kept are removed. Only the tables needed to draw the glyphs are kept, without hinting.
+        """
+        kept = set([0])
+        pending = list(glyphs)
+        while len(pending) > 0:
+            glyph = pending.pop()
+            if glyph not in kept:
+                kept.add(glyph)
+                pending += self._getComponents(glyph)
+        nb_glyphs = max(kept) + 1
+        reader = self.ttfont.reader
+        glyf = reader["glyf"]
+        loca = self.ttfont["loca"]
+        hmtx = self.ttfont["hmtx"]
+        outlines = bytearray()
+        offsets = []
+        metrics = []
+        for glyph in range(nb_glyphs):
+            offsets.append(len(outlines))
+            if glyph in kept:
+                outlines += _stripInstructions(glyf[loca[glyph]:loca[glyph + 1]])
+                outlines += bytes(-len(outlines) % 4)
+                metrics += hmtx[self.glyph_order[glyph]]
+            else:
+                metrics += (0, 0)
+        offsets.append(len(outlines))
+        # Long offsets in loca (indexToLocFormat = 1), the number of glyphs in maxp and of metrics in hhea
+        tables = {}
+        tables["head"] = reader["head"][:8] + bytes(4) + reader["head"][12:50] + struct.pack(">h", 1) + reader["head"][52:]
+        tables["maxp"] = reader["maxp"][:4] + struct.pack(">H", nb_glyphs) + reader["maxp"][6:]
+        tables["hhea"] = reader["hhea"][:34] + struct.pack(">H", nb_glyphs)
+        tables["hmtx"] = struct.pack(">" + "Hh" * nb_glyphs, *metrics)
+        tables["loca"] = struct.pack(f">{nb_glyphs + 1}I", *offsets)
+        tables["glyf"] = bytes(outlines)
+        return _packFont(tables)
+
+
+def getTextBox(program: "FontProgram", item: TextItem, line: "TextLine") -> Tuple[Box, float]:
+    """
+    (box, y of the baseline) of a text placed as matplotlib does: every line is at least as high as "lp"
+    """
+    scale = font2mm(item.fontsize) / 1000
+    lp = program.lp
+    height = max(line.ymax - line.ymin, lp.ymax - lp.ymin) * scale
+    descent = max(-line.ymin, -lp.ymin) * scale
+    width = line.width * scale
+    x = {"left": item.x, "center": item.x - width / 2, "right": item.x - width}[item.ha]
+    y = {"top": item.y, "center": item.y - height / 2, "bottom": item.y - height,
+         "baseline": item.y - height + descent}[item.va]
+    return (Box(x, y, width, height), y + height - descent)
+
+
+def getChordBox(box: Box, fontsize: float) -> Box:
+    """
+    Rounded box drawn around the text box of a chord name of a font size in mm
+    """
+    pad = CHORD_BOX_PAD * fontsize
+    return Box(box.x - pad, box.y - pad, box.width + 2 * pad, box.height + 2 * pad)
+
+
+class TextLine():
+    """
+    Glyphs of a single line text, the widths and heights in thousandths of em
+    """
+    def __init__(self, text: str, glyphs: List[int], kernings: List[float], width: float, ymin: float, ymax: float):
+        self.text: str = text
+        self.glyphs: List[int] = glyphs
+        # Kerning of each glyph with the previous one
+        self.kernings: List[float] = kernings
+        self.width: float = width
+        self.ymin: float = ymin
+        self.ymax: float = ymax
+
+    def getOperand(self) -> str:
+        """
+        Array of the TJ operator, the glyph indices are the character codes (Identity-H encoding)
+        """
+        parts = ["<"]
+        for glyph, kerning in zip(self.glyphs, self.kernings):
+            if kerning != 0:
+                parts.append(f"> {formatNumber(-kerning)} <")
+            parts.append(f"{glyph:04X}")
+        parts.append(">")
+        return "[" + "".join(parts) + "]"
+
+
+class PdfFont():
+    """
+    Font of a document: a Type0 font whose descendant CID font embeds the glyphs used by the document
+    """
+    def __init__(self, program: FontProgram, name: str):
+        self.program: FontProgram = program
+        self.name: str = name
+        # Glyph index -> character, for the ToUnicode map
+        self.used: Dict[int, str] = {0: ""}
+
+    def getLine(self, text: str) -> TextLine:
+        line = self.program.getLine(text)
+        for glyph, character in zip(line.glyphs, text):
+            self.used.setdefault(glyph, character)
+        return line
+
+
+class PdfDocument():
+    """
+    PDF file written object by object: each page is written when it is added, the fonts (subset to
+    the glyphs used by all the pages) and the resources shared by the pages when the document is closed
+    """
+    def __init__(self, file: IO[bytes]):
+        self.file: IO[bytes] = file
+        self.position: int = 0
+        # Object number - 1 -> position of the object in the file
+        self.offsets: List[Optional[int]] = []
+        self.catalog_id: int = self._reserve()
+        self.pages_id: int = self._reserve()
+        self.resources_id: int = self._reserve()
+        self.pages_ids: List[int] = []
+        # Font path -> font
+        self.fonts: Dict[str, PdfFont] = {}
+        # Image key -> (name, object number)
+        self.images: Dict[Tuple, Tuple[str, int]] = {}
+        # Form key -> (name, object number)
+        self.forms: Dict[Any, Tuple[str, int]] = {}
+        # Fill opacity -> name of the graphic state
+        self.alphas: Dict[float, str] = {}
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self.position += len(data)
+
+    def _reserve(self) -> int:
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def _writeObject(self, number: int, content: str, stream: Optional[bytes] = None):
+        self.offsets[number - 1] = self.position
+        data = f"{number} 0 obj\n{content}\n".encode()
+        if stream is not None:
+            data += b"stream\n" + stream + b"\nendstream\n"
+        self._write(data + b"endobj\n")
+
+    def _writeStream(self, number: int, entries: str, data: bytes, compress: bool = True):
+        if compress:
+            data = zlib.compress(data)
+            entries += " /Filter /FlateDecode"
+        self._writeObject(number, f"<< {entries} /Length {len(data)} >>", data)
+
+    def getFont(self, fontpath: str) -> PdfFont:
+        if fontpath not in self.fonts:
+            self.fonts[fontpath] = PdfFont(getFontProgram(fontpath), f"F{len(self.fonts) + 1}")
+        return self.fonts[fontpath]
+
+    def getAlpha(self, alpha: float) -> str:
+        if alpha not in self.alphas:
+            self.alphas[alpha] = f"GS{len(self.alphas) + 1}"
+        return self.alphas[alpha]
+
+    def getImage(self, path: str, grayscale: bool = False) -> str:
+        """
+        Name of an image file, stored once in the document
+        """
+        key = (str(path), grayscale)
+        if key not in self.images:
+            image = getImageStreams(str(path), grayscale)
+            smask = ""
+            if image.smask is not None:
+                smask_number = self._reserve()
+                self._writeStream(smask_number, image.smask[0], image.smask[1], compress=False)
+                smask = f" /SMask {smask_number} 0 R"
+            number = self._reserve()
+            self._writeStream(number, image.entries + smask, image.data, compress=False)
+            self.images[key] = (f"Im{len(self.images) + 1}", number)
+        return self.images[key][0]
+
+    def getForm(self, key: Any) -> Optional[str]:
+        form = self.forms.get(key)
+        return None if form is None else form[0]
+
+    def addForm(self, key: Any, content: str) -> str:
+        """
+        Name of a form XObject, a content drawn on the pages at any position (see PdfPage.form)
+        """
+        number = self._reserve()
+        self._writeStream(number, f"/Type /XObject /Subtype /Form /BBox [{-FORM_SIZE} {-FORM_SIZE} {FORM_SIZE} {FORM_SIZE}] "
+                                  f"/Resources {self.resources_id} 0 R", content.encode("ascii"))
+        self.forms[key] = (f"Fm{len(self.forms) + 1}", number)
+        return self.forms[key][0]
+
+    def addPage(self, width: float, height: float, content: str):
+        """
+        Page of width x height mm
+        """
+        content_id = self._reserve()
+        self._writeStream(content_id, "", content.encode("ascii"))
+        page_id = self._reserve()
+        self._writeObject(page_id, f"<< /Type /Page /Parent {self.pages_id} 0 R "
+                                   f"/MediaBox [0 0 {formatNumber(width * MM_TO_PT)} {formatNumber(height * MM_TO_PT)}] "
+                                   f"/Resources {self.resources_id} 0 R /Contents {content_id} 0 R >>")
+        self.pages_ids.append(page_id)
+
+    def _writeFont(self, font: PdfFont) -> int:
+        program = font.program
+        glyphs = sorted(font.used)
+        data = program.subset(glyphs)
+        # Subset tag: 6 capital letters depending on the glyphs kept
+        digest = hashlib.sha1(repr(glyphs).encode()).digest()
+        basefont = "".join(chr(ord("A") + b % 26) for b in digest[:6]) + "+" + program.name
+        font_file_id = self._reserve()
+        self._writeStream(font_file_id, f"/Length1 {len(data)}", data)
+        ttfont = program.ttfont
+        head, hhea = ttfont["head"], ttfont["hhea"]
+        bbox = " ".join(formatNumber(v * program.scale) for v in (head.xMin, head.yMin, head.xMax, head.yMax))
+        cap_height = hhea.ascent
+        if ("OS/2" in ttfont) and (ttfont["OS/2"].version >= 2):
+            cap_height = ttfont["OS/2"].sCapHeight
+        descriptor_id = self._reserve()
+        self._writeObject(descriptor_id, f"<< /Type /FontDescriptor /FontName /{basefont} /Flags 4 /FontBBox [{bbox}] "
+                                         f"/ItalicAngle {formatNumber(ttfont['post'].italicAngle)} "
+                                         f"/Ascent {formatNumber(hhea.ascent * program.scale)} "
+                                         f"/Descent {formatNumber(hhea.descent * program.scale)} "
+                                         f"/CapHeight {formatNumber(cap_height * program.scale)} "
+                                         f"/StemV 80 /FontFile2 {font_file_id} 0 R >>")
+        widths = " ".join(f"{glyph} [{formatNumber(program.getAdvance(glyph))}]" for glyph in glyphs)
+        cid_font_id = self._reserve()
+        self._writeObject(cid_font_id, f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{basefont} "
+                                       f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                                       f"/FontDescriptor {descriptor_id} 0 R /W [{widths}] /CIDToGIDMap /Identity >>")
+        to_unicode_id = self._reserve()
+        self._writeStream(to_unicode_id, "", self._getToUnicode(font).encode("ascii"))
+        font_id = self._reserve()
+        self._writeObject(font_id, f"<< /Type /Font /Subtype /Type0 /BaseFont /{basefont} /Encoding /Identity-H "
+                                   f"/DescendantFonts [{cid_font_id} 0 R] /ToUnicode {to_unicode_id} 0 R >>")
+        return font_id
+
+    def _getToUnicode(self, font: PdfFont) -> str:
+        mappings = [(glyph, character) for glyph, character in sorted(font.used.items()) if character != ""]
+        lines = ["/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+                 "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+                 "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+                 "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange"]
+        # At most 100 mappings per block
+        for start in range(0, len(mappings), 100):
+            block = mappings[start:start + 100]
+            lines.append(f"{len(block)} beginbfchar")
+            for glyph, character in block:
+                lines.append(f"<{glyph:04X}> <{character.encode('utf-16-be').hex().upper()}>")
+            lines.append("endbfchar")
+        lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+        return "\n".join(lines)
+
+    def close(self):
+        fonts = " ".join(f"/{font.name} {self._writeFont(font)} 0 R" for font in self.fonts.values())
+        images = " ".join(f"/{name} {number} 0 R" for name, number in list(self.images.values()) + list(self.forms.values()))
+        alphas = " ".join(f"/{name} << /Type /ExtGState /ca {formatNumber(alpha)} >>" for alpha, name in self.alphas.items())
+        self._writeObject(self.resources_id, f"<< /Font << {fonts} >> /XObject << {images} >> /ExtGState << {alphas} >> >>")
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.pages_ids)
+        self._writeObject(self.pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages_ids)} >>")
+        self._writeObject(self.catalog_id, f"<< /Type /Catalog /Pages {self.pages_id} 0 R >>")
+        xref_position = self.position
+        xref = [f"xref\n0 {len(self.offsets) + 1}\n", "0000000000 65535 f \n"]
+        xref += [f"{offset:010d} 00000 n \n" for offset in self.offsets]
+        xref.append(f"trailer\n<< /Size {len(self.offsets) + 1} /Root {self.catalog_id} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n")
+        self._write("".join(xref).encode())
+
+
+class PdfPage():
+    """
+    Content stream of a page, the coordinates in mm from the top left corner of the page
+    """
+    def __init__(self, document: PdfDocument, width: float, height: float):
+        self.document: PdfDocument = document
+        self.width: float = width
+        self.height: float = height
+        # The y axis goes down the page
+        self.operators: List[str] = [f"{formatNumber(MM_TO_PT)} 0 0 {formatNumber(-MM_TO_PT)} 0 {formatNumber(height * MM_TO_PT)} cm"]
+
+    def _add(self, *values: Union[float, str]):
+        self.operators.append(" ".join(formatNumber(value) if isinstance(value, (int, float)) else value for value in values))
+
+    def save(self):
+        self._add("q")
+
+    def restore(self):
+        self._add("Q")
+
+    def clip(self, box: Box):
+        self._add(box.x, box.y, box.width, box.height, "re W n")
+
+    def setAlpha(self, alpha: float):
+        self._add(f"/{self.document.getAlpha(alpha)} gs")
+
+    def rectangle(self, box: Box, color: str):
+        self._add(_formatColor(color), "rg", box.x, box.y, box.width, box.height, "re f")
+
+    def circle(self, x: float, y: float, radius: float, color: str):
+        """
+        Filled circle with an edge of the same color
+        """
+        k = radius * CIRCLE_KAPPA
+        self._add(_formatColor(color), "rg", _formatColor(color), "RG", EDGE_WIDTH, "w")
+        self._add(x + radius, y, "m")
+        self._add(x + radius, y + k, x + k, y + radius, x, y + radius, "c")
+        self._add(x - k, y + radius, x - radius, y + k, x - radius, y, "c")
+        self._add(x - radius, y - k, x - k, y - radius, x, y - radius, "c")
+        self._add(x + k, y - radius, x + radius, y - k, x + radius, y, "c")
+        self._add("b")
+
+    def roundedBox(self, box: Box, radius: float, color: str, alpha: float):
+        """
+        Box with rounded corners (quadratic curves as matplotlib), its inside with an opacity
+        """
+        x0, y0 = (box.x, box.y)
+        x1, y1 = (box.x + box.width, box.y + box.height)
+        # Control points of the cubic curve equivalent to the quadratic curve of each corner
+        c = radius / 3
+        self.save()
+        self.setAlpha(alpha)
+        self._add(_formatColor(color), "rg", _formatColor(color), "RG", EDGE_WIDTH, "w")
+        self._add(x0 + radius, y0, "m", x1 - radius, y0, "l")
+        self._add(x1 - c, y0, x1, y0 + c, x1, y0 + radius, "c", x1, y1 - radius, "l")
+        self._add(x1, y1 - c, x1 - c, y1, x1 - radius, y1, "c", x0 + radius, y1, "l")
+        self._add(x0 + c, y1, x0, y1 - c, x0, y1 - radius, "c", x0, y0 + radius, "l")
+        self._add(x0, y0 + c, x0 + c, y0, x0 + radius, y0, "c", "b")
+        self.restore()
+
+    def image(self, name: str, box: Box, alpha: float = 1):
+        self.save()
+        if alpha != 1:
+            self.setAlpha(alpha)
+        self._add(box.width, 0, 0, -box.height, box.x, box.y + box.height, f"cm /{name} Do")
+        self.restore()
+
+    def form(self, name: str, x: float, y: float):
+        """
+        Form XObject with its origin on (x, y)
+        """
+        self._add("q 1 0 0 1", x, y, f"cm /{name} Do Q")
+
+    def text(self, font: PdfFont, fontsize: float, x: float, y: float, line: TextLine, color: str):
+        """
+        Text of a font size in mm, (x, y) the start of its baseline
+        """
+        self._add("BT /" + font.name, fontsize, "Tf", _formatColor(color), "rg 1 0 0 -1", x, y, "Tm", line.getOperand(), "TJ ET")
+
+    def getContent(self) -> str:
+        return "\n".join(self.operators)
+
+
+class PdfForm(PdfPage):
+    """
+    Content stream of a form XObject, in the coordinates of the page where it is drawn
+    """
+    def __init__(self, document: PdfDocument):
+        self.document: PdfDocument = document
+        self.operators: List[str] = []
+
+
+class PdfBackend(RenderBackend):
+    """
+    Writes the PDF content streams directly from the plans, with the shapes of the matplotlib backend
+    and without any figure: the fonts are embedded once per document (subset to the glyphs used)
+    and the images are stored once and drawn on each page
+    """
+    def __init__(self, drawer: "SongDrawer"):
+        super().__init__(drawer)
+        # Checked with the options rather than when the first text is drawn
+        for fontfamily, fontsize, weight in drawer.getFonts():
+            fontpath = drawer.measurer.getGlyphMetrics(fontfamily, fontsize, weight).fontpath
+            if not isTrueTypeFont(fontpath):
+                raise ValueError(f"The pdf backend only embeds TrueType fonts, not {fontpath} "
+                                 f"(font '{fontfamily or 'default'}'): use the matplotlib backend")
+
+    def writePages(self, chordnames: Tuple[str, ...], pages: Iterable[PagePlan], filepath: Union[str, IO[bytes]],
+                   background: str = None) -> int:
+        if isinstance(filepath, (str, os.PathLike)):
+            with open(filepath, "wb") as f:
+                return self.writePages(chordnames, pages, f, background)
+        self.chords_colors: Dict[str, str] = self.drawer.getChordsColors(chordnames)
+        document = PdfDocument(filepath)
+        for page in pages:
+            pdf_page = PdfPage(document, page.width, page.height)
+            self._drawPage(pdf_page, page, background)
+            document.addPage(page.width, page.height, pdf_page.getContent())
+            filepath.flush()
+        document.close()
+        return len(document.pages_ids)
+
+    def _getFont(self, pdf_page: PdfPage, item: TextItem) -> PdfFont:
+        fontpath = self.drawer.measurer.getGlyphMetrics(item.fontfamily, item.fontsize, item.weight).fontpath
+        return pdf_page.document.getFont(fontpath)
+
+    def _drawText(self, pdf_page: PdfPage, item: TextItem, color: str = "black", box_color: str = None):
+        font = self._getFont(pdf_page, item)
+        line = font.getLine(item.text)
+        box, baseline = getTextBox(font.program, item, line)
+        size = font2mm(item.fontsize)
+        if box_color is not None:
+            pdf_page.roundedBox(getChordBox(box, size), CHORD_BOX_PAD * size, box_color, CHORD_BOX_ALPHA)
+        if len(line.glyphs) > 0:
+            pdf_page.text(font, size, box.x, baseline, line, color)
+
+    def _drawChordBox(self, pdf_page: PdfPage, anchor: ChordAnchor):
+        self._drawText(pdf_page, anchor.label, box_color=self.chords_colors[anchor.chordname])
+
+    def _getDiagramForm(self, document: PdfDocument, diagram: ChordDiagram) -> str:
+        """
+        Form of the shapes and the marks of the diagram at the origin, written once per document
+        """
+        origin = diagram.getOrigin()
+        name = document.getForm(origin)
+        if name is None:
+            form = PdfForm(document)
+            for bar in origin.bars:
+                form.rectangle(bar, "gray")
+            for finger in origin.fingers:
+                form.circle(finger[0], finger[1], origin.finger_radius, "dimgray")
+            if origin.first_fret is not None:
+                self._drawText(form, origin.first_fret, color="gray")
+            for mark in origin.marks:
+                self._drawText(form, mark, color="gray")
+            name = document.addForm(origin, form.getContent())
+        return name
+
+    def _drawChords(self, pdf_page: PdfPage, panel: ChordsPanelPlan):
+        # Same order as the matplotlib artists (by zorder): the images, the shapes then the texts
+        # The images and the shapes are clipped to the panel
+        pdf_page.save()
+        pdf_page.clip(panel.box)
+        pdf_page.image(pdf_page.document.getImage(os.path.join(ASSET_PATH, "guitar.png")), panel.instrument_icon)
+        if panel.capo is not None:
+            pdf_page.image(pdf_page.document.getImage(os.path.join(ASSET_PATH, "capo.png")), panel.capo_icon)
+        for diagram in panel.diagrams:
+            pdf_page.form(self._getDiagramForm(pdf_page.document, diagram), *diagram.offset)
+        pdf_page.restore()
+        for diagram in panel.diagrams:
+            self._drawChordBox(pdf_page, diagram.name)
+        self._drawText(pdf_page, panel.instrument)
+        if panel.capo is not None:
+            self._drawText(pdf_page, panel.capo)
+
+    def _drawLine(self, pdf_page: PdfPage, line: LinePlan):
+        self._drawText(pdf_page, line.text)
+        for anchor in line.chords:
+            self._drawChordBox(pdf_page, anchor)
+
+    def _drawPage(self, pdf_page: PdfPage, page: PagePlan, background: str = None):
+        if page.chords is not None:
+            self._drawChords(pdf_page, page.chords)
+        if page.title is not None:
+            self._drawText(pdf_page, page.title)
+        if page.composer is not None:
+            self._drawText(pdf_page, page.composer)
+        for column in page.columns:
+            for line in column.lines:
+                self._drawLine(pdf_page, line)
+        if background is not None:
+            name = pdf_page.document.getImage(background, self.drawer.grayscale)
+            pdf_page.image(name, page.area, self.drawer.background_opacity)
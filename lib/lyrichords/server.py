@@ -0,0 +1,296 @@
+from .song import Song
+from .drawing import SongDrawer, getRenderBackend, reload_fonts
+from .instruments import STRING_INSTRUMENTS
+from .cache import getContentHash
+from .batch import Deadline, createDrawer
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import fields
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import logging
+import matplotlib.font_manager as fm
+import os
+import pathlib
+import signal
+import threading
+import urllib.parse
+# Typing
+from typing import Any, Dict, Optional, Tuple
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# Options used when a request does not set them (the other options are the ones of SongDrawer)
+DEFAULT_DESIGN = {"instrument": "UKULELE_GCEA", "page_format": "A4"}
+# Number of drawers (one per design) kept by each worker process
+WORKER_DRAWERS_CACHE_SIZE = 8
+# Largest request accepted, in bytes
+MAX_REQUEST_SIZE = 1 << 20
+# Path of the font files referenced by the SVG and HTML documents (see svg.setFontsUrl)
+FONTS_URL = "/fonts/"
+# Extension of a font file -> media type
+FONTS_TYPES = {".ttf": "font/ttf", ".otf": "font/otf", ".ttc": "font/collection"}
+
+
+# Drawers of a worker process of the pool: design key -> drawer, least recently used first
+_WORKER_DRAWERS: "OrderedDict[str, SongDrawer]" = OrderedDict()
+
+
+def _getWorkerDrawer(design_key: str) -> SongDrawer:
+    if design_key in _WORKER_DRAWERS:
+        _WORKER_DRAWERS.move_to_end(design_key)
+        return _WORKER_DRAWERS[design_key]
+    drawer = createDrawer(json.loads(design_key))
+    drawer.preload()
+    _WORKER_DRAWERS[design_key] = drawer
+    if len(_WORKER_DRAWERS) > WORKER_DRAWERS_CACHE_SIZE:
+        _WORKER_DRAWERS.popitem(last=False)
+    return drawer
+
+
+def _initWorker():
+    from .svg import setFontsUrl
+    # Ctrl+C is handled by the main process, which stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setFontsUrl(FONTS_URL)
+    _getWorkerDrawer(getDesignKey({}))
+
+
+def _warmWorker() -> int:
+    """
+    Loads the default design (already loaded by the initializer of the worker), returns the process id
+    """
+    _getWorkerDrawer(getDesignKey({}))
+    return os.getpid()
+
+
+def _renderInWorker(text: str, design_key: str, timeout: float) -> bytes:
+    import matplotlib.pyplot as plt
+    try:
+        with Deadline(timeout):
+            pdf = io.BytesIO()
+            _getWorkerDrawer(design_key).write(Song.fromText(text), pdf)
+    finally:
+        plt.close("all")
+    return pdf.getvalue()
+
+
+def getDesignKey(options: Dict[str, Any]) -> str:
+    """
+    Design of a request (the DEFAULT_DESIGN completed by the options of the request) as a canonical json string.
+    Only the instruments of STRING_INSTRUMENTS are accepted, not the paths of instrument files.
+    """
+    if not isinstance(options, dict):
+        raise ValueError("The options must be a json object")
+    names = set(field.name for field in fields(SongDrawer))
+    unknown = [name for name in options if name not in names]
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown options {unknown}")
+    design = dict(DEFAULT_DESIGN, **options)
+    if design["instrument"] not in STRING_INSTRUMENTS.__members__:
+        raise ValueError(f"Unknown instrument '{design['instrument']}', it must be one of {list(STRING_INSTRUMENTS.__members__)}")
+    # Raises a ValueError for an unknown backend
+    getRenderBackend(design.get("backend", "matplotlib"))
+    return json.dumps(design, sort_keys=True)
+
+
+def findFontFile(name: str) -> Optional[str]:
+    """
+    Path of a font file known by matplotlib (the fonts of the package included) from its file name
+    """
+    reload_fonts()
+    for font in fm.fontManager.ttflist:
+        if pathlib.Path(font.fname).name == name:
+            return font.fname
+    return None
+
+
+class RenderService():
+    """
+    Renders songs to PDF bytes with a pool of worker processes, each keeping a drawer per design.
+    The concurrent requests of the same song and design share a single render, and the last
+    cache_size PDF rendered are kept to answer the repeated requests.
+    """
+    def __init__(self, nb_processes: int = 1, cache_size: int = 64, timeout: float = 60):
+        self.nb_processes: int = nb_processes
+        self.cache_size: int = cache_size
+        self.timeout: float = timeout
+        self.executor: ProcessPoolExecutor = self._createExecutor()
+        self.lock: threading.Lock = threading.Lock()
+        # Key of a request -> render in progress
+        self._renders: Dict[str, Future] = {}
+        # Key of a request -> PDF, least recently used first
+        self._pdfs: "OrderedDict[str, bytes]" = OrderedDict()
+        self.stats: Dict[str, int] = {"rendered": 0, "shared": 0, "cached": 0, "failed": 0}
+
+    def _createExecutor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.nb_processes, initializer=_initWorker)
+
+    def warm(self, max_rounds: int = 4):
+        """
+        Starts all the worker processes, each one loads the default design when it starts.
+        The tasks are submitted until every process ran one (or after max_rounds rounds).
+        """
+        pids = set()
+        for _ in range(max_rounds):
+            futures = [self.executor.submit(_warmWorker) for _ in range(self.nb_processes)]
+            pids.update(future.result() for future in futures)
+            if len(pids) >= self.nb_processes:
+                return
+        logger.warning(f"Only {len(pids)} of the {self.nb_processes} worker processes could be warmed")
+
+    def _restartExecutor(self, executor: ProcessPoolExecutor):
+        """
+        Replaces a broken pool of worker processes (unless it was already replaced)
+        """
+        with self.lock:
+            if self.executor is not executor:
+                return
+            logger.warning("The worker processes stopped unexpectedly, starting new ones")
+            self.executor = self._createExecutor()
+            # The renders of the broken pool failed, they are submitted again by the next requests
+            self._renders.clear()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def render(self, text: str, design_key: str) -> Tuple[bytes, str]:
+        """
+        (PDF, "rendered", "shared" or "cached") of a song with a design (see getDesignKey),
+        raises the error of the render if it failed
+        """
+        key = getContentHash(design_key.encode() + b"\0" + text.encode())
+        with self.lock:
+            if key in self._pdfs:
+                self._pdfs.move_to_end(key)
+                self.stats["cached"] += 1
+                return (self._pdfs[key], "cached")
+            executor = self.executor
+            future = self._renders.get(key)
+            status = "shared"
+            if future is None:
+                try:
+                    future = executor.submit(_renderInWorker, text, design_key, self.timeout)
+                except BrokenProcessPool:
+                    future = None
+                else:
+                    self._renders[key] = future
+                status = "rendered"
+            if future is not None:
+                self.stats[status] += 1
+        if future is None:
+            self._restartExecutor(executor)
+            raise BrokenProcessPool("The worker processes stopped unexpectedly, they are being restarted")
+        if status == "rendered":
+            # Registered without holding the lock: a future already done runs the callback right away
+            future.add_done_callback(partial(self._onRendered, key))
+        try:
+            return (future.result(), status)
+        except BrokenProcessPool:
+            self._restartExecutor(executor)
+            raise
+
+    def _onRendered(self, key: str, future: Future):
+        with self.lock:
+            if self._renders.get(key) is future:
+                del self._renders[key]
+            if future.cancelled() or (future.exception() is not None):
+                self.stats["failed"] += 1
+                return
+            self._pdfs[key] = future.result()
+            while len(self._pdfs) > self.cache_size:
+                self._pdfs.popitem(last=False)
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /render with a json object {"song": text of the song, "options": {design options}}: the PDF
+    GET /health: the statistics of the service
+    GET /fonts/<file name>: a font file referenced by the SVG and HTML documents
+    """
+    server: "RenderServer"
+
+    def _sendBytes(self, code: int, content: bytes, content_type: str, headers: Dict[str, str] = {}):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _sendJson(self, code: int, content: Dict[str, Any]):
+        self._sendBytes(code, json.dumps(content).encode(), "application/json")
+
+    def _sendFont(self, name: str):
+        fontpath = findFontFile(name)
+        if fontpath is None:
+            return self._sendJson(404, {"error": f"Unknown font {name}"})
+        content_type = FONTS_TYPES.get(pathlib.Path(fontpath).suffix.lower(), "application/octet-stream")
+        self._sendBytes(200, pathlib.Path(fontpath).read_bytes(), content_type, {"Cache-Control": "max-age=86400"})
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith(FONTS_URL):
+            return self._sendFont(urllib.parse.unquote(path[len(FONTS_URL):]))
+        if path != "/health":
+            return self._sendJson(404, {"error": f"Unknown path {self.path}"})
+        with self.server.service.lock:
+            stats = dict(self.server.service.stats)
+        self._sendJson(200, {"status": "ok", **stats})
+
+    def do_POST(self):
+        if self.path != "/render":
+            return self._sendJson(404, {"error": f"Unknown path {self.path}"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_SIZE:
+            return self._sendJson(413, {"error": f"The request is larger than {MAX_REQUEST_SIZE} bytes"})
+        try:
+            request = json.loads(self.rfile.read(length))
+            text = request["song"]
+            if not isinstance(text, str):
+                raise ValueError("The song must be a string")
+            design_key = getDesignKey(request.get("options", {}))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return self._sendJson(400, {"error": f"Invalid request: {type(e).__name__}: {e}"})
+        try:
+            pdf, status = self.server.service.render(text, design_key)
+        except TimeoutError as e:
+            return self._sendJson(504, {"error": str(e)})
+        except BrokenProcessPool as e:
+            return self._sendJson(503, {"error": f"The render service is broken: {e}"})
+        except Exception as e:
+            return self._sendJson(422, {"error": f"The song cannot be rendered: {type(e).__name__}: {e}"})
+        content_type = getRenderBackend(json.loads(design_key).get("backend", "matplotlib")).content_type
+        self._sendBytes(200, pdf, content_type, {"X-Lyrichords-Render": status})
+
+    def log_message(self, format: str, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: RenderService):
+        super().__init__(address, RenderRequestHandler)
+        self.service: RenderService = service
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, nb_processes: int = 1, cache_size: int = 64, timeout: float = 60):
+    service = RenderService(nb_processes, cache_size, timeout)
+    logger.info(f"Starting {nb_processes} worker processes")
+    service.warm()
+    server = RenderServer((host, port), service)
+    logger.info(f"Serving on http://{host}:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stop serving")
+    finally:
+        server.server_close()
+        service.shutdown()
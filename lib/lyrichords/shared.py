@@ -0,0 +1,63 @@
+from multiprocessing.shared_memory import SharedMemory
+import logging
+import numpy as np
+# Typing
+from typing import Any, Dict, List, Tuple
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# (key, version, name of the shared memory block, shape, dtype) of an array
+ArrayDescriptor = Tuple[Any, Any, str, Tuple[int, ...], str]
+
+
+class SharedArrays():
+    """
+    Read-only arrays shared by processes: copied once by the main process into shared memory blocks,
+    mapped without any copy by the worker processes (see attachArrays) from their descriptors.
+    The main process owns the blocks, they are released by close (or at the end of the "with" statement)
+    once the workers are stopped.
+    """
+    def __init__(self, arrays: Dict[Any, Tuple[Any, np.ndarray]]):
+        self.blocks: List[SharedMemory] = []
+        self.descriptors: List[ArrayDescriptor] = []
+        try:
+            for key, (version, array) in arrays.items():
+                block = SharedMemory(create=True, size=max(1, array.nbytes))
+                self.blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+                self.descriptors.append((key, version, block.name, array.shape, array.dtype.str))
+        except Exception:
+            self.close()
+            raise
+        logger.debug(f"{len(self.blocks)} arrays shared ({sum(block.size for block in self.blocks) / 2**20:.1f} MiB)")
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Shared memory blocks mapped by this process, kept open as long as the process uses their arrays
+_attached_blocks: List[SharedMemory] = []
+
+
+def attachArrays(descriptors: List[ArrayDescriptor]) -> Dict[Any, Tuple[Any, np.ndarray]]:
+    """
+    Arrays shared by another process (see SharedArrays), as read-only views of its shared memory blocks
+    """
+    arrays = {}
+    for key, version, name, shape, dtype in descriptors:
+        block = SharedMemory(name=name)
+        _attached_blocks.append(block)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[key] = (version, array)
+    return arrays
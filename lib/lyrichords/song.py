@@ -1,8 +1,9 @@
-from .common import Chord
+from .common import Chord, CHORD_NAMES_INDEX
 import re
 import bisect 
 from collections import Counter
 from dataclasses import dataclass, field
+from functools import lru_cache
 import logging
 # Typing
 from typing import List, Tuple, Dict, Iterator
@@ -10,6 +11,37 @@ from typing import List, Tuple, Dict, Iterator
 # Get Logger
 logger = logging.getLogger(__name__)
 
+# Tokens of a chords line, the chords can be separated by spaces, "," or "|"
+CHORDS_LINE_TOKEN = re.compile(r"[^\s,|]+")
+# Characters ignored around a chord (eg: "-Am-", "G_", "(C)")
+CHORDS_LINE_STRIPPED_CHARACTERS = "-_()"
+# Repetition marks (eg: "(x2)", "x3")
+CHORDS_LINE_REPEAT = re.compile(r"\(?[xX]\d+\)?")
+# Cheap checks done before parsing a token
+CHORD_FIRST_LETTERS = frozenset(name[0] for name in CHORD_NAMES_INDEX)
+CHORD_MAX_LENGTH = 2 * max(len(name) for name in CHORD_NAMES_INDEX) + 1
+# Number of verdicts remembered, shared by all the songs parsed by the process
+CHORD_TOKENS_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=CHORD_TOKENS_CACHE_SIZE)
+def parseChordToken(token: str) -> Tuple[int, str]:
+    """
+    Returns (offset, chordname) of the chord found in a token of a chords line.
+    chordname is "" if the token only contains separators or a repetition mark.
+    Returns None if the token is not a chord (=> the line is a lyrics line).
+    """
+    chordname = token.lstrip(CHORDS_LINE_STRIPPED_CHARACTERS)
+    offset = len(token) - len(chordname)
+    chordname = chordname.rstrip(CHORDS_LINE_STRIPPED_CHARACTERS)
+    if (chordname == "") or CHORDS_LINE_REPEAT.fullmatch(token):
+        return (0, "")
+    if (len(chordname) > CHORD_MAX_LENGTH) or (chordname[0].upper() not in CHORD_FIRST_LETTERS):
+        return None
+    if Chord.tryParse(chordname) is None:
+        return None
+    return (offset, chordname)
+
 
 @dataclass
 class ChordLocation():
@@ -44,13 +76,15 @@ class Verse():
                 self.addWord(word, index)
                 index += len(word) + 1
         # Detecting chords positions
-        index = 0
-        for chordname in chord_line.split(' '):
-            if chordname == "":
-                index += 1
-            else:
-                self.addChord(chordname, index)
-                index += len(chordname) + 1
+        for token in CHORDS_LINE_TOKEN.finditer(chord_line):
+            verdict = parseChordToken(token.group())
+            if verdict is None:
+                # Not a chord, raises the parsing error
+                self.addChord(token.group(), token.start())
+                continue
+            offset, chordname = verdict
+            if chordname:
+                self.addChord(chordname, token.start() + offset)
         # Ensure the first index is 0
         self.resetIndex()
 
@@ -243,19 +277,26 @@ class Song():
         return self.verses
 
     def isChordsLine(line: str) -> bool:
-        # Here I should remove all character such as: , - _
-        for word in line.split():
-            try:
-                Chord.parse(word)
-            except ValueError as e:
+        nb_tokens = 0
+        nb_chords = 0
+        for token in CHORDS_LINE_TOKEN.finditer(line):
+            verdict = parseChordToken(token.group())
+            if verdict is None:
                 return False
-        return True
+            nb_tokens += 1
+            if verdict[1]:
+                nb_chords += 1
+        # A line with only separators (eg: "----") is not a chords line
+        return (nb_tokens == 0) or (nb_chords > 0)
 
     def fromFile(path: str, lyrics_first: bool = False) -> "Song":
         logger.info(f"Parsing File: {path}")
         # Read the file
         with open(path, "r") as f:
             content = f.read()
+        return Song.fromText(content, lyrics_first)
+
+    def fromText(content: str, lyrics_first: bool = False) -> "Song":
         lines = content.split("\n")
         # Remove the last empty lines
         for k in range(len(lines)-1, -1, -1):
@@ -0,0 +1,308 @@
+from .drawing import RenderBackend, ASSET_PATH
+from .layout import PagePlan, ChordsPanelPlan, ChordDiagram, ChordAnchor, LinePlan, TextItem, Box, font2mm
+from .pdf import FontProgram, getFontProgram, getTextBox, getChordBox, formatNumber, EDGE_WIDTH, CHORD_BOX_PAD, CHORD_BOX_ALPHA
+from PIL import Image as PImage
+from xml.sax.saxutils import escape
+import base64
+import io
+import logging
+import os
+import pathlib
+import urllib.parse
+# Typing
+from typing import Dict, IO, Iterable, List, Optional, Tuple, Union
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# Space between the pages of a SVG document (mm)
+PAGES_GAP = 5
+# Styles shared by all the pages: the shapes of the chord diagrams and the texts, whose spaces are kept
+DOCUMENT_STYLE = "text{white-space:pre}" \
+                 f".bar{{fill:#808080}}.finger{{fill:#696969;stroke:#696969;stroke-width:{formatNumber(EDGE_WIDTH)}}}"
+# Style of the HTML page, the pages fit the width of the screen
+HTML_STYLE = "body{margin:0;background:#808080}" \
+             "svg.page{display:block;margin:5mm auto;background:white;max-width:100%;height:auto}"
+
+# URL of the folder the @font-face rules load the font files from (see setFontsUrl)
+_fonts_url: Optional[str] = None
+
+
+def setFontsUrl(url: Optional[str]) -> None:
+    """
+    URL of the folder of the font files referenced by the documents written by this process, their file name
+    appended: eg "/fonts/" for the documents served by the render server (see server.RenderRequestHandler).
+    None (default): the file:// URI of the font files, only loaded when viewed on the computer which rendered them.
+    """
+    global _fonts_url
+    _fonts_url = url
+
+
+def getFontUrl(fontpath: str) -> str:
+    if _fonts_url is None:
+        return pathlib.Path(fontpath).as_uri()
+    return _fonts_url + urllib.parse.quote(pathlib.Path(fontpath).name)
+
+
+# (image path, grayscale) -> ((modification time, size), data URI of the image, width, height)
+_images_uris: Dict[Tuple[str, bool], Tuple[Tuple[int, int], str, int, int]] = {}
+
+
+def getImageURI(path: str, grayscale: bool = False) -> Tuple[str, int, int]:
+    """
+    (data URI, width, height) of an image file, encoded once per process (and again when the file changes):
+    the JPEG and PNG files as they are, the others (and the grayscale images) converted to PNG
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = (path, grayscale)
+    if (key not in _images_uris) or (_images_uris[key][0] != version):
+        with PImage.open(path) as img:
+            mimetype = PImage.MIME.get(img.format)
+            width, height = img.size
+            if (mimetype in ("image/jpeg", "image/png")) and not (grayscale and img.mode not in ("L", "LA")):
+                data = pathlib.Path(path).read_bytes()
+            else:
+                img = img.convert("LA" if grayscale else "RGBA")
+                buffer = io.BytesIO()
+                img.save(buffer, "PNG")
+                data, mimetype = buffer.getvalue(), "image/png"
+        uri = f"data:{mimetype};base64," + base64.b64encode(data).decode("ascii")
+        _images_uris[key] = (version, uri, width, height)
+    return _images_uris[key][1:]
+
+
+def _getAttributes(**attributes: Union[str, float]) -> str:
+    values = (formatNumber(value) if isinstance(value, (int, float)) else value for value in attributes.values())
+    return " ".join(f'{name.replace("_", "-")}="{value}"' for name, value in zip(attributes, values))
+
+
+class SvgBackend(RenderBackend):
+    """
+    Writes the pages as SVG: the chord names and the chord diagrams are defined once as symbols used by
+    all the pages, the fonts are referenced (@font-face with their name, then their file, see setFontsUrl) instead of embedded.
+    Each page is written and flushed as soon as it is laid out. The pages of a SVG document are one below
+    the other: the height of the document is only known at the end, it is written then if the file is
+    seekable (otherwise it is the height of the first page, the HtmlBackend has no such limitation).
+    """
+    extension = ".svg"
+    content_type = "image/svg+xml"
+
+    def writePages(self, chordnames: Tuple[str, ...], pages: Iterable[PagePlan], filepath: Union[str, IO[bytes]],
+                   background: str = None) -> int:
+        if isinstance(filepath, (str, os.PathLike)):
+            with open(filepath, "wb") as f:
+                return self.writePages(chordnames, pages, f, background)
+        self.file: IO[bytes] = filepath
+        self.chords_colors: Dict[str, str] = self.drawer.getChordsColors(chordnames)
+        # Key of a symbol -> its id
+        self.symbols: Dict[Tuple, str] = {}
+        # (font path, weight) -> family of the @font-face
+        self.fonts: Dict[Tuple[str, str], str] = {}
+        # Definitions and styles to write before the next page
+        self.defs: List[str] = []
+        self.styles: List[str] = []
+        nb_pages = 0
+        for page in pages:
+            content = self._drawPage(page, background)
+            if nb_pages == 0:
+                self._writeStart(page)
+            self._writePage(nb_pages, page, content)
+            self.file.flush()
+            nb_pages += 1
+        self._writeEnd(nb_pages)
+        return nb_pages
+
+    def _write(self, text: str):
+        self.file.write(text.encode("utf-8"))
+
+    def _getDefinitions(self) -> str:
+        """
+        Symbols and styles added since the last page
+        """
+        text = ""
+        if len(self.styles) > 0:
+            text += f"<style>{''.join(self.styles)}</style>"
+        if len(self.defs) > 0:
+            text += f"<defs>{''.join(self.defs)}</defs>"
+        self.defs.clear()
+        self.styles.clear()
+        return text
+
+    def _getPageSize(self, page: PagePlan) -> str:
+        return f'width="{formatNumber(page.width)}mm" height="{formatNumber(page.height)}mm" ' \
+               f'viewBox="0 0 {formatNumber(page.width)} {formatNumber(page.height)}"'
+
+    def _writeStart(self, page: PagePlan):
+        # The height is written with a fixed number of characters, replaced once the number of pages is known
+        height = f"{page.height:010.3f}"
+        header = '<?xml version="1.0" encoding="UTF-8"?>\n<svg xmlns="http://www.w3.org/2000/svg" xml:space="preserve" ' \
+                 f'width="{formatNumber(page.width)}mm" height="{height}mm" viewBox="0 0 {formatNumber(page.width)} {height}">\n'
+        start = self.file.tell() if self.file.seekable() else None
+        # Positions of the height in the file
+        self.heights_positions: List[int] = []
+        if start is not None:
+            self.heights_positions = [start + header.index(f'height="{height}') + len('height="'),
+                                      start + header.index(f' {height}">') + 1]
+        self._write(header + f"<style>{DOCUMENT_STYLE}</style>\n")
+
+    def _writePage(self, index: int, page: PagePlan, content: str):
+        y = index * (page.height + PAGES_GAP)
+        self._write(f'<svg y="{formatNumber(y)}" {self._getPageSize(page)}>{self._getDefinitions()}'
+                    f'<rect width="100%" height="100%" fill="white"/>\n{content}</svg>\n')
+        self.page_height: float = page.height
+
+    def _writeEnd(self, nb_pages: int):
+        self._write("</svg>\n")
+        if nb_pages <= 1:
+            return
+        height = f"{nb_pages * self.page_height + (nb_pages - 1) * PAGES_GAP:010.3f}".encode("ascii")
+        end = self.file.tell()
+        for position in self.heights_positions:
+            self.file.seek(position)
+            self.file.write(height)
+        self.file.seek(end)
+
+    def _getFontFamily(self, item: TextItem) -> Tuple[FontProgram, str]:
+        """
+        Font program and CSS family of a text, the @font-face rule is added the first time
+        """
+        fontpath = self.drawer.measurer.getGlyphMetrics(item.fontfamily, item.fontsize, item.weight).fontpath
+        program = getFontProgram(fontpath)
+        key = (fontpath, item.weight)
+        if key not in self.fonts:
+            self.fonts[key] = program.family
+            self.styles.append(f'@font-face{{font-family:"{program.family}";font-weight:{item.weight};'
+                               f'src:local("{program.fullname}"),url("{getFontUrl(fontpath)}")}}')
+        return (program, self.fonts[key])
+
+    def _getText(self, item: TextItem, x: float = 0, y: float = 0, color: Optional[str] = None) -> str:
+        """
+        Text element of an item placed at (x, y) from its position
+        """
+        program, family = self._getFontFamily(item)
+        line = program.getLine(item.text)
+        box, baseline = getTextBox(program, item, line)
+        anchor = {"left": "start", "center": "middle", "right": "end"}[item.ha]
+        attributes = _getAttributes(x=item.x + x, y=baseline + y, font_size=font2mm(item.fontsize))
+        attributes += f' font-family="{family}"'
+        if anchor != "start":
+            attributes += f' text-anchor="{anchor}"'
+        if item.weight != "normal":
+            attributes += f' font-weight="{item.weight}"'
+        if color is not None:
+            attributes += f' fill="{color}"'
+        return f"<text {attributes}>{escape(item.text)}</text>"
+
+    def _getSymbol(self, prefix: str, content: str) -> str:
+        """
+        Id of the symbol of a content (placed at its origin), defined the first time
+        """
+        key = (prefix, content)
+        if key not in self.symbols:
+            self.symbols[key] = f"{prefix}{len(self.symbols) + 1}"
+            self.defs.append(f'<symbol id="{self.symbols[key]}" overflow="visible">{content}</symbol>')
+        return self.symbols[key]
+
+    def _getChordLabel(self, anchor: ChordAnchor, x: float = 0, y: float = 0) -> str:
+        """
+        Chord name in its rounded box, the same chord names are drawn from the same symbol
+        """
+        item = anchor.label
+        key = ("label", anchor.chordname, item.text, item.fontfamily, item.fontsize, item.ha, item.va, item.weight)
+        if key not in self.symbols:
+            program, _ = self._getFontFamily(item)
+            size = font2mm(item.fontsize)
+            box = getChordBox(getTextBox(program, item, program.getLine(item.text))[0], size).shifted(-item.x, -item.y)
+            color = self.chords_colors[anchor.chordname]
+            rect = _getAttributes(x=box.x, y=box.y, width=box.width, height=box.height, rx=CHORD_BOX_PAD * size,
+                                  fill=color, fill_opacity=CHORD_BOX_ALPHA, stroke=color, stroke_width=EDGE_WIDTH)
+            self.symbols[key] = self._getSymbol("c", f"<rect {rect}/>{self._getText(item, -item.x, -item.y)}")
+        return f'<use href="#{self.symbols[key]}" {_getAttributes(x=item.x + x, y=item.y + y)}/>'
+
+    def _getChordDiagram(self, diagram: ChordDiagram) -> str:
+        """
+        Chord diagram drawn from a symbol placed at the position of the chord name,
+        the symbol is built once from the diagram at the origin (see ChordDiagram.getOrigin)
+        """
+        origin = diagram.getOrigin()
+        x, y = (origin.name.label.x, origin.name.label.y)
+        key = ("diagram", origin)
+        if key not in self.symbols:
+            elements = []
+            for bar in origin.bars:
+                elements.append(f'<rect class="bar" {_getAttributes(x=bar.x - x, y=bar.y - y, width=bar.width, height=bar.height)}/>')
+            for finger in origin.fingers:
+                elements.append(f'<circle class="finger" {_getAttributes(cx=finger[0] - x, cy=finger[1] - y, r=origin.finger_radius)}/>')
+            # The texts over the shapes
+            elements.append(self._getChordLabel(origin.name, -x, -y))
+            if origin.first_fret is not None:
+                elements.append(self._getText(origin.first_fret, -x, -y, "gray"))
+            for mark in origin.marks:
+                elements.append(self._getText(mark, -x, -y, "gray"))
+            self.symbols[key] = self._getSymbol("d", "".join(elements))
+        return f'<use href="#{self.symbols[key]}" {_getAttributes(x=x + diagram.offset[0], y=y + diagram.offset[1])}/>'
+
+    def _getImage(self, path: str, box: Box, opacity: float = 1, grayscale: bool = False) -> str:
+        """
+        Image file stretched to a box, the image is stored once in a symbol
+        """
+        key = ("image", str(path), grayscale)
+        if key not in self.symbols:
+            self.symbols[key] = f"i{len(self.symbols) + 1}"
+            uri, width, height = getImageURI(str(path), grayscale)
+            self.defs.append(f'<symbol id="{self.symbols[key]}" viewBox="0 0 {width} {height}" preserveAspectRatio="none">'
+                             f'<image width="{width}" height="{height}" href="{uri}"/></symbol>')
+        attributes = _getAttributes(x=box.x, y=box.y, width=box.width, height=box.height)
+        if opacity != 1:
+            attributes += f' opacity="{formatNumber(opacity)}"'
+        return f'<use href="#{self.symbols[key]}" {attributes}/>'
+
+    def _drawChords(self, panel: ChordsPanelPlan) -> List[str]:
+        elements = [self._getImage(os.path.join(ASSET_PATH, "guitar.png"), panel.instrument_icon)]
+        if panel.capo is not None:
+            elements.append(self._getImage(os.path.join(ASSET_PATH, "capo.png"), panel.capo_icon))
+        elements += [self._getChordDiagram(diagram) for diagram in panel.diagrams]
+        elements.append(self._getText(panel.instrument))
+        if panel.capo is not None:
+            elements.append(self._getText(panel.capo))
+        return elements
+
+    def _drawLine(self, line: LinePlan) -> List[str]:
+        return [self._getText(line.text)] + [self._getChordLabel(anchor) for anchor in line.chords]
+
+    def _drawPage(self, page: PagePlan, background: str = None) -> str:
+        elements = []
+        if page.chords is not None:
+            elements += self._drawChords(page.chords)
+        if page.title is not None:
+            elements.append(self._getText(page.title))
+        if page.composer is not None:
+            elements.append(self._getText(page.composer))
+        for column in page.columns:
+            for line in column.lines:
+                elements += self._drawLine(line)
+        if background is not None:
+            elements.append(self._getImage(background, page.area, self.drawer.background_opacity, self.drawer.grayscale))
+        return "\n".join(elements) + "\n"
+
+
+class HtmlBackend(SvgBackend):
+    """
+    Writes the pages as SVG elements of a HTML page, displayed by the browsers as soon as they are received
+    """
+    extension = ".html"
+    content_type = "text/html; charset=utf-8"
+
+    def _writeStart(self, page: PagePlan):
+        title = "" if page.title is None else escape(page.title.text)
+        self._write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+                    '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+                    f"<title>{title}</title>\n<style>{HTML_STYLE}{DOCUMENT_STYLE}</style>\n</head>\n<body>\n")
+
+    def _writePage(self, index: int, page: PagePlan, content: str):
+        self._write(f'<svg class="page" xmlns="http://www.w3.org/2000/svg" xml:space="preserve" {self._getPageSize(page)}>'
+                    f"{self._getDefinitions()}\n{content}</svg>\n")
+
+    def _writeEnd(self, nb_pages: int):
+        self._write("</body>\n</html>\n")
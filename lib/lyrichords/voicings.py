@@ -0,0 +1,169 @@
+from .common import Chord, Key, Alter, Suffix
+from functools import lru_cache
+import logging
+import numpy as np
+# Typing
+from typing import Tuple, Union, Dict, List
+
+# Get Logger
+logger = logging.getLogger(__name__)
+
+# Value of a muted string in the frets matrices
+MUTED_STRING = -1
+# Number of (tuning, chord) results kept in memory
+VOICINGS_CACHE_SIZE = 1024
+# Names used when generating a full table of chords
+ROOT_NAMES = ("C", "C#", "D", "Eb", "E", "F", "F#", "G", "G#", "A", "Bb", "B")
+
+
+def getTuningHeights(tuning: Tuple[Union[Tuple[Key, Alter], Key], ...]) -> Tuple[int, ...]:
+    heights = []
+    for string in tuning:
+        if isinstance(string, Key):
+            heights.append(string.getHeight())
+        else:
+            key, alter = string
+            heights.append((key.getHeight() + alter.getHeightAlter()) % 12)
+    return tuple(heights)
+
+
+def _getNbFingers(voicings: np.ndarray, fret_min: np.ndarray) -> np.ndarray:
+    """
+    Number of fingers needed, the strings at the lowest fret can be played with a barre
+    if there are no open strings between them
+    """
+    fingers = voicings > 0
+    barre = fingers & (voicings == fret_min[:, np.newaxis])
+    strings = np.arange(voicings.shape[1])
+    first_barre = barre.argmax(axis=1)[:, np.newaxis]
+    last_barre = voicings.shape[1] - 1 - barre[:, ::-1].argmax(axis=1)[:, np.newaxis]
+    open_inside = ((voicings == 0) & (strings > first_barre) & (strings < last_barre)).any(axis=1)
+    nb_barre = np.where(open_inside, 1, barre.sum(axis=1))
+    return fingers.sum(axis=1) - np.maximum(nb_barre - 1, 0)
+
+
+def _getPlayabilityScores(voicings: np.ndarray, notes: np.ndarray, chord: Chord) -> np.ndarray:
+    """
+    Lower is easier to play
+    """
+    nb_strings = voicings.shape[1]
+    sounded = voicings != MUTED_STRING
+    fingers = voicings > 0
+    has_fingers = fingers.any(axis=1)
+    fret_min = np.where(fingers, voicings, np.iinfo(np.int8).max).min(axis=1)
+    fret_max = voicings.max(axis=1)
+    span = np.where(has_fingers, fret_max - fret_min, 0)
+    # The first position is the easiest
+    position = np.where(has_fingers, fret_min - 1, 0)
+    nb_fingers = _getNbFingers(voicings, fret_min)
+    # Muting the lowest strings is easy on a guitar, the muted strings between
+    # sounded strings are hard to play
+    first_sounded = sounded.argmax(axis=1)
+    last_sounded = nb_strings - 1 - sounded[:, ::-1].argmax(axis=1)
+    nb_muted_low = first_sounded
+    nb_muted_high = nb_strings - 1 - last_sounded
+    nb_muted_inside = (last_sounded - first_sounded + 1) - sounded.sum(axis=1)
+    muted_low_weight = 1 if nb_strings > 4 else 6
+    # The root should be the lowest sounded string
+    bass = notes[np.arange(len(voicings)), first_sounded]
+    wrong_bass = bass != chord.getBassHeight()
+    return (3 * span + 2 * position + nb_fingers
+            + muted_low_weight * nb_muted_low + 5 * nb_muted_high + 6 * nb_muted_inside
+            + 6 * wrong_bass).astype(np.int32)
+
+
+@lru_cache(maxsize=VOICINGS_CACHE_SIZE)
+def generateVoicings(tuning: Tuple[int, ...],
+                     chord: Chord,
+                     max_fret: int = 9,
+                     max_stretch: int = 4,
+                     nb_voicings: int = 3) -> np.ndarray:
+    """
+    Enumerates the voicings of a chord for a tuning (heights of the strings, the lowest string first)
+    and returns the nb_voicings easiest ones, one row per voicing and one column per string
+    (MUTED_STRING if the string is muted).
+    The frets are searched between 0 and max_fret, the fingers must fit in max_stretch frets.
+    The result is cached (and read only).
+    """
+    nb_strings = len(tuning)
+    chord_notes = chord.getNotesHeights()
+    required = list(chord_notes)
+    if len(required) > nb_strings:
+        # Not enough strings: the fifth is omitted first
+        fifth = (chord.getHeight() + 7) % 12
+        if fifth in required:
+            required.remove(fifth)
+        required = required[:nb_strings]
+    # The voicings are built string by string, the combinations of frets that do not fit
+    # in the stretch of the hand are dropped as soon as they appear
+    no_finger = np.iinfo(np.int8).max
+    voicings = np.zeros((1, 0), dtype=np.int8)
+    fret_min = np.full(1, no_finger, dtype=np.int8)
+    fret_max = np.zeros(1, dtype=np.int8)
+    for string_height in tuning:
+        frets = [MUTED_STRING] + [fret for fret in range(0, max_fret + 1) if (string_height + fret) % 12 in chord_notes]
+        nb_frets = len(frets)
+        frets = np.tile(np.array(frets, dtype=np.int8), len(voicings))
+        voicings = np.concatenate([np.repeat(voicings, nb_frets, axis=0), frets[:, np.newaxis]], axis=1)
+        fret_min = np.minimum(np.repeat(fret_min, nb_frets), np.where(frets > 0, frets, no_finger))
+        fret_max = np.maximum(np.repeat(fret_max, nb_frets), frets)
+        fit = (fret_max <= 0) | ((fret_max - fret_min) < max_stretch)
+        voicings, fret_min, fret_max = voicings[fit], fret_min[fit], fret_max[fit]
+    sounded = voicings != MUTED_STRING
+    notes = np.where(sounded, (np.array(tuning) + voicings) % 12, MUTED_STRING)
+    # Every required note must be played
+    valid = np.ones(len(voicings), dtype=bool)
+    for note in required:
+        valid &= (notes == note).any(axis=1)
+    # Enough strings must be played
+    valid &= sounded.sum(axis=1) >= max(min(3, nb_strings), nb_strings - 2)
+    # At most 4 fingers
+    valid &= _getNbFingers(voicings, fret_min) <= 4
+    # A slashed chord must have its bass on the lowest sounded string
+    if chord.isSlashedChord():
+        first_sounded = sounded.argmax(axis=1)
+        valid &= notes[np.arange(len(voicings)), first_sounded] == chord.getBassHeight()
+    voicings = voicings[valid]
+    notes = notes[valid]
+    scores = _getPlayabilityScores(voicings, notes, chord)
+    order = np.argsort(scores, kind="stable")[:nb_voicings]
+    result = voicings[order]
+    result.setflags(write=False)
+    return result
+
+
+def formatFret(voicing: np.ndarray) -> str:
+    """
+    Voicing -> Fret as written in the tables of frets (eg: "x32010")
+    """
+    return "".join("x" if f == MUTED_STRING else str(f) for f in voicing)
+
+
+def formatFrets(voicings: np.ndarray) -> List[str]:
+    """
+    Same as formatFret for every row of a matrix of voicings (frets between MUTED_STRING and 9)
+    """
+    characters = np.array(list("x0123456789"))[np.asarray(voicings) - MUTED_STRING]
+    return ["".join(row) for row in characters.tolist()]
+
+
+def generateFrets(tuning: Tuple[Union[Tuple[Key, Alter], Key], ...],
+                  chordnames: List[str] = None,
+                  **kwargs) -> Dict[str, List[str]]:
+    """
+    Generates a table of frets (same format as the tables of the instruments module),
+    by default for every root and every suffix.
+    """
+    if kwargs.get("max_fret", 9) > 9:
+        raise ValueError("The frets above 9 cannot be written in a table of frets")
+    if chordnames is None:
+        chordnames = [root + suffix.value for root in ROOT_NAMES for suffix in Suffix]
+    heights = getTuningHeights(tuning)
+    table = {}
+    for chordname in chordnames:
+        voicings = generateVoicings(heights, Chord.parse(chordname), **kwargs)
+        if len(voicings) == 0:
+            logger.warning(f"No voicing found for the chord {chordname}")
+            continue
+        table[chordname] = [formatFret(voicing) for voicing in voicings]
+    return table
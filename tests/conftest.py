@@ -0,0 +1,8 @@
+import os
+import pathlib
+import sys
+import tempfile
+LIB_PATH = pathlib.Path(pathlib.Path(__file__).absolute().parent.parent, "lib")
+sys.path.insert(0, LIB_PATH.as_posix())
+# The caches written by the tests do not go to the cache of the user
+os.environ.setdefault("LYRICHORDS_CACHE_DIR", tempfile.mkdtemp(prefix="lyrichords_tests_"))
@@ -0,0 +1,32 @@
+import logging
+import threading
+import time
+import pytest
+from lyrichords import batch
+from lyrichords.batch import Deadline
+
+
+def test_deadline_raises_in_the_main_thread():
+    with pytest.raises(TimeoutError):
+        with Deadline(0.05):
+            time.sleep(1)
+
+
+def test_deadline_ignored_in_a_thread_is_reported(monkeypatch, caplog):
+    monkeypatch.setattr(batch, "_TIMEOUT_IGNORED_LOGGED", False)
+    errors = []
+
+    def run():
+        try:
+            for _ in range(2):
+                with Deadline(0.05) as deadline:
+                    assert deadline.timeout == 0
+        except Exception as e:
+            errors.append(e)
+
+    with caplog.at_level(logging.WARNING, logger="lyrichords.batch"):
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join(5)
+    assert errors == []
+    assert len([record for record in caplog.records if "timeouts are ignored" in record.getMessage()]) == 1
@@ -0,0 +1,10 @@
+import os
+from lyrichords.cache import writeAtomically, getDefaultFileMode
+
+
+def test_written_file_has_the_default_mode(tmp_path):
+    path = tmp_path / ".lyrichords_manifest.json"
+    writeAtomically(path, lambda f: f.write(b"{}"))
+    assert path.read_bytes() == b"{}"
+    assert (path.stat().st_mode & 0o777) == getDefaultFileMode()
+    assert os.listdir(tmp_path) == [path.name]
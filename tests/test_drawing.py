@@ -0,0 +1,49 @@
+import gc
+import pathlib
+import matplotlib
+matplotlib.use("agg")
+import matplotlib.pyplot as plt
+import pytest
+from lyrichords.drawing import RenderBackend, SongDrawer, PAGE_FORMATS
+from lyrichords.instruments import STRING_INSTRUMENTS
+from lyrichords.layout import SongLayout
+from lyrichords.song import Song
+
+EXAMPLES_PATH = pathlib.Path(__file__).absolute().parent.parent.joinpath("examples")
+
+
+def iterSongFigures(drawer: SongDrawer, song: Song):
+    layout = SongLayout(drawer)
+    return drawer.iterFigures(layout.getChordnames(song), layout.iterPages(song))
+
+
+def test_iter_figures_closes_each_page():
+    drawer = SongDrawer(STRING_INSTRUMENTS.GUITAR_EADGBE.value, page_format=PAGE_FORMATS.A6, chords_all_pages=True)
+    song = Song.fromFile(EXAMPLES_PATH.joinpath("compartir.txt").as_posix())
+    nb_frozen = gc.get_freeze_count()
+    nb_pages = 0
+    for fig in iterSongFigures(drawer, song):
+        assert plt.get_fignums() == [fig.number]
+        assert gc.get_freeze_count() == nb_frozen
+        nb_pages += 1
+    assert nb_pages > 1
+    assert plt.get_fignums() == []
+
+
+def test_abandoned_iter_figures_closes_its_page():
+    drawer = SongDrawer(STRING_INSTRUMENTS.GUITAR_EADGBE.value, page_format=PAGE_FORMATS.A6, chords_all_pages=True)
+    song = Song.fromFile(EXAMPLES_PATH.joinpath("compartir.txt").as_posix())
+    figures = iterSongFigures(drawer, song)
+    next(figures)
+    figures.close()
+    assert plt.get_fignums() == []
+    assert gc.isenabled()
+
+
+def test_backend_without_write_pages_cannot_be_created():
+    class IncompleteBackend(RenderBackend):
+        pass
+
+    drawer = SongDrawer(STRING_INSTRUMENTS.GUITAR_EADGBE.value, page_format=PAGE_FORMATS.A6)
+    with pytest.raises(TypeError):
+        IncompleteBackend(drawer)
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+from conftest import LIB_PATH
+
+# Budget of the import of lyrichords.instruments: the self time of the lyrichords modules (ms),
+# the third party modules (numpy) are not counted
+IMPORT_BUDGET_MS = float(os.environ.get("LYRICHORDS_IMPORT_BUDGET_MS", 25))
+
+
+def getImportTimes(module: str) -> dict:
+    """
+    Self time (ms) of each module imported by 'import module', from python -X importtime
+    """
+    code = f"import sys; sys.path.insert(0, {LIB_PATH.as_posix()!r}); import {module}"
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_time) / 1000
+    return times
+
+
+def test_instruments_import_budget():
+    # Best of 3 runs, the first one may compile the bytecode
+    totals = []
+    for _ in range(3):
+        times = getImportTimes("lyrichords.instruments")
+        totals.append(sum(t for name, t in times.items() if name.split(".")[0] == "lyrichords"))
+    assert min(totals) < IMPORT_BUDGET_MS, f"Importing lyrichords.instruments took {min(totals):.1f} ms (budget {IMPORT_BUDGET_MS} ms)"
+
+
+def test_instruments_tables_not_parsed_at_import():
+    code = (f"import sys; sys.path.insert(0, {LIB_PATH.as_posix()!r}); from lyrichords.instruments import STRING_INSTRUMENTS; "
+            "print(all(len(i.value._pending_frets) > 0 and len(i.value._frets) == 0 for i in STRING_INSTRUMENTS))")
+    process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert process.stdout.strip() == "True"
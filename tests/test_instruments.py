@@ -0,0 +1,26 @@
+from lyrichords.instruments import STRING_INSTRUMENTS, StringInstrument
+from lyrichords.common import Key
+
+
+def test_hash_does_not_depend_on_the_generated_chords():
+    instrument = StringInstrument("Test", (Key.G, Key.C, Key.E, Key.A), {"C": ["0003"], "Am": ["2000"]})
+    before = instrument.getHash()
+    instrument.getFrets("Am7/G")
+    assert instrument.getHash() == before
+    instrument.addChords({"G": ["0232"]})
+    assert instrument.getHash() != before
+
+
+def test_hash_of_the_bundled_instruments():
+    instrument = STRING_INSTRUMENTS.GUITAR_EADGBE.value
+    before = instrument.getHash()
+    instrument.getFrets("Am7/G")
+    assert instrument.getHash() == before
+
+
+def test_max_frets_range_does_not_depend_on_the_generated_chords():
+    instrument = StringInstrument("Test", (Key.G, Key.C, Key.E, Key.A), {"C": ["0003"], "Am": ["2000"], "G": ["0232"]})
+    before = instrument.getMaxFretsRange()
+    instrument.getFrets("Ebmaj7")
+    assert instrument.getMaxFretsRange(["Ebmaj7"]) > before
+    assert instrument.getMaxFretsRange() == before
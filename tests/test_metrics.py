@@ -0,0 +1,44 @@
+import matplotlib
+matplotlib.use("agg")
+import matplotlib.pyplot as plt
+import pytest
+from lyrichords.metrics import TextMeasurer, getFontRegistry
+
+# Largest difference accepted between the measures and the boxes of the matplotlib texts (mm)
+TOLERANCE_MM = 0.05
+TEXTS = ["Hello", "Quiero compartir mi silla contigo", "AV Wa To. fi", "¿Qué más? — 'ñandú'", "lp", "x"]
+FONTS = [("Kurale", 10, "normal"), ("Dancing Script", 30, "normal"), ("Cookie", 12, "normal"), (None, 8, "normal"), (None, 6, "bold")]
+
+
+@pytest.fixture(scope="module")
+def renderer():
+    getFontRegistry().update()
+    fig = plt.figure()
+    yield (fig, fig.canvas.get_renderer())
+    plt.close(fig)
+
+
+@pytest.mark.parametrize("fontfamily, fontsize, weight", FONTS)
+def test_widths_match_the_text_boxes(renderer, fontfamily, fontsize, weight):
+    fig, agg = renderer
+    measurer = TextMeasurer(fig.dpi)
+    for text in TEXTS:
+        artist = fig.text(0, 0, text, fontfamily=fontfamily, fontsize=fontsize, weight=weight)
+        box = artist.get_window_extent(agg)
+        artist.remove()
+        width = box.width / fig.dpi * 25.4
+        height = box.height / fig.dpi * 25.4
+        assert measurer.getWidth(text, fontfamily, fontsize, weight) == pytest.approx(width, abs=TOLERANCE_MM), text
+        assert measurer.getHeight(text, fontfamily, fontsize, weight) == pytest.approx(height, abs=TOLERANCE_MM), text
+
+
+def test_prefix_widths_match_the_text_boxes(renderer):
+    fig, agg = renderer
+    measurer = TextMeasurer(fig.dpi)
+    text = "Quiero caminar y correr a tu ladito"
+    widths = measurer.getPrefixWidths(text, "Kurale", 10)
+    for k in range(1, len(text) + 1, 5):
+        artist = fig.text(0, 0, text[:k], fontfamily="Kurale", fontsize=10)
+        width = artist.get_window_extent(agg).width / fig.dpi * 25.4
+        artist.remove()
+        assert widths[k] == pytest.approx(width, abs=TOLERANCE_MM), text[:k]
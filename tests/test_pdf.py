@@ -0,0 +1,51 @@
+import matplotlib
+matplotlib.use("agg")
+import matplotlib.font_manager as fm
+import pytest
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from lyrichords.drawing import SongDrawer, PAGE_FORMATS
+from lyrichords.instruments import STRING_INSTRUMENTS
+from lyrichords.metrics import FONT_PATH
+from lyrichords.pdf import isTrueTypeFont
+
+
+def buildCffFont(path: str, family: str):
+    """
+    OpenType font with CFF outlines (a square for "x")
+    """
+    builder = FontBuilder(1000, isTTF=False)
+    builder.setupGlyphOrder([".notdef", "x"])
+    builder.setupCharacterMap({ord("x"): "x"})
+    pen = T2CharStringPen(500, None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((500, 500))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    square = pen.getCharString()
+    builder.setupCFF(family, {"FullName": family}, {".notdef": square, "x": square}, {})
+    builder.setupHorizontalMetrics({".notdef": (500, 0), "x": (500, 0)})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({"familyName": family, "styleName": "Regular"})
+    builder.setupOS2()
+    builder.setupPost()
+    builder.save(path)
+
+
+def test_is_true_type_font(tmp_path):
+    assert isTrueTypeFont(FONT_PATH.joinpath("Kurale-Regular.ttf").as_posix())
+    path = tmp_path.joinpath("Square.otf").as_posix()
+    buildCffFont(path, "Square")
+    assert not isTrueTypeFont(path)
+
+
+def test_pdf_backend_rejects_the_cff_fonts(tmp_path):
+    path = tmp_path.joinpath("SquareCff.otf").as_posix()
+    buildCffFont(path, "SquareCff")
+    fm.fontManager.addfont(path)
+    design = dict(page_format=PAGE_FORMATS.A5, lyrics_fontfamily="SquareCff")
+    with pytest.raises(ValueError, match="TrueType"):
+        SongDrawer(STRING_INSTRUMENTS.GUITAR_EADGBE.value, backend="pdf", **design)
+    SongDrawer(STRING_INSTRUMENTS.GUITAR_EADGBE.value, backend="matplotlib", **design)
+    SongDrawer(STRING_INSTRUMENTS.GUITAR_EADGBE.value, backend="pdf", page_format=PAGE_FORMATS.A5)
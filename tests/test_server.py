@@ -0,0 +1,145 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import json
+import os
+import re
+import signal
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from lyrichords.server import RenderService, RenderServer, getDesignKey
+
+SONG = "TITLE: Test\n\nAm      C\nHello world"
+
+
+class PendingExecutor():
+    """
+    Executor whose renders end when the test sets their result
+    """
+    def __init__(self, done: bool = False):
+        self.done = done
+        self.futures = []
+
+    def submit(self, *args):
+        future = Future()
+        if self.done:
+            future.set_exception(ValueError("Failed at once"))
+        self.futures.append(future)
+        return future
+
+
+def _renderInThread(service, results, text="song"):
+    thread = threading.Thread(target=lambda: results.append(service.render(text, getDesignKey({}))))
+    thread.start()
+    return thread
+
+
+def test_concurrent_requests_share_the_render():
+    service = RenderService(1)
+    service.executor.shutdown()
+    service.executor = PendingExecutor()
+    results = []
+    threads = [_renderInThread(service, results) for _ in range(2)]
+    while len(service.executor.futures) == 0 or service.stats["shared"] == 0:
+        time.sleep(0.01)
+    service.executor.futures[0].set_result(b"pdf")
+    for thread in threads:
+        thread.join(5)
+    assert sorted(results) == [(b"pdf", "rendered"), (b"pdf", "shared")]
+    assert service.render("song", getDesignKey({})) == (b"pdf", "cached")
+    assert len(service.executor.futures) == 1
+
+
+def test_render_failing_at_once_does_not_deadlock():
+    service = RenderService(1)
+    service.executor.shutdown()
+    service.executor = PendingExecutor(done=True)
+    thread = threading.Thread(target=lambda: pytest.raises(ValueError, service.render, "song", getDesignKey({})))
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert service.stats["failed"] == 1
+
+
+@pytest.fixture(scope="module")
+def server():
+    service = RenderService(1, timeout=60)
+    service.warm()
+    server = RenderServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def _post(server, content: bytes):
+    request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}/render", data=content, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return (response.status, response.headers, response.read())
+    except urllib.error.HTTPError as e:
+        return (e.code, e.headers, e.read())
+
+
+def _postSong(server, song: str, options: dict):
+    return _post(server, json.dumps({"song": song, "options": options}).encode())
+
+
+def test_render_then_cached(server):
+    options = {"backend": "pdf", "instrument": "GUITAR_EADGBE"}
+    code, headers, content = _postSong(server, SONG, options)
+    assert code == 200
+    assert headers["X-Lyrichords-Render"] == "rendered"
+    assert headers["Content-Type"] == "application/pdf"
+    assert content.startswith(b"%PDF")
+    code, headers, cached = _postSong(server, SONG, options)
+    assert (code, headers["X-Lyrichords-Render"], cached) == (200, "cached", content)
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/health", timeout=10) as response:
+        health = json.loads(response.read())
+    assert health["status"] == "ok"
+    assert health["rendered"] >= 1 and health["cached"] >= 1
+
+
+def test_invalid_requests(server):
+    assert _post(server, b"not json")[0] == 400
+    assert _post(server, json.dumps({"options": {}}).encode())[0] == 400
+    assert _postSong(server, SONG, {"unknown_option": 1})[0] == 400
+    assert _postSong(server, SONG, {"instrument": "BANJO"})[0] == 400
+    assert _postSong(server, SONG, {"backend": "png"})[0] == 400
+
+
+def test_html_fonts_are_served(server):
+    code, headers, content = _postSong(server, SONG, {"backend": "html"})
+    assert code == 200
+    assert headers["Content-Type"].startswith("text/html")
+    urls = re.findall(r'url\("([^"]+)"\)', content.decode())
+    assert len(urls) > 0
+    for url in urls:
+        assert url.startswith("/fonts/")
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{url}", timeout=10) as response:
+            assert response.headers["Content-Type"] == "font/ttf"
+            assert len(response.read()) > 0
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/fonts/..%2Fserver.py", timeout=10)
+    assert error.value.code == 404
+
+
+def test_song_not_rendered(server):
+    code, _, content = _postSong(server, SONG, {"page_format": "Z9"})
+    assert code == 422
+    assert "error" in json.loads(content)
+
+
+def test_broken_pool_is_restarted(server):
+    service = server.service
+    for process in list(service.executor._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    with pytest.raises(BrokenProcessPool):
+        for _ in range(50):
+            service.render(SONG + "\nAgain", getDesignKey({"backend": "pdf"}))
+    code, headers, _ = _postSong(server, SONG + "\nOnce more", {"backend": "pdf"})
+    assert (code, headers["X-Lyrichords-Render"]) == (200, "rendered")